@@ -8,7 +8,8 @@ from .models import (
     Carro,
     FotoCarro,
     Favorito,
-    VisualizacaoCarro
+    VisualizacaoCarro,
+    EstatisticaDiariaCarro,
 )
 
 
@@ -145,3 +146,14 @@ class VisualizacaoCarroAdmin(admin.ModelAdmin):
     search_fields = ("usuario__username", "carro__nome", "ip_address")
     readonly_fields = ("data_visualizacao",)
     date_hierarchy = "data_visualizacao"
+
+
+# -----------------------------------------
+#  ESTATÍSTICAS DIÁRIAS
+# -----------------------------------------
+@admin.register(EstatisticaDiariaCarro)
+class EstatisticaDiariaCarroAdmin(admin.ModelAdmin):
+    list_display = ("carro", "dia", "visualizacoes", "usuarios_unicos")
+    search_fields = ("carro__nome",)
+    list_select_related = ("carro",)
+    date_hierarchy = "dia"
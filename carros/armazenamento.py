@@ -0,0 +1,180 @@
+"""
+Armazenamento das fotos dos carros por conteúdo.
+
+O arquivo recebe o nome do SHA-256 do conteúdo, em pastas pelos primeiros
+caracteres (conteudo/ab/cd/abcd....jpg) para nenhuma pasta ficar com
+milhares de arquivos. A mesma foto enviada em vários anúncios (ou como
+principal e extra) fica uma vez só no disco e no backup; ArquivoFoto guarda
+quantos registros apontam para cada hash.
+
+- Cada save de um registro com foto nova soma uma referência (o arquivo só
+  é gravado se ainda não existe).
+- storage.delete solta uma referência; na última o arquivo e os derivados
+  saem do disco. Os signals chamam ao excluir o carro/foto ou trocar a foto.
+
+A referência é somada no _save, antes do save do registro, e fica gravada
+mesmo que o save falhe depois (validação, banco fora): a contagem pode ficar
+maior que o número real de registros, nunca menor, então nenhum arquivo em
+uso é apagado. O comando reconciliar_fotos reconta as referências e apaga
+os arquivos que ficaram sem nenhuma.
+
+Como o conteúdo de um nome nunca muda, serve_media manda esses arquivos
+com Cache-Control immutable (imutavel()). Nomes antigos (carros/...) ficam
+como estavam até o comando deduplicar_fotos movê-los.
+"""
+import hashlib
+import os
+import shutil
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils.deconstruct import deconstructible
+
+PASTA_CONTEUDO = "conteudo"
+
+# Extensões equivalentes gravadas com um nome só
+EXTENSOES = {".jpeg": ".jpg", ".jpe": ".jpg"}
+
+
+def calcular_hash(conteudo):
+    """SHA-256 (hex) de um File, lido em pedaços."""
+    resumo = hashlib.sha256()
+    for pedaco in conteudo.chunks():
+        resumo.update(pedaco)
+    return resumo.hexdigest()
+
+
+def caminho_conteudo(hash_conteudo, extensao):
+    extensao = extensao.lower()
+    extensao = EXTENSOES.get(extensao, extensao)
+    return f"{PASTA_CONTEUDO}/{hash_conteudo[:2]}/{hash_conteudo[2:4]}/{hash_conteudo}{extensao}"
+
+
+def imutavel(nome):
+    """Nome por conteúdo (original ou derivado): a URL pode ficar em cache para sempre."""
+    from .imagens import PASTA_DERIVADOS
+
+    return nome.startswith((f"{PASTA_CONTEUDO}/", f"{PASTA_DERIVADOS}/{PASTA_CONTEUDO}/"))
+
+
+def _hash_do_nome(nome):
+    if not nome.startswith(f"{PASTA_CONTEUDO}/"):
+        return None
+    return os.path.splitext(os.path.basename(nome))[0]
+
+
+@deconstructible(path="carros.armazenamento.ArmazenamentoPorConteudo")
+class ArmazenamentoPorConteudo(FileSystemStorage):
+    """FileSystemStorage (mesma pasta MEDIA) com nomes por hash e contagem de referências."""
+
+    def _indice(self):
+        # Import tardio: carros.models usa este storage nos campos
+        return apps.get_model("carros", "ArquivoFoto")
+
+    def get_available_name(self, name, max_length=None):
+        # O nome final vem do conteúdo (_save): não precisa procurar um nome livre
+        return name
+
+    def _save(self, name, content):
+        ArquivoFoto = self._indice()
+        hash_conteudo = calcular_hash(content)
+        with transaction.atomic():
+            # A linha travada serializa uploads e exclusões do mesmo conteúdo
+            arquivo, _ = ArquivoFoto.objects.select_for_update().get_or_create(
+                hash=hash_conteudo,
+                defaults={
+                    "nome": caminho_conteudo(hash_conteudo, os.path.splitext(name)[1]),
+                    "tamanho": content.size,
+                },
+            )
+            if not self.exists(arquivo.nome):
+                super()._save(arquivo.nome, content)
+            # COMMIT já aqui (e não no on_commit do save do registro): se o processo
+            # morresse entre os dois, a contagem ficaria menor que a real
+            ArquivoFoto.objects.filter(pk=hash_conteudo).update(
+                referencias=F("referencias") + 1, referenciado_em=Now()
+            )
+        return arquivo.nome
+
+    def delete(self, name):
+        """Solta uma referência; o arquivo só sai do disco quando não sobra nenhuma."""
+        hash_conteudo = _hash_do_nome(name or "")
+        if hash_conteudo is None:
+            return  # Nome anterior ao armazenamento por conteúdo: fica como estava
+
+        ArquivoFoto = self._indice()
+        with transaction.atomic():
+            arquivo = ArquivoFoto.objects.select_for_update().filter(pk=hash_conteudo).first()
+            if arquivo is None:
+                return
+            if arquivo.referencias > 1:
+                ArquivoFoto.objects.filter(pk=hash_conteudo).update(referencias=F("referencias") - 1)
+                return
+            self._remover(arquivo)
+
+    def reconciliar(self, hash_conteudo, contar, limite):
+        """
+        Grava a contagem real, contar(nome), com a linha travada (comando
+        reconciliar_fotos); com zero, o arquivo sai do disco. Pula o arquivo
+        referenciado depois de `limite`: o registro ainda pode estar sendo
+        gravado. Retorna a contagem gravada, ou None se nada mudou.
+        """
+        ArquivoFoto = self._indice()
+        with transaction.atomic():
+            arquivo = ArquivoFoto.objects.select_for_update().filter(pk=hash_conteudo).first()
+            if arquivo is None or (arquivo.referenciado_em and arquivo.referenciado_em >= limite):
+                return None
+            referencias = contar(arquivo.nome)
+            if referencias == arquivo.referencias:
+                return None
+            if referencias:
+                ArquivoFoto.objects.filter(pk=hash_conteudo).update(referencias=referencias)
+            else:
+                self._remover(arquivo)
+        return referencias
+
+    def _remover(self, arquivo):
+        arquivo.delete()
+        # Ainda com a linha travada: um upload igual espera e grava o arquivo de novo
+        super().delete(arquivo.nome)
+        self._apagar_derivados(arquivo.nome)
+
+    def _apagar_derivados(self, nome):
+        from .imagens import PASTA_DERIVADOS
+
+        pasta = self.path(f"{PASTA_DERIVADOS}/{os.path.splitext(nome)[0]}")
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+armazenamento_fotos = ArmazenamentoPorConteudo()
+
+
+def copiar_para_conteudo(nome, storage=armazenamento_fotos):
+    """
+    Grava um arquivo de nome antigo (carros/...) no nome por conteúdo, com
+    uma referência a mais. O antigo continua no disco até
+    apagar_nome_antigo. Retorna (nome_novo, ja_existia).
+    """
+    with storage.open(nome, "rb") as arquivo:
+        novo = storage.save(nome, arquivo)
+    ja_existia = storage._indice().objects.filter(nome=novo, referencias__gt=1).exists()
+    return novo, ja_existia
+
+
+def apagar_nome_antigo(nome, novo, storage=armazenamento_fotos):
+    """Remove o arquivo antigo e leva os derivados para o nome novo (ou descarta, se o novo já tem)."""
+    from .imagens import PASTA_DERIVADOS
+
+    antigos = storage.path(f"{PASTA_DERIVADOS}/{os.path.splitext(nome)[0]}")
+    novos = storage.path(f"{PASTA_DERIVADOS}/{os.path.splitext(novo)[0]}")
+    if os.path.isdir(antigos):
+        if os.path.isdir(novos):
+            shutil.rmtree(antigos)
+        else:
+            os.makedirs(os.path.dirname(novos), exist_ok=True)
+            os.replace(antigos, novos)
+    # FileSystemStorage.delete: o delete deste storage ignora nomes antigos
+    FileSystemStorage.delete(storage, nome)
@@ -0,0 +1,70 @@
+"""
+Busca textual de carros (PostgreSQL full-text + trigramas).
+
+Cada carro guarda em `busca_vetor` um tsvector com o nome (peso A), marca,
+modelo e versão (peso B) e a descrição (peso D), na configuração
+`portugues_sem_acento` (stemming em português + unaccent). A busca casa
+pelo tsvector (índice GIN) ou por semelhança de trigramas no nome (índice
+GIN trgm), o que tolera erros de digitação como "corola" → Corolla.
+
+As funções aceitam querysets de Carro ou de CarroListagem; neste caso a
+busca é feita em Carro e ligada pelo id, que é o mesmo nas duas tabelas.
+"""
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast
+
+from .models import Carro, Marca, ModeloVeiculo, VersaoVeiculo
+
+# Criada na migração 0014 (cópia da configuração portuguese com unaccent)
+CONFIG_BUSCA = "portugues_sem_acento"
+
+
+def vetor_busca():
+    """Expressão que calcula o tsvector de cada carro direto no banco."""
+    marca = Subquery(Marca.objects.filter(pk=OuterRef("marca_id")).values("nome")[:1])
+    modelo = Subquery(ModeloVeiculo.objects.filter(pk=OuterRef("modelo_id")).values("nome")[:1])
+    versao = Subquery(VersaoVeiculo.objects.filter(pk=OuterRef("versao_id")).values("nome")[:1])
+
+    return (
+        SearchVector("nome", config=CONFIG_BUSCA, weight="A")
+        + SearchVector(marca, modelo, versao, config=CONFIG_BUSCA, weight="B")
+        + SearchVector("descricao", config=CONFIG_BUSCA, weight="D")
+    )
+
+
+def atualizar_vetor_busca(carros):
+    """Recalcula o `busca_vetor` dos carros do queryset com um único UPDATE."""
+    return carros.update(busca_vetor=vetor_busca())
+
+
+def _consulta(termo):
+    return SearchQuery(termo, config=CONFIG_BUSCA, search_type="websearch")
+
+
+def filtrar_busca(carros, termo):
+    """Carros que casam com o termo pelo texto completo ou por semelhança no nome."""
+    condicao = Q(busca_vetor=_consulta(termo)) | Q(nome__trigram_word_similar=termo)
+    if carros.model is Carro:
+        return carros.filter(condicao)
+    return carros.filter(id__in=Carro.objects.filter(condicao).values("id"))
+
+
+def anotar_relevancia(carros, termo):
+    """
+    Anota `relevancia` (inteiro, maior = mais relevante) combinando o rank do
+    full-text com a semelhança de trigramas. É inteiro para servir de chave
+    estável na paginação por cursor.
+    """
+    pontuacao = SearchRank(F("busca_vetor"), _consulta(termo)) + TrigramWordSimilarity(termo, "nome")
+    relevancia = Cast(pontuacao * Value(1000), output_field=IntegerField())
+    if carros.model is not Carro:
+        relevancia = Subquery(
+            Carro.objects.filter(pk=OuterRef("id")).annotate(relevancia=relevancia).values("relevancia")[:1]
+        )
+    return carros.annotate(relevancia=relevancia)
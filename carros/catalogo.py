@@ -0,0 +1,55 @@
+"""
+Catálogo das opções dos filtros (marcas, cidades, portas e anos).
+
+Essas listas só mudam quando o estoque muda, então ficam no cache sob uma
+chave versionada. Os sinais de Carro, Marca, Loja e Cidade (carros.signals)
+incrementam a versão; a próxima leitura recarrega o catálogo uma única vez
+e as demais requisições não consultam o banco para montar os dropdowns.
+"""
+import time
+
+from django.core.cache import cache
+
+from garagens.models import Cidade
+from .models import Carro, Marca
+
+CHAVE_VERSAO = "catalogo:versao"
+TEMPO_CACHE = 60 * 60 * 24  # 1 dia (versões antigas expiram sozinhas)
+
+
+def versao_catalogo():
+    """Versão atual do catálogo. Outros caches derivados do estoque usam na chave."""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # Começa pelo timestamp para não reaproveitar chaves antigas se o cache for limpo
+        cache.add(CHAVE_VERSAO, int(time.time()), None)
+        versao = cache.get(CHAVE_VERSAO, int(time.time()))
+    return versao
+
+
+def invalidar_catalogo():
+    """Descarta o catálogo atual (e os caches que dependem da versão)."""
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, int(time.time()), None)
+
+
+def opcoes_filtros():
+    """
+    Retorna {"marcas": [(id, nome)], "cidades": [(id, nome, estado)],
+    "portas": [int], "anos": [int]}, ordenados para exibição.
+    """
+    chave = f"catalogo:opcoes:{versao_catalogo()}"
+    opcoes = cache.get(chave)
+    if opcoes is not None:
+        return opcoes
+
+    opcoes = {
+        "marcas": list(Marca.objects.order_by("nome").values_list("id", "nome")),
+        "cidades": list(Cidade.objects.order_by("nome").values_list("id", "nome", "estado")),
+        "portas": list(Carro.objects.order_by("portas").values_list("portas", flat=True).distinct()),
+        "anos": list(Carro.objects.order_by("ano").values_list("ano", flat=True).distinct()),
+    }
+    cache.set(chave, opcoes, TEMPO_CACHE)
+    return opcoes
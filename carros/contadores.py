@@ -0,0 +1,101 @@
+"""
+Contador de visualizações dos carros com escrita em lote.
+
+A página de detalhe não grava no banco: só soma 1 em um contador em memória
+do processo. A thread de carros.lotes descarrega os acumulados a cada
+poucos segundos com um único UPDATE ... SET visualizacoes =
+visualizacoes + delta (em Carro e em CarroListagem). Como cada processo soma
+o próprio delta no valor do banco, nenhum incremento se perde entre
+workers, e um carro popular não vira uma fila de UPDATEs na mesma linha.
+A mesma descarga soma o delta no total do dia (EstatisticaDiariaCarro).
+
+Se o processo morrer sem descarregar, perdem-se no máximo os últimos
+segundos de contagem. Ao encerrar normalmente, o saldo é gravado.
+"""
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .lotes import garantir_thread, registrar_descarga
+from .models import Carro, CarroListagem, EstatisticaDiariaCarro
+
+logger = logging.getLogger(__name__)
+
+_pendentes = Counter()
+_trava = threading.Lock()
+
+
+def registrar_visualizacao(carro_id):
+    """Conta uma visualização do carro. Não acessa o banco."""
+    with _trava:
+        _pendentes[carro_id] += 1
+    garantir_thread()
+
+
+def _soma(deltas, chave="id"):
+    """Expressão visualizacoes + delta, agrupando os carros que têm o mesmo delta."""
+    por_delta = defaultdict(list)
+    for carro_id, delta in deltas.items():
+        por_delta[delta].append(carro_id)
+
+    return F("visualizacoes") + Case(
+        *(When(**{f"{chave}__in": ids}, then=Value(delta)) for delta, ids in por_delta.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+@registrar_descarga
+def descarregar():
+    """
+    Grava os acumulados no banco e zera o buffer. Retorna quantos carros foram
+    atualizados. Em caso de erro, os deltas voltam para o buffer.
+    """
+    with _trava:
+        deltas = dict(_pendentes)
+        _pendentes.clear()
+    if not deltas:
+        return 0
+
+    try:
+        with transaction.atomic():
+            # Trava as linhas sempre na mesma ordem: dois processos
+            # descarregando ao mesmo tempo não entram em deadlock
+            ids = list(
+                Carro.objects.filter(id__in=deltas).order_by("id")
+                .select_for_update().values_list("id", flat=True)
+            )
+            Carro.objects.filter(id__in=ids).update(visualizacoes=_soma(deltas))
+            CarroListagem.objects.filter(id__in=ids).update(visualizacoes=_soma(deltas))
+
+            # Total do dia na estatística diária (cria as linhas que faltam)
+            hoje = timezone.localdate()
+            EstatisticaDiariaCarro.objects.bulk_create(
+                [EstatisticaDiariaCarro(carro_id=carro_id, dia=hoje) for carro_id in ids],
+                ignore_conflicts=True,
+            )
+            EstatisticaDiariaCarro.objects.filter(dia=hoje, carro_id__in=ids).update(
+                visualizacoes=_soma(deltas, chave="carro_id")
+            )
+    except DatabaseError:
+        logger.exception("Falha ao gravar visualizações; tentando de novo na próxima descarga")
+        with _trava:
+            _pendentes.update(deltas)
+        return 0
+
+    return len(ids)
+
+
+def _apos_fork():
+    # Cada worker (gunicorn) começa com buffer e trava próprios
+    global _trava
+    _trava = threading.Lock()
+    _pendentes.clear()
+
+
+os.register_at_fork(after_in_child=_apos_fork)
@@ -0,0 +1,109 @@
+"""
+Consolidação diária das visitas e limpeza das linhas antigas.
+
+A descarga do histórico (carros.historico) grava uma linha em
+VisitaDiariaCarro por dia, carro e usuário. A consolidação conta, para cada
+dia já encerrado desde a última execução (marca d'água em
+ProgressoConsolidacao), quantos usuários distintos viram cada carro, e
+grava em EstatisticaDiariaCarro. Só dias completos são consolidados, então
+cada dia é contado uma única vez.
+
+O histórico (VisualizacaoCarro) não serve para isso: tem uma linha por
+usuário e carro com a visita mais recente e é aparado nos últimos 50.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .historico import atualizar_totais
+from .models import EstatisticaDiariaCarro, ProgressoConsolidacao, VisitaDiariaCarro, VisualizacaoCarro
+
+CONSOLIDACAO_USUARIOS = "usuarios_unicos"
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+
+def consolidar_usuarios_unicos(lote=2000):
+    """
+    Consolida os dias encerrados ainda não processados.
+    Retorna (primeiro_dia, ultimo_dia, linhas_gravadas), ou None se não há dia novo.
+    """
+    ontem = timezone.localdate() - datetime.timedelta(days=1)
+    progresso = ProgressoConsolidacao.objects.filter(nome=CONSOLIDACAO_USUARIOS).first()
+
+    if progresso:
+        primeiro_dia = progresso.processado_ate + datetime.timedelta(days=1)
+    else:
+        mais_antiga = VisitaDiariaCarro.objects.order_by("dia").first()
+        if mais_antiga is None:
+            return None
+        primeiro_dia = mais_antiga.dia
+
+    if primeiro_dia > ontem:
+        return None
+
+    contagens = (
+        VisitaDiariaCarro.objects.filter(dia__gte=primeiro_dia, dia__lte=ontem)
+        .values("carro_id", "dia")
+        .annotate(total=Count("usuario_id"))
+        .order_by()
+    )
+
+    linhas = [
+        EstatisticaDiariaCarro(carro_id=linha["carro_id"], dia=linha["dia"], usuarios_unicos=linha["total"])
+        for linha in contagens
+    ]
+
+    with transaction.atomic():
+        EstatisticaDiariaCarro.objects.bulk_create(
+            linhas,
+            batch_size=lote,
+            update_conflicts=True,
+            unique_fields=["carro", "dia"],
+            update_fields=["usuarios_unicos"],
+        )
+        ProgressoConsolidacao.objects.update_or_create(
+            nome=CONSOLIDACAO_USUARIOS, defaults={"processado_ate": ontem}
+        )
+
+    return primeiro_dia, ontem, len(linhas)
+
+
+def _podar_visitas_diarias(processado_ate, lote):
+    """Apaga as visitas diárias dos dias já consolidados (não servem para mais nada)."""
+    consolidadas = VisitaDiariaCarro.objects.filter(dia__lte=processado_ate)
+    while True:
+        ids = list(consolidadas.values_list("id", flat=True)[:lote])
+        if not ids:
+            break
+        VisitaDiariaCarro.objects.filter(id__in=ids).delete()
+
+
+def podar_historico(dias, lote=5000):
+    """
+    Apaga, em lotes de `lote` linhas, o histórico mais antigo que `dias` dias
+    e que já foi consolidado, e as visitas diárias consolidadas. Retorna
+    quantas linhas do histórico foram apagadas.
+    """
+    limite = timezone.now() - datetime.timedelta(days=dias)
+
+    progresso = ProgressoConsolidacao.objects.filter(nome=CONSOLIDACAO_USUARIOS).first()
+    if progresso is None:
+        return 0  # Nada consolidado ainda: não apaga nada
+    _podar_visitas_diarias(progresso.processado_ate, lote)
+    limite = min(limite, _inicio_do_dia(progresso.processado_ate + datetime.timedelta(days=1)))
+
+    antigas = VisualizacaoCarro.objects.filter(data_visualizacao__lt=limite)
+    total = 0
+    while True:
+        linhas = list(antigas.order_by("data_visualizacao").values_list("id", "usuario_id")[:lote])
+        if not linhas:
+            break
+        apagadas, _ = VisualizacaoCarro.objects.filter(id__in=[linha_id for linha_id, _ in linhas]).delete()
+        atualizar_totais({usuario_id for _, usuario_id in linhas})
+        total += apagadas
+    return total
@@ -0,0 +1,74 @@
+"""
+Escrita de favoritos sem SELECT prévio no Favorito.
+
+As duas funções travam a linha do usuário (SELECT ... FOR UPDATE em
+auth_user) antes de mexer nos favoritos dele: dois cliques ou duas
+sincronizações do mesmo usuário rodam um depois do outro, então alternar
+duas vezes sempre volta ao estado inicial. Usuários diferentes não se
+esperam.
+
+A FK do Favorito é verificada no COMMIT (PostgreSQL, deferrable): se o
+carro for apagado no meio, o IntegrityError aparece na saída do atomic e
+é tratado aqui.
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .models import Carro, Favorito
+from .personalizacao import invalidar, marcar_favorito
+
+
+def _travar_usuario(usuario_id):
+    User.objects.select_for_update().filter(id=usuario_id).values_list("id", flat=True).first()
+
+
+def alternar_favorito(usuario_id, carro_id):
+    """
+    Favorita ou desfavorita o carro. Retorna True (favoritado), False
+    (removido) ou None se o carro não existe.
+    """
+    try:
+        with transaction.atomic():
+            _travar_usuario(usuario_id)
+            apagados, _ = Favorito.objects.filter(usuario_id=usuario_id, carro_id=carro_id).delete()
+            if not apagados:
+                if not Carro.objects.filter(id=carro_id).exists():
+                    return None
+                Favorito.objects.create(usuario_id=usuario_id, carro_id=carro_id)
+    except IntegrityError:
+        return None  # Carro apagado antes do commit
+
+    marcar_favorito(usuario_id, carro_id, not apagados)
+    return not apagados
+
+
+def alterar_favoritos(usuario_id, adicionar=(), remover=()):
+    """
+    Inclui e remove vários favoritos de uma vez (ids inexistentes são
+    ignorados). Idempotente: repetir a chamada não muda o resultado.
+    Retorna a lista de ids favoritados após a alteração.
+    """
+    adicionar = set(adicionar) - set(remover)
+
+    # Segunda tentativa só se um carro for apagado entre a conferência e o commit
+    for tentativa in range(2):
+        try:
+            with transaction.atomic():
+                _travar_usuario(usuario_id)
+                if remover:
+                    Favorito.objects.filter(usuario_id=usuario_id, carro_id__in=remover).delete()
+                if adicionar:
+                    existentes = Carro.objects.filter(id__in=adicionar).values_list("id", flat=True)
+                    Favorito.objects.bulk_create(
+                        [Favorito(usuario_id=usuario_id, carro_id=carro_id) for carro_id in existentes],
+                        ignore_conflicts=True,
+                    )
+            break
+        except IntegrityError:
+            if tentativa:
+                raise
+
+    invalidar(usuario_id)
+    return list(
+        Favorito.objects.filter(usuario_id=usuario_id).order_by("-criado_em").values_list("carro_id", flat=True)
+    )
@@ -0,0 +1,151 @@
+"""
+Fila das fotos a processar, no próprio banco.
+
+A fila são as linhas com status "processando" (Carro.foto_status e
+FotoCarro.status, com índices parciais). Cada lote passa por três passos,
+e nenhuma linha fica travada enquanto as fotos são geradas:
+
+1. Reclamar: numa transação curta, SELECT ... FOR UPDATE SKIP LOCKED das
+   linhas livres, que recebem a data da reclamação e uma tentativa a mais;
+   COMMIT. Vários workers rodam juntos sem pegar a mesma foto, e o
+   editar_carro e a descarga dos contadores não esperam o worker.
+2. Gerar as rendições num ProcessPoolExecutor (redimensionar e codificar
+   AVIF/WebP ocupa a CPU), fora de qualquer transação.
+3. Concluir cada foto com um UPDATE condicional (mesmo nome de arquivo e
+   ainda "processando"), em autocommit: foto trocada no meio não é
+   marcada, e cada UPDATE trava uma linha só, sem risco de deadlock.
+
+Os cards da home ficam em cache pela versão do catálogo (sitepublico.vitrine)
+e os UPDATEs não disparam signals: quando alguma foto principal é concluída,
+o lote invalida o catálogo uma vez, depois do COMMIT.
+
+Foto cujo worker morreu volta para a fila depois de PRAZO_RECLAMACAO; a
+que falha (processo do pool derrubado, storage fora) volta na hora. Depois
+de MAX_TENTATIVAS reclamações a foto fica com "erro" e não trava a fila.
+
+A requisição de upload só grava o arquivo original: o tempo de resposta não
+depende mais de quantas fotos foram enviadas. A mesma foto em vários
+anúncios é um arquivo só (carros.armazenamento) e é processada uma vez.
+"""
+import datetime
+import logging
+from concurrent.futures import BrokenExecutor
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .catalogo import invalidar_catalogo
+from .imagens import concluir_carro, concluir_foto, nomes_com_derivados, tentar_gerar
+from .models import IMAGEM_PROCESSANDO, Carro, FotoCarro
+
+logger = logging.getLogger(__name__)
+
+# Fotos principais e fotos extras reclamadas por vez
+LOTE = 8
+
+# Reclamada há mais tempo que isso sem resultado: o worker morreu, a foto volta para a fila
+PRAZO_RECLAMACAO = datetime.timedelta(minutes=10)
+
+# Reclamações da mesma foto antes de desistir (ex.: foto que derruba o processo do pool)
+MAX_TENTATIVAS = 3
+
+# Modelo -> (campo do status, da reclamação, das tentativas, do arquivo)
+CAMPOS_FILA = {
+    Carro: ("foto_status", "foto_reclamada_em", "foto_tentativas", "foto_principal"),
+    FotoCarro: ("status", "reclamado_em", "tentativas", "imagem"),
+}
+
+
+def _reclamar(modelo, lote, *campos):
+    """
+    Pega até `lote` linhas livres da fila e faz o COMMIT. Retorna
+    (reclamadas, esgotadas): listas de (id, nome, *campos); as esgotadas
+    já passaram de MAX_TENTATIVAS e não são geradas de novo.
+    """
+    status, reclamado_em, tentativas, arquivo = CAMPOS_FILA[modelo]
+    livres = Q(**{f"{reclamado_em}__isnull": True}) | Q(**{f"{reclamado_em}__lt": timezone.now() - PRAZO_RECLAMACAO})
+
+    with transaction.atomic():
+        linhas = list(
+            modelo.objects.filter(livres, **{status: IMAGEM_PROCESSANDO})
+            .exclude(**{arquivo: ""})
+            .exclude(**{f"{arquivo}__isnull": True})
+            .order_by("id")
+            .select_for_update(skip_locked=True)
+            .values_list("id", tentativas, arquivo, *campos)[:lote]
+        )
+        reclamadas = [(id_, *resto) for id_, feitas, *resto in linhas if feitas < MAX_TENTATIVAS]
+        esgotadas = [(id_, *resto) for id_, feitas, *resto in linhas if feitas >= MAX_TENTATIVAS]
+        modelo.objects.filter(id__in=[linha[0] for linha in reclamadas]).update(
+            **{reclamado_em: Now(), tentativas: F(tentativas) + 1}
+        )
+    return reclamadas, esgotadas
+
+
+def _devolver(modelo, id_, nome):
+    """Solta a reclamação (a foto volta para a fila na hora), se a foto não mudou."""
+    status, reclamado_em, _, arquivo = CAMPOS_FILA[modelo]
+    modelo.objects.filter(**{"pk": id_, arquivo: nome, status: IMAGEM_PROCESSANDO}).update(**{reclamado_em: None})
+
+
+def _gerar(executor, nomes):
+    """
+    Nome -> True/False (tentar_gerar), ou None se a geração nem terminou.
+    Se o pool quebrou, o BrokenExecutor volta junto para quem chamou
+    recriar o pool.
+    """
+    futuros = {nome: executor.submit(tentar_gerar, nome) for nome in nomes}
+    resultados, quebrado = {}, None
+    for nome, futuro in futuros.items():
+        try:
+            resultados[nome] = futuro.result()
+        except Exception as erro:
+            logger.exception("Falha ao processar %s; a foto volta para a fila", nome)
+            resultados[nome] = None
+            if isinstance(erro, BrokenExecutor):
+                quebrado = erro
+    return resultados, quebrado
+
+
+def processar_pendentes(executor, lote=LOTE):
+    """
+    Processa até `lote` fotos principais e `lote` fotos extras da fila.
+    `executor` é um concurrent.futures.Executor (submit). Retorna quantas
+    fotos foram processadas (0 = fila vazia). Se um processo do pool morrer,
+    conclui o lote e levanta BrokenExecutor.
+    """
+    carros, carros_esgotados = _reclamar(Carro, lote)
+    fotos, fotos_esgotadas = _reclamar(FotoCarro, lote, "carro_id")
+
+    cards_mudaram = False
+    for carro_id, nome in carros_esgotados:
+        cards_mudaram |= concluir_carro(carro_id, nome, False)
+    for foto_id, nome, carro_id in fotos_esgotadas:
+        concluir_foto(foto_id, carro_id, nome, False)
+
+    nomes = [nome for _, nome in carros] + [nome for _, nome, _ in fotos]
+    # Arquivo repetido (mesma foto em vários anúncios) é gerado uma vez
+    prontos = nomes_com_derivados(nomes)
+    resultados, quebrado = _gerar(executor, [nome for nome in dict.fromkeys(nomes) if nome not in prontos])
+
+    for carro_id, nome in carros:
+        ok = resultados.get(nome, True)
+        if ok is None:
+            _devolver(Carro, carro_id, nome)
+        else:
+            cards_mudaram |= concluir_carro(carro_id, nome, ok)
+    for foto_id, nome, carro_id in fotos:
+        ok = resultados.get(nome, True)
+        if ok is None:
+            _devolver(FotoCarro, foto_id, nome)
+        else:
+            concluir_foto(foto_id, carro_id, nome, ok)
+
+    if cards_mudaram:
+        # Uma vez por lote: a home remonta os blocos com as rendições novas
+        transaction.on_commit(invalidar_catalogo)
+    if quebrado is not None:
+        raise quebrado
+    return len(nomes) + len(carros_esgotados) + len(fotos_esgotadas)
@@ -1,5 +1,34 @@
 from django import forms
+from PIL import Image
 from carros.models import Carro, ModeloVeiculo, VersaoVeiculo, CategoriaVeiculo, Marca
+from carros.catalogo import opcoes_filtros
+from carros.ingestao import sondar_imagem, verificar_imagem
+
+
+class FotoField(forms.ImageField):
+    """
+    ImageField que sonda a foto uma vez (carros.ingestao) em vez de abrir e
+    verificar com o Pillow: os metadados ficam no arquivo para o validador
+    do modelo. Arquivo truncado ou corrompido é recusado por
+    verificar_imagem, que não decodifica os pixels.
+    """
+
+    def to_python(self, data):
+        # FileField.to_python: checa nome e tamanho, sem abrir a imagem
+        f = super(forms.ImageField, self).to_python(data)
+        if f is None:
+            return None
+        try:
+            metadados = sondar_imagem(f)
+            verificar_imagem(f)
+        except Exception as exc:
+            # Mesmo tratamento do forms.ImageField (Pillow levanta vários tipos)
+            raise forms.ValidationError(
+                self.error_messages["invalid_image"],
+                code="invalid_image",
+            ) from exc
+        f.content_type = Image.MIME.get(metadados.formato)
+        return f
 
 
 class CarroForm(forms.ModelForm):
@@ -21,6 +50,7 @@ class CarroForm(forms.ModelForm):
             "descricao",
             "foto_principal",
         ]
+        field_classes = {"foto_principal": FotoField}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -28,6 +58,8 @@ class CarroForm(forms.ModelForm):
         # Categorias e marcas ordenadas
         # self.fields["categoria"].queryset = CategoriaVeiculo.objects.all().order_by("nome")  # Temporariamente desabilitado
         self.fields["marca"].queryset = Marca.objects.all().order_by("nome")
+        # Opções do select vêm do catálogo em cache (o queryset só é usado ao validar)
+        self.fields["marca"].choices = [("", self.fields["marca"].empty_label)] + opcoes_filtros()["marcas"]
 
         # ------------------------------
         #   MODELOS
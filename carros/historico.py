@@ -0,0 +1,200 @@
+"""
+Histórico de visualizações (VisualizacaoCarro) gravado em lote.
+
+A página de detalhe só anota (usuário, carro, data, ip) em um buffer em
+memória; repetições do mesmo par dentro da janela viram uma entrada só,
+com a data mais recente. A thread de carros.lotes grava o buffer com um
+único INSERT ... ON CONFLICT (usuario, carro) DO UPDATE, em vez de um
+SELECT + INSERT/UPDATE por visita dentro da requisição.
+
+O histórico de cada usuário guarda só os LIMITE_HISTORICO carros vistos
+mais recentemente: a mesma descarga apaga os excedentes e atualiza o total
+guardado no perfil (PerfilUsuario.historico_total).
+
+A descarga também anota o par em VisitaDiariaCarro (dia, carro, usuário,
+sem sobrescrever), de onde carros.estatisticas conta os usuários únicos do
+dia: o histórico em si perde quem voltou ao carro ou saiu dos últimos 50.
+
+Visitas de carros ou usuários apagados antes da descarga são descartadas.
+Só uma falha do banco em si (conexão, timeout) devolve o lote ao buffer, até
+LIMITE_PENDENTES visitas. Erro nos dados não volta ao buffer: o lote é
+gravado de novo sem as visitas recusadas (no fim, uma a uma).
+"""
+import ipaddress
+import logging
+import os
+import threading
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, DataError, IntegrityError, transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from usuarios.models import PerfilUsuario
+
+from .lotes import garantir_thread, registrar_descarga
+from .models import Carro, VisitaDiariaCarro, VisualizacaoCarro
+from .personalizacao import marcar_visto
+
+logger = logging.getLogger(__name__)
+
+# Carros distintos guardados no histórico de cada usuário
+LIMITE_HISTORICO = 50
+
+# (usuario_id, carro_id) -> (data_visualizacao, ip_address)
+_pendentes = {}
+_trava = threading.Lock()
+
+# Teto do buffer quando o banco está fora: acima disso as visitas antigas não voltam
+LIMITE_PENDENTES = 50000
+
+
+def ip_valido(ip_address):
+    """O IP normalizado, ou None se não for um endereço (ex.: X-Forwarded-For forjado)."""
+    try:
+        return str(ipaddress.ip_address((ip_address or "").strip()))
+    except ValueError:
+        return None
+
+
+def registrar_visita(usuario_id, carro_id, ip_address=None):
+    """Anota a visita no buffer e no estado pessoal do usuário (cache). Não grava no banco."""
+    with _trava:
+        _pendentes[(usuario_id, carro_id)] = (timezone.now(), ip_valido(ip_address))
+    garantir_thread()
+    # O selo "já visto" aparece antes mesmo da gravação em lote
+    marcar_visto(usuario_id, carro_id)
+
+
+def descartar_usuario(usuario_id):
+    """Tira do buffer as visitas ainda não gravadas do usuário (ao limpar o histórico)."""
+    with _trava:
+        for chave in [chave for chave in _pendentes if chave[0] == usuario_id]:
+            del _pendentes[chave]
+
+
+def _existentes(visitas):
+    """Só as visitas cujo carro e usuário ainda existem."""
+    carros = set(Carro.objects.filter(id__in={carro_id for _, carro_id in visitas}).values_list("id", flat=True))
+    usuarios = set(User.objects.filter(id__in={usuario_id for usuario_id, _ in visitas}).values_list("id", flat=True))
+    return {
+        (usuario_id, carro_id): valor
+        for (usuario_id, carro_id), valor in visitas.items()
+        if carro_id in carros and usuario_id in usuarios
+    }
+
+
+@registrar_descarga
+def descarregar():
+    """
+    Grava o buffer (insert ou update da data e do ip). Retorna quantas linhas
+    foram gravadas.
+    """
+    with _trava:
+        visitas = dict(_pendentes)
+        _pendentes.clear()
+    if not visitas:
+        return 0
+
+    try:
+        try:
+            return _gravar(visitas)
+        except (IntegrityError, DataError):
+            # Ex.: carro apagado entre a conferência e o INSERT. A nova tentativa
+            # confere os ids de novo; se ainda falhar, grava visita por visita
+            logger.warning("Lote do histórico recusado; gravando de novo sem as visitas inválidas")
+            try:
+                return _gravar(visitas)
+            except (IntegrityError, DataError):
+                return _gravar_uma_a_uma(visitas)
+    except DatabaseError:
+        logger.exception("Falha ao gravar o histórico de visualizações; tentando de novo na próxima descarga")
+        with _trava:
+            # Visitas novas que chegaram durante a falha têm prioridade
+            vagas = max(LIMITE_PENDENTES - len(_pendentes), 0)
+            devolvidas = [(chave, valor) for chave, valor in visitas.items() if chave not in _pendentes][:vagas]
+            _pendentes.update(devolvidas)
+        return 0
+
+
+def _gravar(visitas):
+    """Grava as visitas cujo carro e usuário existem, numa transação. Retorna quantas."""
+    with transaction.atomic():
+        gravar = _existentes(visitas)
+        VisualizacaoCarro.objects.bulk_create(
+            [
+                VisualizacaoCarro(usuario_id=usuario_id, carro_id=carro_id, data_visualizacao=data, ip_address=ip)
+                for (usuario_id, carro_id), (data, ip) in sorted(gravar.items())
+            ],
+            update_conflicts=True,
+            unique_fields=["usuario", "carro"],
+            update_fields=["data_visualizacao", "ip_address"],
+        )
+        VisitaDiariaCarro.objects.bulk_create(
+            [
+                VisitaDiariaCarro(dia=timezone.localdate(data), carro_id=carro_id, usuario_id=usuario_id)
+                for (usuario_id, carro_id), (data, _) in sorted(gravar.items())
+            ],
+            ignore_conflicts=True,
+        )
+        usuarios = {usuario_id for usuario_id, _ in gravar}
+        aparar_historico(usuarios)
+        atualizar_totais(usuarios)
+    return len(gravar)
+
+
+def _gravar_uma_a_uma(visitas):
+    """Último recurso: só a visita que o banco recusa é descartada."""
+    gravadas = 0
+    for chave, valor in sorted(visitas.items()):
+        try:
+            gravadas += _gravar({chave: valor})
+        except (IntegrityError, DataError):
+            logger.exception("Visita descartada do histórico: usuário %s, carro %s", *chave)
+    return gravadas
+
+
+def aparar_historico(usuario_ids):
+    """Apaga, de cada usuário, as visualizações além das LIMITE_HISTORICO mais recentes."""
+    excedentes = list(
+        VisualizacaoCarro.objects.filter(usuario_id__in=usuario_ids)
+        .annotate(posicao=Window(
+            RowNumber(),
+            partition_by=F("usuario_id"),
+            order_by=[F("data_visualizacao").desc(), F("id").desc()],
+        ))
+        .filter(posicao__gt=LIMITE_HISTORICO)
+        .values_list("id", flat=True)
+    )
+    if excedentes:
+        VisualizacaoCarro.objects.filter(id__in=excedentes).delete()
+    return len(excedentes)
+
+
+def atualizar_totais(usuario_ids):
+    """Grava em PerfilUsuario.historico_total quantos carros cada usuário tem no histórico."""
+    usuario_ids = sorted(set(usuario_ids) - {None})
+    totais = dict(
+        VisualizacaoCarro.objects.filter(usuario_id__in=usuario_ids)
+        .order_by()
+        .values("usuario_id")
+        .annotate(total=Count("id"))
+        .values_list("usuario_id", "total")
+    )
+    PerfilUsuario.objects.bulk_create(
+        [PerfilUsuario(usuario_id=usuario_id, historico_total=totais.get(usuario_id, 0)) for usuario_id in usuario_ids],
+        update_conflicts=True,
+        unique_fields=["usuario"],
+        update_fields=["historico_total"],
+    )
+
+
+def _apos_fork():
+    # Cada worker (gunicorn) começa com buffer e trava próprios
+    global _trava
+    _trava = threading.Lock()
+    _pendentes.clear()
+
+
+os.register_at_fork(after_in_child=_apos_fork)
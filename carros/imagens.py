@@ -0,0 +1,147 @@
+"""
+Versões redimensionadas (derivados) das fotos dos carros.
+
+Cada foto enviada ganha RENDICOES larguras fixas, cada uma em AVIF (quando o
+Pillow tem suporte), WebP e JPEG. A orientação do EXIF é aplicada nos
+pixels e nenhum metadado é copiado (GPS do celular, modelo da câmera...).
+
+As rendições são geradas fora da requisição (carros.fila_imagens); até lá
+a foto fica com status "processando".
+
+Os arquivos ficam num caminho derivado do nome original
+(carros/fotos/abc.jpg -> derivados/carros/fotos/abc/card.webp), então a URL
+de qualquer derivado sai do nome da foto, sem consulta. As templates usam a
+tag imagem_responsiva (carros_tags), que monta o <picture> com srcset e cai
+para o arquivo original enquanto os derivados não existem.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models.functions import Now
+from PIL import Image, ImageOps, features
+
+from .models import IMAGEM_ERRO, IMAGEM_PROCESSANDO, IMAGEM_PRONTA, Carro, CarroListagem, FotoCarro
+
+logger = logging.getLogger(__name__)
+
+# Nome -> largura máxima em pixels (nunca amplia: fotos menores ficam no tamanho original)
+RENDICOES = {
+    "thumb": 160,
+    "card": 480,
+    "full": 1200,
+    "retina": 2400,
+}
+
+# Ordem do <picture>: o navegador usa o primeiro formato que suporta
+FORMATOS = (["avif"] if features.check("avif") else []) + ["webp", "jpeg"]
+
+TIPOS = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+EXTENSOES = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+OPCOES_FORMATO = {
+    "avif": {"quality": 60, "speed": 8},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+}
+
+# Derivados de fotos por conteúdo (carros.armazenamento) vão com Cache-Control
+# immutable: ao mudar RENDICOES ou OPCOES_FORMATO, troque a pasta ("derivados2")
+# e rode gerar_derivados_fotos --todas, senão os navegadores ficam com os antigos
+PASTA_DERIVADOS = "derivados"
+
+
+def caminho_derivado(nome, rendicao, formato):
+    """Nome no storage do derivado de uma foto (nome = FieldFile.name)."""
+    base, _ = os.path.splitext(nome)
+    return f"{PASTA_DERIVADOS}/{base}/{rendicao}.{EXTENSOES[formato]}"
+
+
+def url_derivado(nome, rendicao, formato, storage=default_storage):
+    return storage.url(caminho_derivado(nome, rendicao, formato))
+
+
+def _abrir(arquivo, largura_maxima):
+    imagem = Image.open(arquivo)
+    # JPEG: decodifica já reduzido (1/2, 1/4, 1/8) quando a foto é muito maior que o derivado maior
+    imagem.draft("RGB", (largura_maxima, largura_maxima))
+    imagem = ImageOps.exif_transpose(imagem)
+    return imagem.convert("RGB")
+
+
+def _gravar(storage, caminho, conteudo):
+    # Derivados são regravados no mesmo nome (o storage renomearia um arquivo novo)
+    if storage.exists(caminho):
+        storage.delete(caminho)
+    storage.save(caminho, ContentFile(conteudo))
+
+
+def gerar_derivados(nome, storage=default_storage):
+    """
+    Gera todas as rendições da foto `nome` e grava no storage.
+    Retorna quantos arquivos foram gravados.
+    """
+    with storage.open(nome, "rb") as arquivo:
+        imagem = _abrir(arquivo, max(RENDICOES.values()))
+
+    gravados = 0
+    # Da maior para a menor: cada uma é reduzida a partir da anterior (menos pixels por redução)
+    for rendicao, largura in sorted(RENDICOES.items(), key=lambda item: -item[1]):
+        if imagem.width > largura:
+            imagem = imagem.resize((largura, round(imagem.height * largura / imagem.width)), Image.LANCZOS)
+        for formato in FORMATOS:
+            saida = BytesIO()
+            # Sem exif/icc_profile: nada dos metadados do original vai para o derivado
+            imagem.save(saida, formato, **OPCOES_FORMATO[formato])
+            _gravar(storage, caminho_derivado(nome, rendicao, formato), saida.getvalue())
+            gravados += 1
+    return gravados
+
+
+def nomes_com_derivados(nomes):
+    """
+    Dos `nomes`, os que já têm derivados prontos: a mesma foto (mesmo
+    arquivo por conteúdo) em outro anúncio não é processada de novo.
+    """
+    return set(
+        Carro.objects.filter(foto_principal__in=nomes, foto_status=IMAGEM_PRONTA).values_list("foto_principal", flat=True)
+    ) | set(
+        FotoCarro.objects.filter(imagem__in=nomes, status=IMAGEM_PRONTA).values_list("imagem", flat=True)
+    )
+
+
+def tentar_gerar(nome):
+    """
+    gerar_derivados que não propaga erro de imagem: retorna True/False.
+    Roda nos processos do pool de carros.fila_imagens (só usa o storage).
+    """
+    try:
+        gerar_derivados(nome)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Falha ao gerar os derivados de %s", nome)
+        return False
+    return True
+
+
+# As duas funções abaixo rodam fora de transação (carros.fila_imagens): cada
+# UPDATE trava só a própria linha. Só marcam se a foto não foi trocada (nem
+# marcada por outro worker) enquanto os derivados eram gerados.
+def concluir_carro(carro_id, nome, ok):
+    """Marca a foto principal como pronta (ou com erro) e atualiza o card. Retorna se marcou."""
+    marcados = Carro.objects.filter(pk=carro_id, foto_principal=nome, foto_status=IMAGEM_PROCESSANDO).update(
+        foto_status=IMAGEM_PRONTA if ok else IMAGEM_ERRO, foto_reclamada_em=None, atualizado_em=Now()
+    )
+    if marcados:
+        CarroListagem.objects.filter(id=carro_id).update(foto_nome=nome, foto_derivados=ok, atualizado_em=Now())
+    return bool(marcados)
+
+
+def concluir_foto(foto_id, carro_id, nome, ok):
+    """Marca a foto extra como pronta (ou com erro) e renova a página do carro."""
+    marcadas = FotoCarro.objects.filter(pk=foto_id, imagem=nome, status=IMAGEM_PROCESSANDO).update(
+        status=IMAGEM_PRONTA if ok else IMAGEM_ERRO, reclamado_em=None
+    )
+    if marcadas:
+        Carro.objects.filter(pk=carro_id).update(atualizado_em=Now())
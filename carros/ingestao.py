@@ -0,0 +1,162 @@
+"""
+Ingestão das fotos enviadas: cada upload é sondado uma vez.
+
+sondar_imagem lê só o cabeçalho (Image.open não decodifica os pixels) e
+guarda formato, largura, altura e tamanho no próprio UploadedFile
+(arquivo.metadados_imagem), voltando o ponteiro para o início. Quem vem
+depois usa o que já está guardado: o FotoField do CarroForm (no lugar do
+Image.open + verify do forms.ImageField), o validador
+validar_proporcao_imagem do modelo e os laços das views do logista.
+
+No painel do logista o FotoUploadHandler (logistas.uploads) já leu o
+cabeçalho enquanto o arquivo chegava e deixa os metadados prontos: a foto
+não é aberta de novo na requisição. Os derivados são gerados em outro
+processo (carros.fila_imagens), que decodifica a foto uma vez só.
+
+O cabeçalho não mostra arquivo truncado ou corrompido. verificar_imagem faz
+uma conferência barata do arquivo inteiro, também uma vez por upload e sem
+decodificar os pixels: CRC dos chunks no PNG (Image.verify), marcador de
+fim depois do scan no JPEG (segmentos percorridos pelo tamanho) e tamanho
+do RIFF no WebP.
+
+O comando benchmark_ingestao mede o tempo de CPU por upload antes e depois.
+"""
+from collections import namedtuple
+
+from django.db.models.fields.files import FieldFile
+from PIL import Image
+
+MetadadosImagem = namedtuple("MetadadosImagem", "formato largura altura tamanho")
+
+ATRIBUTO = "metadados_imagem"
+ATRIBUTO_VERIFICADA = "imagem_verificada"
+
+# Pedaço lido por vez na procura do fim do JPEG
+PEDACO_LEITURA = 1024 * 1024
+
+# Final do JPEG onde o marcador de fim é procurado primeiro
+CAUDA_JPEG = 64 * 1024
+
+# Marcadores sem campo de tamanho (TEM e RST0 a RST7)
+MARCADORES_SEM_TAMANHO = {bytes([0x01])} | {bytes([codigo]) for codigo in range(0xD0, 0xD8)}
+
+
+def _enviado(arquivo):
+    # No validador do modelo chega o FieldFile; o upload ainda não gravado fica em .file
+    return arquivo.file if isinstance(arquivo, FieldFile) else arquivo
+
+
+def guardar_metadados(arquivo, metadados):
+    setattr(_enviado(arquivo), ATRIBUTO, metadados)
+
+
+def sondar_imagem(arquivo):
+    """
+    MetadadosImagem do upload, lendo o cabeçalho só na primeira chamada.
+    Arquivo que não é imagem propaga o erro do Pillow (OSError,
+    DecompressionBombError...) e não fica guardado.
+    """
+    arquivo = _enviado(arquivo)
+    metadados = getattr(arquivo, ATRIBUTO, None)
+    if metadados is not None:
+        return metadados
+
+    arquivo.seek(0)
+    try:
+        with Image.open(arquivo) as imagem:
+            metadados = MetadadosImagem(imagem.format, imagem.width, imagem.height, arquivo.size)
+    finally:
+        arquivo.seek(0)
+    setattr(arquivo, ATRIBUTO, metadados)
+    return metadados
+
+
+def _inicio_do_scan(arquivo):
+    """
+    Percorre os segmentos do JPEG pelos campos de tamanho (SOI, APPn, DQT,
+    SOF, DHT...) até o primeiro SOS. Retorna a posição logo depois do
+    cabeçalho do SOS, ou None se o arquivo acaba antes. O que está dentro dos
+    segmentos (ex.: a miniatura do EXIF no APP1, com FFDA e FFD9 próprios)
+    não é olhado.
+    """
+    if arquivo.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        if arquivo.read(1) != b"\xff":
+            return None
+        marcador = arquivo.read(1)
+        while marcador == b"\xff":  # bytes de preenchimento entre segmentos
+            marcador = arquivo.read(1)
+        if not marcador or marcador == b"\xd9":
+            return None
+        if marcador in MARCADORES_SEM_TAMANHO:
+            continue
+        tamanho = arquivo.read(2)
+        if len(tamanho) < 2 or int.from_bytes(tamanho, "big") < 2:
+            return None
+        fim = arquivo.tell() + int.from_bytes(tamanho, "big") - 2
+        if fim > arquivo.size:
+            return None
+        arquivo.seek(fim)
+        if marcador == b"\xda":
+            return fim
+
+
+def _jpeg_completo(arquivo):
+    """
+    O JPEG tem o marcador de fim (FFD9) depois do cabeçalho do primeiro SOS.
+    Dentro do scan todo 0xFF vem seguido de 0x00 ou de um marcador de
+    reinício, então um FFD9 ali só existe se o arquivo chegou inteiro. Só o
+    final do arquivo é lido; dados extras depois do fim (como os de
+    celulares) maiores que CAUDA_JPEG caem na leitura do scan inteiro.
+    """
+    inicio = _inicio_do_scan(arquivo)
+    if inicio is None:
+        return False
+    cauda = max(inicio, arquivo.size - CAUDA_JPEG)
+    arquivo.seek(cauda)
+    if b"\xff\xd9" in arquivo.read():
+        return True
+    if cauda == inicio:
+        return False
+
+    arquivo.seek(inicio)
+    anterior = b""
+    for pedaco in iter(lambda: arquivo.read(PEDACO_LEITURA), b""):
+        dados = anterior + pedaco
+        if b"\xff\xd9" in dados:
+            return True
+        anterior = dados[-1:]
+    return False
+
+
+def _webp_completo(arquivo):
+    """O tamanho declarado no RIFF (bytes 4 a 8) bate com o do arquivo."""
+    cabecalho = arquivo.read(8)
+    return len(cabecalho) == 8 and int.from_bytes(cabecalho[4:8], "little") + 8 <= arquivo.size
+
+
+def verificar_imagem(arquivo):
+    """
+    Confere se a foto não está truncada ou corrompida, uma vez por upload.
+    Propaga o erro (OSError, SyntaxError) como o Image.verify do Pillow.
+    """
+    arquivo = _enviado(arquivo)
+    if getattr(arquivo, ATRIBUTO_VERIFICADA, False):
+        return
+    formato = sondar_imagem(arquivo).formato
+
+    arquivo.seek(0)
+    try:
+        if formato == "JPEG":
+            if not _jpeg_completo(arquivo):
+                raise OSError("JPEG truncado (sem o marcador de fim)")
+        elif formato == "WEBP":
+            if not _webp_completo(arquivo):
+                raise OSError("WebP truncado (menor que o tamanho do RIFF)")
+        else:
+            with Image.open(arquivo) as imagem:
+                imagem.verify()
+    finally:
+        arquivo.seek(0)
+    setattr(arquivo, ATRIBUTO_VERIFICADA, True)
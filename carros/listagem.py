@@ -0,0 +1,69 @@
+"""
+Sincronização do modelo de leitura CarroListagem.
+
+Os sinais de carros, lojas, marcas e cidades chamam estas funções para
+manter a cópia dos cards em dia; o comando atualizar_listagem usa as
+mesmas funções para reconstruir a tabela inteira em lotes.
+"""
+from django.utils import timezone
+
+from .models import Carro, CarroListagem
+
+CAMPOS_ATUALIZADOS = [
+    "loja", "marca", "cidade",
+    "nome", "ano", "km", "preco", "portas", "combustivel", "cambio", "destacado", "visualizacoes",
+    "marca_nome", "loja_nome", "cidade_nome", "cidade_estado",
+    "foto_url", "foto_nome", "foto_derivados", "atualizado_em",
+]
+
+
+def linha_listagem(carro):
+    """Monta o CarroListagem de um carro (com marca, loja e cidade já carregadas)."""
+    cidade = carro.loja.cidade
+    return CarroListagem(
+        id=carro.id,
+        loja_id=carro.loja_id,
+        marca_id=carro.marca_id,
+        cidade_id=cidade.id if cidade else None,
+        nome=carro.nome,
+        ano=carro.ano,
+        km=carro.km,
+        preco=carro.preco,
+        portas=carro.portas,
+        combustivel=carro.combustivel,
+        cambio=carro.cambio,
+        destacado=carro.destacado,
+        visualizacoes=carro.visualizacoes,
+        marca_nome=carro.marca.nome,
+        loja_nome=carro.loja.nome,
+        cidade_nome=cidade.nome if cidade else "",
+        cidade_estado=cidade.estado if cidade else "",
+        foto_url=carro.foto_principal.url if carro.foto_principal else "",
+        foto_nome=carro.foto_principal.name if carro.foto_principal else "",
+        foto_derivados=bool(carro.foto_principal) and carro.foto_pronta,
+        atualizado_em=timezone.now(),
+    )
+
+
+def sincronizar_listagem(carros):
+    """
+    Grava (insert ou update) as linhas de listagem dos carros do queryset
+    em um único INSERT ... ON CONFLICT. Retorna quantas linhas foram gravadas.
+    """
+    linhas = [
+        linha_listagem(carro)
+        for carro in carros.select_related("marca", "loja", "loja__cidade")
+    ]
+    CarroListagem.objects.bulk_create(
+        linhas,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=CAMPOS_ATUALIZADOS,
+    )
+    return len(linhas)
+
+
+def remover_orfaos():
+    """Apaga linhas de listagem cujo carro não existe mais."""
+    apagados, _ = CarroListagem.objects.exclude(id__in=Carro.objects.values("id")).delete()
+    return apagados
@@ -0,0 +1,63 @@
+"""
+Thread de fundo que descarrega os buffers em memória no banco.
+
+Módulos que acumulam escritas fora da requisição (carros.contadores,
+carros.historico) registram aqui a função que grava o próprio buffer.
+Cada processo tem uma única thread, iniciada na primeira escrita
+acumulada, que chama todas as funções a cada INTERVALO_DESCARGA segundos.
+No encerramento normal do processo, todas são chamadas uma última vez.
+"""
+import atexit
+import os
+import threading
+
+from django.db import connection
+
+INTERVALO_DESCARGA = 10  # segundos
+
+_descargas = []
+_trava = threading.Lock()
+_thread = None
+
+
+def registrar_descarga(funcao):
+    """Inclui `funcao` (sem argumentos) nas descargas periódicas e na saída do processo."""
+    _descargas.append(funcao)
+    atexit.register(funcao)
+    return funcao
+
+
+def descarregar_tudo():
+    for funcao in _descargas:
+        funcao()
+
+
+def _laco():
+    evento = threading.Event()
+    while not evento.wait(INTERVALO_DESCARGA):
+        try:
+            descarregar_tudo()
+        finally:
+            # A thread tem conexão própria; não a deixa aberta entre descargas
+            connection.close()
+
+
+def garantir_thread():
+    """Inicia a thread de descarga uma vez por processo."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _trava:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_laco, name="descarga-lotes", daemon=True)
+            _thread.start()
+
+
+def _apos_fork():
+    # Cada worker (gunicorn) inicia a própria thread
+    global _trava, _thread
+    _trava = threading.Lock()
+    _thread = None
+
+
+os.register_at_fork(after_in_child=_apos_fork)
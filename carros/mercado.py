@@ -0,0 +1,183 @@
+"""
+Preço de mercado: mediana e quartis dos preços anunciados por modelo/versão e ano.
+
+O comando atualizar_precos_mercado lê (modelo, versão, ano, cidade, preço) de
+todo o estoque numa consulta e calcula as faixas com NumPy, sem GROUP BY
+por faixa: ordena por (faixa, preço) e tira os percentis de todas as faixas
+de uma vez pelas posições dentro de cada grupo. Depois compara com
+EstatisticaPreco e só grava as faixas que mudaram (novas, alteradas e as
+que ficaram sem carros).
+
+A página do carro e o formulário do logista leem até quatro linhas do
+índice (modelo, ano) e usam a faixa mais específica com amostras
+suficientes.
+"""
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Carro, EstatisticaPreco
+
+# Da faixa mais específica para a mais geral (todas por modelo e ano)
+NIVEIS = (("versao", "cidade"), ("versao",), ("cidade",), ())
+
+# Faixas com menos anúncios que isso não são exibidas
+MINIMO_AMOSTRAS = 5
+
+# Diferença (em %) até a qual o preço é considerado "na média"
+TOLERANCIA_MEDIA = 2
+
+QUANTIS = (0.25, 0.5, 0.75)
+CAMPOS = ("modelo_id", "versao_id", "ano", "loja__cidade_id", "preco")
+VALORES = ("quantidade", "p25", "mediana", "p75")
+
+CHAVE_VERSAO = "mercado:versao"
+
+
+def versao_precos():
+    """Muda quando alguma faixa muda (vai no ETag da página do carro)."""
+    return cache.get(CHAVE_VERSAO, 0)
+
+
+def _percentis(grupos, precos):
+    """
+    Quantidade e QUANTIS (interpolação linear, como np.percentile) de cada
+    grupo 0..g-1, calculados para todos os grupos de uma vez.
+    """
+    ordem = np.lexsort((precos, grupos))
+    precos = precos[ordem]
+    quantidade = np.bincount(grupos)
+    inicio = np.cumsum(quantidade) - quantidade
+
+    resultado = []
+    for quantil in QUANTIS:
+        posicao = quantil * (quantidade - 1)
+        baixo = np.floor(posicao).astype(np.int64)
+        alto = np.ceil(posicao).astype(np.int64)
+        menor, maior = precos[inicio + baixo], precos[inicio + alto]
+        resultado.append(menor + (maior - menor) * (posicao - baixo))
+    return quantidade, resultado
+
+
+def _decimal(valor):
+    return Decimal(f"{valor:.2f}")
+
+
+def calcular_faixas(linhas):
+    """
+    Recebe as linhas de CAMPOS e retorna
+    {(modelo_id, versao_id, ano, cidade_id): (quantidade, p25, mediana, p75)},
+    com versao_id / cidade_id None nas faixas que juntam versões / cidades.
+    """
+    if not linhas:
+        return {}
+    colunas = dict(zip(CAMPOS, zip(*linhas)))
+    # Sem modelo, versão ou cidade: -1 (o carro fica fora das faixas que usam o campo)
+    modelo = np.array([-1 if valor is None else valor for valor in colunas["modelo_id"]], dtype=np.int64)
+    versao = np.array([-1 if valor is None else valor for valor in colunas["versao_id"]], dtype=np.int64)
+    cidade = np.array([-1 if valor is None else valor for valor in colunas["loja__cidade_id"]], dtype=np.int64)
+    ano = np.array(colunas["ano"], dtype=np.int64)
+    precos = np.array(colunas["preco"], dtype=np.float64)
+    todas = np.full(len(ano), -1, dtype=np.int64)
+
+    faixas = {}
+    for nivel in NIVEIS:
+        usa_versao, usa_cidade = "versao" in nivel, "cidade" in nivel
+        mascara = modelo >= 0
+        if usa_versao:
+            mascara &= versao >= 0
+        if usa_cidade:
+            mascara &= cidade >= 0
+        if not mascara.any():
+            continue
+
+        chaves = np.column_stack([
+            modelo, versao if usa_versao else todas, ano, cidade if usa_cidade else todas,
+        ])[mascara]
+        distintas, grupos = np.unique(chaves, axis=0, return_inverse=True)
+        quantidade, (p25, mediana, p75) = _percentis(grupos.ravel(), precos[mascara])
+
+        for (modelo_id, versao_id, ano_faixa, cidade_id), valores in zip(
+            distintas.tolist(), zip(quantidade.tolist(), p25.tolist(), mediana.tolist(), p75.tolist())
+        ):
+            chave = (modelo_id, versao_id if usa_versao else None, ano_faixa, cidade_id if usa_cidade else None)
+            faixas[chave] = (valores[0], *map(_decimal, valores[1:]))
+    return faixas
+
+
+def atualizar_precos_mercado(lote=2000):
+    """
+    Recalcula as faixas e grava só as diferenças.
+    Retorna (criadas, alteradas, removidas).
+    """
+    linhas = list(Carro.objects.values_list(*CAMPOS).order_by().iterator(chunk_size=10000))
+    faixas = calcular_faixas(linhas)
+    del linhas
+
+    atuais = {
+        (modelo_id, versao_id, ano, cidade_id): (pk, tuple(valores))
+        for pk, modelo_id, versao_id, ano, cidade_id, *valores in EstatisticaPreco.objects.values_list(
+            "pk", "modelo_id", "versao_id", "ano", "cidade_id", *VALORES
+        ).iterator(chunk_size=10000)
+    }
+
+    criar, alterar = [], []
+    for chave, valores in faixas.items():
+        pk, anteriores = atuais.pop(chave, (None, None))
+        if anteriores == valores:
+            continue
+        modelo_id, versao_id, ano, cidade_id = chave
+        estatistica = EstatisticaPreco(
+            pk=pk, modelo_id=modelo_id, versao_id=versao_id, ano=ano, cidade_id=cidade_id,
+            **dict(zip(VALORES, valores)),
+        )
+        (criar if pk is None else alterar).append(estatistica)
+    remover = [pk for pk, _ in atuais.values()]
+
+    with transaction.atomic():
+        EstatisticaPreco.objects.bulk_create(criar, batch_size=lote)
+        EstatisticaPreco.objects.bulk_update(alterar, VALORES, batch_size=lote)
+        for inicio in range(0, len(remover), lote):
+            EstatisticaPreco.objects.filter(pk__in=remover[inicio:inicio + lote]).delete()
+
+    if criar or alterar or remover:
+        cache.set(CHAVE_VERSAO, int(time.time()), None)
+    return len(criar), len(alterar), len(remover)
+
+
+def preco_de_mercado(carro, cidade_id=None):
+    """
+    Compara o preço do carro com a faixa mais específica que tem pelo menos
+    MINIMO_AMOSTRAS anúncios. Retorna {"estatistica", "percentual",
+    "situacao" ("abaixo", "acima" ou "media")} ou None sem faixa. Uma consulta.
+    """
+    if carro.modelo_id is None or carro.preco is None:
+        return None
+
+    versoes = Q(versao__isnull=True)
+    if carro.versao_id:
+        versoes |= Q(versao_id=carro.versao_id)
+    cidades = Q(cidade__isnull=True)
+    if cidade_id:
+        cidades |= Q(cidade_id=cidade_id)
+
+    faixas = EstatisticaPreco.objects.filter(
+        versoes, cidades, modelo_id=carro.modelo_id, ano=carro.ano, quantidade__gte=MINIMO_AMOSTRAS
+    )
+    # Mesma ordem de NIVEIS: versão pesa mais que cidade
+    estatistica = max(
+        faixas, key=lambda faixa: (faixa.versao_id is not None, faixa.cidade_id is not None), default=None
+    )
+    if estatistica is None or not estatistica.mediana:
+        return None
+
+    diferenca = (carro.preco - estatistica.mediana) / estatistica.mediana * 100
+    if abs(diferenca) <= TOLERANCIA_MEDIA:
+        situacao = "media"
+    else:
+        situacao = "abaixo" if diferenca < 0 else "acima"
+    return {"estatistica": estatistica, "percentual": round(abs(diferenca)), "situacao": situacao}
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def criar_configuracao_busca(apps, schema_editor):
+    """Configuração de texto em português que ignora acentos (usada por carros.busca)."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE TEXT SEARCH CONFIGURATION portugues_sem_acento (COPY = portuguese)"
+    )
+    schema_editor.execute(
+        "ALTER TEXT SEARCH CONFIGURATION portugues_sem_acento "
+        "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem"
+    )
+
+
+def remover_configuracao_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS portugues_sem_acento")
+
+
+def preencher_busca_vetor(apps, schema_editor):
+    """
+    Calcula o vetor dos carros que já existem (mesma expressão de
+    carros.busca.vetor_busca, com os modelos históricos da migração).
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Carro = apps.get_model("carros", "Carro")
+    Marca = apps.get_model("carros", "Marca")
+    ModeloVeiculo = apps.get_model("carros", "ModeloVeiculo")
+    VersaoVeiculo = apps.get_model("carros", "VersaoVeiculo")
+
+    marca = Subquery(Marca.objects.filter(pk=OuterRef("marca_id")).values("nome")[:1])
+    modelo = Subquery(ModeloVeiculo.objects.filter(pk=OuterRef("modelo_id")).values("nome")[:1])
+    versao = Subquery(VersaoVeiculo.objects.filter(pk=OuterRef("versao_id")).values("nome")[:1])
+    Carro.objects.update(
+        busca_vetor=(
+            SearchVector("nome", config="portugues_sem_acento", weight="A")
+            + SearchVector(marca, modelo, versao, config="portugues_sem_acento", weight="B")
+            + SearchVector("descricao", config="portugues_sem_acento", weight="D")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0013_visualizacaocarro'),
+        ('garagens', '0005_loja_facebook_loja_instagram_loja_maps_url_loja_site_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(criar_configuracao_busca, remover_configuracao_busca),
+        migrations.AddField(
+            model_name='carro',
+            name='busca_vetor',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_busca_vetor, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='carro',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busca_vetor'], name='carro_busca_vetor_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nome'], name='carro_nome_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
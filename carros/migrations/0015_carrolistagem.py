@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_listagem(apps, schema_editor):
+    """Carga inicial da listagem (depois disso, sinais e o comando atualizar_listagem)."""
+    Carro = apps.get_model('carros', 'Carro')
+    CarroListagem = apps.get_model('carros', 'CarroListagem')
+
+    linhas = []
+    for carro in Carro.objects.select_related('marca', 'loja', 'loja__cidade').iterator(chunk_size=2000):
+        cidade = carro.loja.cidade
+        linhas.append(CarroListagem(
+            id=carro.id,
+            loja_id=carro.loja_id,
+            marca_id=carro.marca_id,
+            cidade_id=cidade.id if cidade else None,
+            nome=carro.nome,
+            ano=carro.ano,
+            km=carro.km,
+            preco=carro.preco,
+            portas=carro.portas,
+            combustivel=carro.combustivel,
+            cambio=carro.cambio,
+            destacado=carro.destacado,
+            marca_nome=carro.marca.nome,
+            loja_nome=carro.loja.nome,
+            cidade_nome=cidade.nome if cidade else '',
+            cidade_estado=cidade.estado if cidade else '',
+            foto_url=carro.foto_principal.url if carro.foto_principal else '',
+        ))
+        if len(linhas) >= 2000:
+            CarroListagem.objects.bulk_create(linhas)
+            linhas = []
+
+    CarroListagem.objects.bulk_create(linhas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0014_carro_busca_vetor'),
+        ('garagens', '0005_loja_facebook_loja_instagram_loja_maps_url_loja_site_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarroListagem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=100)),
+                ('ano', models.IntegerField()),
+                ('km', models.PositiveIntegerField(default=0)),
+                ('preco', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('portas', models.PositiveSmallIntegerField(default=4)),
+                ('combustivel', models.CharField(choices=[('gasolina', 'Gasolina'), ('etanol', 'Etanol'), ('flex', 'Flex'), ('diesel', 'Diesel'), ('eletrico', 'Elétrico'), ('hibrido', 'Híbrido')], max_length=20)),
+                ('cambio', models.CharField(choices=[('manual', 'Manual'), ('automatico', 'Automático'), ('cvt', 'CVT'), ('automatizado', 'Automatizado')], max_length=20)),
+                ('destacado', models.BooleanField(default=False)),
+                ('marca_nome', models.CharField(max_length=50)),
+                ('loja_nome', models.CharField(max_length=100)),
+                ('cidade_nome', models.CharField(blank=True, max_length=100)),
+                ('cidade_estado', models.CharField(blank=True, max_length=2)),
+                ('foto_url', models.CharField(blank=True, max_length=255)),
+                ('cidade', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='garagens.cidade')),
+                ('loja', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='garagens.loja')),
+                ('marca', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='carros.marca')),
+            ],
+            options={
+                'verbose_name': 'Carro (listagem)',
+                'verbose_name_plural': 'Carros (listagem)',
+            },
+        ),
+        migrations.RunPython(preencher_listagem, migrations.RunPython.noop),
+    ]
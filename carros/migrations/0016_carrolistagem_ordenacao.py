@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copiar_visualizacoes(apps, schema_editor):
+    Carro = apps.get_model('carros', 'Carro')
+    CarroListagem = apps.get_model('carros', 'CarroListagem')
+    CarroListagem.objects.update(
+        visualizacoes=models.Subquery(
+            Carro.objects.filter(pk=models.OuterRef('id')).values('visualizacoes')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0015_carrolistagem'),
+        ('garagens', '0005_loja_facebook_loja_instagram_loja_maps_url_loja_site_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrolistagem',
+            name='visualizacoes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(copiar_visualizacoes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='carrolistagem',
+            name='marca',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='carros.marca'),
+        ),
+        migrations.AddIndex(
+            model_name='carrolistagem',
+            index=models.Index(fields=['preco', 'id'], name='listagem_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carrolistagem',
+            index=models.Index(fields=['km', 'id'], name='listagem_km_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carrolistagem',
+            index=models.Index(fields=['ano', 'id'], name='listagem_ano_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carrolistagem',
+            index=models.Index(fields=['visualizacoes', 'id'], name='listagem_visualizacoes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carrolistagem',
+            index=models.Index(fields=['marca', 'id'], name='listagem_marca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carrolistagem',
+            index=models.Index(fields=['marca', 'preco', 'id'], name='listagem_marca_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carrolistagem',
+            index=models.Index(fields=['marca', 'ano', 'id'], name='listagem_marca_ano_idx'),
+        ),
+    ]
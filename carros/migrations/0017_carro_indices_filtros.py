@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:15
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação,
+    # mas não bloqueia escritas na tabela de carros enquanto o índice é criado
+    atomic = False
+
+    dependencies = [
+        ('carros', '0016_carrolistagem_ordenacao'),
+        ('garagens', '0005_loja_facebook_loja_instagram_loja_maps_url_loja_site_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='carro',
+            index=models.Index(fields=['preco'], name='carro_preco_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carro',
+            index=models.Index(fields=['marca', 'preco'], name='carro_marca_preco_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carro',
+            index=models.Index(fields=['ano', 'preco'], name='carro_ano_preco_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carro',
+            index=models.Index(fields=['marca', 'ano'], name='carro_marca_ano_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carro',
+            index=models.Index(condition=models.Q(('combustivel', 'flex'), _negated=True), fields=['combustivel', 'cambio'], name='carro_combustivel_cambio_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carro',
+            index=models.Index(condition=models.Q(('destacado', True)), fields=['-id'], name='carro_destacados_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0017_carro_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='carrolistagem',
+            name='atualizado_em',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:41
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remover_duplicadas(apps, schema_editor):
+    """Mantém só a visualização mais recente de cada (usuário, carro)."""
+    VisualizacaoCarro = apps.get_model('carros', 'VisualizacaoCarro')
+    mais_recentes = (
+        VisualizacaoCarro.objects.filter(
+            usuario=models.OuterRef('usuario'), carro=models.OuterRef('carro')
+        )
+        .order_by('-data_visualizacao', '-id')
+        .values('id')[:1]
+    )
+    (
+        VisualizacaoCarro.objects.filter(usuario__isnull=False)
+        .exclude(id=models.Subquery(mais_recentes))
+        .delete()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0018_carro_atualizado_em'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visualizacaocarro',
+            name='data_visualizacao',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(remover_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='visualizacaocarro',
+            constraint=models.UniqueConstraint(fields=('usuario', 'carro'), name='visualizacao_usuario_carro_unica'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0019_visualizacaocarro_unica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaDiariaCarro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('visualizacoes', models.PositiveIntegerField(default=0)),
+                ('usuarios_unicos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Estatística diária',
+                'verbose_name_plural': 'Estatísticas diárias',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProgressoConsolidacao',
+            fields=[
+                ('nome', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('processado_ate', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='visualizacaocarro',
+            index=models.Index(fields=['data_visualizacao'], name='visualizacao_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='estatisticadiariacarro',
+            name='carro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas_diarias', to='carros.carro'),
+        ),
+        migrations.AddIndex(
+            model_name='estatisticadiariacarro',
+            index=models.Index(fields=['dia'], name='estatistica_dia_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='estatisticadiariacarro',
+            constraint=models.UniqueConstraint(fields=('carro', 'dia'), name='estatistica_carro_dia_unica'),
+        ),
+    ]
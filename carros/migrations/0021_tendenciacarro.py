@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0020_estatisticadiariacarro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progressoconsolidacao',
+            name='processado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='progressoconsolidacao',
+            name='processado_ate',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TendenciaCarro',
+            fields=[
+                ('carro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tendencia', serialize=False, to='carros.carro')),
+                ('pontuacao', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Tendência',
+                'verbose_name_plural': 'Tendências',
+                'indexes': [models.Index(fields=['-pontuacao'], name='tendencia_pontuacao_idx')],
+            },
+        ),
+    ]
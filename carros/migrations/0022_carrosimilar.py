@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0021_tendenciacarro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarroSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField()),
+                ('distancia', models.FloatField()),
+                ('carro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='carros.carro')),
+                ('similar', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='carros.carrolistagem')),
+            ],
+            options={
+                'verbose_name': 'Carro parecido',
+                'verbose_name_plural': 'Carros parecidos',
+                'ordering': ['carro', 'posicao'],
+                'constraints': [models.UniqueConstraint(fields=('carro', 'posicao'), name='similar_carro_posicao_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0022_carrosimilar'),
+        ('garagens', '0006_loja_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaPreco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.IntegerField()),
+                ('quantidade', models.PositiveIntegerField()),
+                ('p25', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mediana', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('p75', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cidade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='garagens.cidade')),
+                ('modelo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas_preco', to='carros.modeloveiculo')),
+                ('versao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='carros.versaoveiculo')),
+            ],
+            options={
+                'verbose_name': 'Preço de mercado',
+                'verbose_name_plural': 'Preços de mercado',
+                'indexes': [models.Index(fields=['modelo', 'ano'], name='estatistica_preco_modelo_idx')],
+            },
+        ),
+    ]
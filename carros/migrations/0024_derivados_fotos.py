@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0023_estatisticapreco'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='foto_derivados',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='carrolistagem',
+            name='foto_derivados',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='carrolistagem',
+            name='foto_nome',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='fotocarro',
+            name='derivados',
+            field=models.BooleanField(default=False),
+        ),
+    ]
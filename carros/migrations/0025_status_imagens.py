@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+def copiar_status(apps, schema_editor):
+    """Fotos com derivados ficam prontas; as demais entram na fila do processar_fotos."""
+    Carro = apps.get_model('carros', 'Carro')
+    FotoCarro = apps.get_model('carros', 'FotoCarro')
+    Carro.objects.filter(foto_derivados=True).update(foto_status='pronto')
+    FotoCarro.objects.filter(derivados=True).update(status='pronto')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0024_derivados_fotos'),
+        ('garagens', '0006_loja_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='foto_status',
+            field=models.CharField(choices=[('processando', 'Processando'), ('pronto', 'Pronto'), ('erro', 'Erro')], default='processando', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='fotocarro',
+            name='status',
+            field=models.CharField(choices=[('processando', 'Processando'), ('pronto', 'Pronto'), ('erro', 'Erro')], default='processando', max_length=12),
+        ),
+        migrations.RunPython(copiar_status, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='carro',
+            name='foto_derivados',
+        ),
+        migrations.RemoveField(
+            model_name='fotocarro',
+            name='derivados',
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(condition=models.Q(('foto_status', 'processando')), fields=['id'], name='carro_foto_processando_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fotocarro',
+            index=models.Index(condition=models.Q(('status', 'processando')), fields=['id'], name='foto_processando_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:49
+
+import carros.armazenamento
+import carros.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0025_status_imagens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoFoto',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=255)),
+                ('tamanho', models.PositiveBigIntegerField()),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='carro',
+            name='foto_principal',
+            field=models.ImageField(blank=True, null=True, storage=carros.armazenamento.ArmazenamentoPorConteudo(), upload_to='carros/', validators=[carros.models.validar_proporcao_imagem]),
+        ),
+        migrations.AlterField(
+            model_name='fotocarro',
+            name='imagem',
+            field=models.ImageField(storage=carros.armazenamento.ArmazenamentoPorConteudo(), upload_to='carros/fotos/', validators=[carros.models.validar_proporcao_imagem]),
+        ),
+    ]
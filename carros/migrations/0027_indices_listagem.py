@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:59
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Os filtros da listagem passam a ter índices só em CarroListagem, a tabela
+    # que a página e as facetas leem. CONCURRENTLY: sem bloquear escritas
+    atomic = False
+
+    dependencies = [
+        ('carros', '0026_armazenamento_por_conteudo'),
+        ('garagens', '0006_loja_atualizado_em'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='carro',
+            name='carro_preco_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='carro',
+            name='carro_marca_preco_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='carro',
+            name='carro_ano_preco_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='carro',
+            name='carro_marca_ano_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='carro',
+            name='carro_combustivel_cambio_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='carro',
+            name='carro_destacados_idx',
+        ),
+        migrations.AlterField(
+            model_name='carrolistagem',
+            name='cidade',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='garagens.cidade'),
+        ),
+        AddIndexConcurrently(
+            model_name='carrolistagem',
+            index=models.Index(fields=['cidade', 'id'], name='listagem_cidade_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carrolistagem',
+            index=models.Index(fields=['cidade', 'preco', 'id'], name='listagem_cidade_preco_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carrolistagem',
+            index=models.Index(condition=models.Q(('combustivel', 'flex'), _negated=True), fields=['combustivel', 'cambio', 'id'], name='listagem_combustivel_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='carrolistagem',
+            index=models.Index(condition=models.Q(('destacado', True)), fields=['-id'], name='listagem_destacados_idx'),
+        ),
+    ]
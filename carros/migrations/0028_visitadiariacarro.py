@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:01
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_dias_abertos(apps, schema_editor):
+    """
+    Copia do histórico os dias ainda não consolidados (o melhor que o
+    histórico antigo permite); a partir daqui a descarga grava as visitas.
+    """
+    VisualizacaoCarro = apps.get_model("carros", "VisualizacaoCarro")
+    VisitaDiariaCarro = apps.get_model("carros", "VisitaDiariaCarro")
+    ProgressoConsolidacao = apps.get_model("carros", "ProgressoConsolidacao")
+
+    visitas = VisualizacaoCarro.objects.filter(usuario__isnull=False)
+    progresso = ProgressoConsolidacao.objects.filter(nome="usuarios_unicos").first()
+    if progresso and progresso.processado_ate:
+        dia = progresso.processado_ate + datetime.timedelta(days=1)
+        visitas = visitas.filter(
+            data_visualizacao__gte=timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+        )
+
+    linhas = []
+    for carro_id, usuario_id, data in visitas.values_list("carro_id", "usuario_id", "data_visualizacao").iterator():
+        linhas.append(VisitaDiariaCarro(dia=timezone.localdate(data), carro_id=carro_id, usuario_id=usuario_id))
+        if len(linhas) == 5000:
+            VisitaDiariaCarro.objects.bulk_create(linhas, ignore_conflicts=True)
+            linhas = []
+    VisitaDiariaCarro.objects.bulk_create(linhas, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0027_indices_listagem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitaDiariaCarro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('carro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitas_diarias', to='carros.carro')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitas_diarias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Visita diária',
+                'verbose_name_plural': 'Visitas diárias',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'carro', 'usuario'), name='visita_dia_carro_usuario_unica')],
+            },
+        ),
+        migrations.RunPython(preencher_dias_abertos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:03
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def marcar_pontuadas(apps, schema_editor):
+    """
+    Com o ranking já rodando, as visitas até aqui já entraram pelo histórico:
+    só as que o contador somar daqui em diante passam a contar.
+    """
+    ProgressoConsolidacao = apps.get_model("carros", "ProgressoConsolidacao")
+    EstatisticaDiariaCarro = apps.get_model("carros", "EstatisticaDiariaCarro")
+    if ProgressoConsolidacao.objects.filter(nome="tendencias").exists():
+        EstatisticaDiariaCarro.objects.update(visualizacoes_pontuadas=F("visualizacoes"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0028_visitadiariacarro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estatisticadiariacarro',
+            name='visualizacoes_pontuadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(marcar_pontuadas, migrations.RunPython.noop),
+    ]
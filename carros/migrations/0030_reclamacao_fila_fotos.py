@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0029_visualizacoes_pontuadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='foto_reclamada_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='carro',
+            name='foto_tentativas',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='fotocarro',
+            name='reclamado_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='fotocarro',
+            name='tentativas',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
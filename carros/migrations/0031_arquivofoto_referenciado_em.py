@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carros', '0030_reclamacao_fila_fotos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arquivofoto',
+            name='referenciado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
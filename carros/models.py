@@ -1,16 +1,34 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from garagens.models import Loja
 from django.core.exceptions import ValidationError
 from PIL import Image
+from carros.ingestao import sondar_imagem, verificar_imagem
+from carros.armazenamento import armazenamento_fotos
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 # -----------------------------
 #  VALIDAÇÃO DE IMAGEM
 # -----------------------------
 def validar_proporcao_imagem(imagem):
-    img = Image.open(imagem)
-    largura, altura = img.size
+    # Foto que já está no storage foi validada no envio: não abre o arquivo de novo
+    if getattr(imagem, "_committed", False):
+        return
+    try:
+        # Usa os metadados já lidos no upload/formulário (carros.ingestao)
+        metadados = sondar_imagem(imagem)
+        # Arquivo inteiro (truncado/corrompido), sem decodificar; já feito pelo FotoField
+        verificar_imagem(imagem)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise ValidationError("O arquivo enviado não é uma imagem válida.")
+    verificar_dimensoes(metadados.largura, metadados.altura)
+
+
+def verificar_dimensoes(largura, altura):
+    """Regras de tamanho e proporção (também usadas no upload, logistas.uploads)."""
     proporcao = largura / altura
     menor_dimensao = min(largura, altura)
 
@@ -84,6 +102,35 @@ class VersaoVeiculo(models.Model):
 # -----------------------------
 #  VEÍCULO (antes Carro)
 # -----------------------------
+COMBUSTIVEIS = [
+    ("gasolina", "Gasolina"),
+    ("etanol", "Etanol"),
+    ("flex", "Flex"),
+    ("diesel", "Diesel"),
+    ("eletrico", "Elétrico"),
+    ("hibrido", "Híbrido"),
+]
+
+CAMBIOS = [
+    ("manual", "Manual"),
+    ("automatico", "Automático"),
+    ("cvt", "CVT"),
+    ("automatizado", "Automatizado"),
+]
+
+# Situação das rendições de uma foto (carros.imagens), gerada fora da requisição
+# pelo comando processar_fotos (carros.fila_imagens)
+IMAGEM_PROCESSANDO = "processando"
+IMAGEM_PRONTA = "pronto"
+IMAGEM_ERRO = "erro"
+
+STATUS_IMAGEM = [
+    (IMAGEM_PROCESSANDO, "Processando"),
+    (IMAGEM_PRONTA, "Pronto"),
+    (IMAGEM_ERRO, "Erro"),
+]
+
+
 class Carro(models.Model):
     loja = models.ForeignKey(Loja, on_delete=models.CASCADE, related_name='carros')
 
@@ -101,25 +148,13 @@ class Carro(models.Model):
 
     combustivel = models.CharField(
         max_length=20,
-        choices=[
-            ("gasolina", "Gasolina"),
-            ("etanol", "Etanol"),
-            ("flex", "Flex"),
-            ("diesel", "Diesel"),
-            ("eletrico", "Elétrico"),
-            ("hibrido", "Híbrido"),
-        ],
+        choices=COMBUSTIVEIS,
         default="flex"
     )
 
     cambio = models.CharField(
         max_length=20,
-        choices=[
-            ("manual", "Manual"),
-            ("automatico", "Automático"),
-            ("cvt", "CVT"),
-            ("automatizado", "Automatizado"),
-        ],
+        choices=CAMBIOS,
         default="manual"
     )
 
@@ -129,14 +164,132 @@ class Carro(models.Model):
 
     foto_principal = models.ImageField(
         upload_to='carros/',
+        storage=armazenamento_fotos,
         validators=[validar_proporcao_imagem],
         blank=True, null=True
     )
+    # Rendições da foto principal; até ficarem prontas as páginas usam o original
+    foto_status = models.CharField(max_length=12, choices=STATUS_IMAGEM, default=IMAGEM_PROCESSANDO)
+    # Controle da fila (carros.fila_imagens): quando um worker pegou a foto e quantas vezes
+    foto_reclamada_em = models.DateTimeField(null=True, blank=True, editable=False)
+    foto_tentativas = models.PositiveSmallIntegerField(default=0, editable=False)
 
     visualizacoes = models.IntegerField(default=0)
 
     destacado = models.BooleanField(default=False)
 
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    # Índice de busca textual, mantido por carros.signals e pelo comando reindexar_busca
+    busca_vetor = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # Os filtros da listagem (página, facetas e home) leem CarroListagem,
+        # que tem os índices deles; aqui só a busca textual e a fila de fotos.
+        indexes = [
+            GinIndex(fields=['busca_vetor'], name='carro_busca_vetor_gin'),
+            GinIndex(fields=['nome'], name='carro_nome_trgm', opclasses=['gin_trgm_ops']),
+            # Fila do processar_fotos: só as fotos principais ainda sem rendições
+            models.Index(
+                fields=['id'],
+                name='carro_foto_processando_idx',
+                condition=models.Q(foto_status=IMAGEM_PROCESSANDO),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} ({self.ano})"
+
+    @property
+    def foto_pronta(self):
+        return self.foto_status == IMAGEM_PRONTA
+
+    @property
+    def imagens_processando(self):
+        """Foto principal ou alguma extra ainda sem rendições (usa o prefetch de fotos)."""
+        return (
+            bool(self.foto_principal) and self.foto_status == IMAGEM_PROCESSANDO
+        ) or any(foto.status == IMAGEM_PROCESSANDO for foto in self.fotos.all())
+
+
+# -----------------------------
+#  LISTAGEM (modelo de leitura)
+# -----------------------------
+class CarroListagem(models.Model):
+    """
+    Cópia desnormalizada dos campos do card de um carro, usada pelas páginas
+    públicas (listagem, home, loja) para ler uma única tabela estreita, sem
+    joins com Marca, Loja e Cidade. O id é o mesmo do Carro.
+    Mantida por carros.signals e pelo comando atualizar_listagem.
+    """
+    id = models.BigIntegerField(primary_key=True)
+
+    # Chaves usadas nos filtros (sem constraint: a sincronização cuida da consistência)
+    loja = models.ForeignKey(Loja, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    # Sem índice próprio: os índices compostos abaixo começam por marca
+    marca = models.ForeignKey(
+        Marca, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    # Sem índice próprio: os índices compostos abaixo começam por cidade
+    cidade = models.ForeignKey(
+        'garagens.Cidade', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, db_index=False, related_name='+'
+    )
+
+    nome = models.CharField(max_length=100)
+    ano = models.IntegerField()
+    km = models.PositiveIntegerField(default=0)
+    preco = models.DecimalField(max_digits=10, decimal_places=2)
+    portas = models.PositiveSmallIntegerField(default=4)
+    combustivel = models.CharField(max_length=20, choices=COMBUSTIVEIS)
+    cambio = models.CharField(max_length=20, choices=CAMBIOS)
+    destacado = models.BooleanField(default=False)
+    visualizacoes = models.IntegerField(default=0)
+
+    marca_nome = models.CharField(max_length=50)
+    loja_nome = models.CharField(max_length=100)
+    cidade_nome = models.CharField(max_length=100, blank=True)
+    cidade_estado = models.CharField(max_length=2, blank=True)
+    foto_url = models.CharField(max_length=255, blank=True)
+    # Nome da foto no storage (base das URLs dos derivados) e se eles já existem
+    foto_nome = models.CharField(max_length=255, blank=True)
+    foto_derivados = models.BooleanField(default=False)
+
+    # Versão do card: muda a cada gravação da linha (chave do cache dos cards)
+    atualizado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Carro (listagem)"
+        verbose_name_plural = "Carros (listagem)"
+        # Um índice (coluna, id) por modo de ordenação da listagem, e os mesmos
+        # precedidos de marca e de cidade, os filtros mais comuns. Com eles,
+        # filtro + ordenação + LIMIT vira uma leitura de índice, sem Sort.
+        # "Mais recentes" (-id) usa a chave primária.
+        # portas e câmbio sozinhos têm poucos valores e não compensam um índice.
+        indexes = [
+            models.Index(fields=['preco', 'id'], name='listagem_preco_idx'),
+            models.Index(fields=['km', 'id'], name='listagem_km_idx'),
+            models.Index(fields=['ano', 'id'], name='listagem_ano_idx'),
+            models.Index(fields=['visualizacoes', 'id'], name='listagem_visualizacoes_idx'),
+            models.Index(fields=['marca', 'id'], name='listagem_marca_idx'),
+            models.Index(fields=['marca', 'preco', 'id'], name='listagem_marca_preco_idx'),
+            models.Index(fields=['marca', 'ano', 'id'], name='listagem_marca_ano_idx'),
+            models.Index(fields=['cidade', 'id'], name='listagem_cidade_idx'),
+            models.Index(fields=['cidade', 'preco', 'id'], name='listagem_cidade_preco_idx'),
+            # Flex é a grande maioria: só os combustíveis minoritários são seletivos
+            models.Index(
+                fields=['combustivel', 'cambio', 'id'],
+                name='listagem_combustivel_idx',
+                condition=~models.Q(combustivel='flex'),
+            ),
+            # Bloco "destaques" da home: poucos carros, dos mais recentes para trás
+            models.Index(
+                fields=['-id'],
+                name='listagem_destacados_idx',
+                condition=models.Q(destacado=True),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.nome} ({self.ano})"
 
@@ -146,11 +299,49 @@ class Carro(models.Model):
 # -----------------------------
 class FotoCarro(models.Model):
     carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='fotos')
-    imagem = models.ImageField(upload_to='carros/fotos/', validators=[validar_proporcao_imagem])
+    imagem = models.ImageField(upload_to='carros/fotos/', storage=armazenamento_fotos, validators=[validar_proporcao_imagem])
+    status = models.CharField(max_length=12, choices=STATUS_IMAGEM, default=IMAGEM_PROCESSANDO)
+    # Controle da fila (carros.fila_imagens): quando um worker pegou a foto e quantas vezes
+    reclamado_em = models.DateTimeField(null=True, blank=True, editable=False)
+    tentativas = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Fila do processar_fotos: só as fotos ainda sem rendições
+            models.Index(
+                fields=['id'],
+                name='foto_processando_idx',
+                condition=models.Q(status=IMAGEM_PROCESSANDO),
+            ),
+        ]
 
     def __str__(self):
         return f"Foto de {self.carro.nome}"
 
+    @property
+    def pronta(self):
+        return self.status == IMAGEM_PRONTA
+
+
+# -----------------------------
+#  ARQUIVOS DAS FOTOS (por conteúdo)
+# -----------------------------
+class ArquivoFoto(models.Model):
+    """
+    Índice do armazenamento por conteúdo (carros.armazenamento): um arquivo
+    por hash e quantas fotos (principais e extras) apontam para ele.
+    """
+    hash = models.CharField(max_length=64, primary_key=True)
+    nome = models.CharField(max_length=255)
+    tamanho = models.PositiveBigIntegerField()
+    referencias = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    # Última referência somada: o comando reconciliar_fotos não mexe em uploads recentes
+    referenciado_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nome} ({self.referencias} ref.)"
+
 
 # -----------------------------
 #  FAVORITOS
@@ -171,17 +362,178 @@ class VisualizacaoCarro(models.Model):
     """Histórico de visualizações de carros pelos usuários"""
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='visualizacoes', null=True, blank=True)
     carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='visualizacoes_carro')
-    data_visualizacao = models.DateTimeField(auto_now_add=True)
+    # Preenchida na visita (o histórico é gravado em lote depois, por carros.historico)
+    data_visualizacao = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
 
     class Meta:
         ordering = ['-data_visualizacao']
         indexes = [
             models.Index(fields=['usuario', '-data_visualizacao']),
+            # Faixas de data da consolidação diária e da limpeza de linhas antigas
+            models.Index(fields=['data_visualizacao'], name='visualizacao_data_idx'),
+        ]
+        constraints = [
+            # Uma linha por usuário e carro (chave do INSERT ... ON CONFLICT)
+            models.UniqueConstraint(fields=['usuario', 'carro'], name='visualizacao_usuario_carro_unica'),
         ]
 
     def __str__(self):
         usuario_nome = self.usuario.username if self.usuario else 'Anônimo'
         return f"{usuario_nome} visualizou {self.carro.nome} em {self.data_visualizacao}"
-    
 
+
+# -----------------------------
+#  ESTATÍSTICAS DIÁRIAS
+# -----------------------------
+class EstatisticaDiariaCarro(models.Model):
+    """
+    Visualizações de um carro em um dia. `visualizacoes` é somado pelo
+    contador (carros.contadores) e `usuarios_unicos` pelo comando
+    consolidar_visualizacoes. Relatórios leem esta tabela, não o histórico.
+    `visualizacoes_pontuadas` é quanto de `visualizacoes` o ranking "em alta"
+    (carros.tendencias) já somou.
+    """
+    carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='estatisticas_diarias')
+    dia = models.DateField()
+    visualizacoes = models.PositiveIntegerField(default=0)
+    usuarios_unicos = models.PositiveIntegerField(default=0)
+    visualizacoes_pontuadas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Estatística diária"
+        verbose_name_plural = "Estatísticas diárias"
+        constraints = [
+            models.UniqueConstraint(fields=['carro', 'dia'], name='estatistica_carro_dia_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['dia'], name='estatistica_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.carro} em {self.dia}: {self.visualizacoes} visualizações"
+
+
+class VisitaDiariaCarro(models.Model):
+    """
+    Usuário que viu o carro no dia: uma linha por (dia, carro, usuário),
+    gravada pela descarga do histórico. Diferente de VisualizacaoCarro, nada
+    é sobrescrito nem aparado, então a consolidação conta os usuários únicos
+    de cada dia sem perder quem voltou depois ou saiu dos últimos 50.
+    Dias já consolidados são apagados por podar_historico.
+    """
+    dia = models.DateField()
+    carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='visitas_diarias')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='visitas_diarias')
+
+    class Meta:
+        verbose_name = "Visita diária"
+        verbose_name_plural = "Visitas diárias"
+        constraints = [
+            # Chave do INSERT ... ON CONFLICT DO NOTHING; o índice atende à contagem por dia e carro
+            models.UniqueConstraint(fields=['dia', 'carro', 'usuario'], name='visita_dia_carro_usuario_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} viu {self.carro_id} em {self.dia}"
+
+
+class ProgressoConsolidacao(models.Model):
+    """Até onde cada rotina periódica já processou (marca d'água)."""
+    nome = models.CharField(max_length=50, primary_key=True)
+    # Rotinas diárias usam o dia; as que rodam várias vezes ao dia, o instante
+    processado_ate = models.DateField(null=True, blank=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nome}: {self.processado_ate}"
+
+
+# -----------------------------
+#  EM ALTA
+# -----------------------------
+class TendenciaCarro(models.Model):
+    """
+    Pontuação "em alta" de um carro: visitas e favoritos com peso que cai pela
+    metade a cada meia-vida (carros.tendencias). Guardada em escala log a
+    partir de uma época fixa, então a ordem vale sem reescrever a tabela:
+    só carros com eventos novos são regravados.
+    """
+    carro = models.OneToOneField(Carro, on_delete=models.CASCADE, primary_key=True, related_name='tendencia')
+    pontuacao = models.FloatField()
+
+    class Meta:
+        verbose_name = "Tendência"
+        verbose_name_plural = "Tendências"
+        indexes = [
+            models.Index(fields=['-pontuacao'], name='tendencia_pontuacao_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.carro}: {self.pontuacao:.2f}"
+
+
+# -----------------------------
+#  CARROS PARECIDOS
+# -----------------------------
+class CarroSimilar(models.Model):
+    """
+    Os carros mais parecidos com um carro, em ordem (posicao 0 = mais
+    próximo). Calculada fora da requisição pelo comando calcular_similares
+    (carros.similares); a página do carro lê os cards com um join em
+    CarroListagem, sem consultar Carro.
+    """
+    carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='similares')
+    # Mesmo id do Carro; carros apagados somem do join até o próximo cálculo
+    similar = models.ForeignKey(
+        CarroListagem, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    posicao = models.PositiveSmallIntegerField()
+    distancia = models.FloatField()
+
+    class Meta:
+        verbose_name = "Carro parecido"
+        verbose_name_plural = "Carros parecidos"
+        ordering = ['carro', 'posicao']
+        constraints = [
+            # Também é o índice da leitura da página (carro, posicao)
+            models.UniqueConstraint(fields=['carro', 'posicao'], name='similar_carro_posicao_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.carro_id} → {self.similar_id} ({self.posicao})"
+
+
+# -----------------------------
+#  PREÇO DE MERCADO
+# -----------------------------
+class EstatisticaPreco(models.Model):
+    """
+    Distribuição dos preços anunciados de um modelo (ou de uma versão) em um
+    ano, no país todo (cidade vazia) ou numa cidade. Calculada pelo comando
+    atualizar_precos_mercado (carros.mercado); as páginas só leem.
+    """
+    modelo = models.ForeignKey(ModeloVeiculo, on_delete=models.CASCADE, related_name='estatisticas_preco')
+    # Vazia = todas as versões do modelo
+    versao = models.ForeignKey(VersaoVeiculo, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    ano = models.IntegerField()
+    # Vazia = todas as cidades
+    cidade = models.ForeignKey(
+        'garagens.Cidade', on_delete=models.CASCADE, null=True, blank=True, related_name='+'
+    )
+
+    quantidade = models.PositiveIntegerField()
+    p25 = models.DecimalField(max_digits=10, decimal_places=2)
+    mediana = models.DecimalField(max_digits=10, decimal_places=2)
+    p75 = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Preço de mercado"
+        verbose_name_plural = "Preços de mercado"
+        indexes = [
+            # A página busca as faixas de um modelo e ano (e escolhe a mais específica)
+            models.Index(fields=['modelo', 'ano'], name='estatistica_preco_modelo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.versao or self.modelo} {self.ano}: mediana R$ {self.mediana} ({self.quantidade})"
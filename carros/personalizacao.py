@@ -0,0 +1,78 @@
+"""
+Estado pessoal de cada usuário usado nos cards: ids dos carros favoritados
+e dos já vistos.
+
+Carregado do banco com uma consulta (favoritos UNION ALL histórico) e
+guardado no cache pelo id do usuário. favoritar e o histórico atualizam o
+conjunto guardado na hora, então os selos dos cards não precisam de
+consulta nenhuma.
+
+Cada mudança no conjunto troca a "versao" do estado: páginas com selos usam
+ela no ETag (versao_usuario) em vez de misturar os conjuntos inteiros.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Value
+
+from .models import Favorito, VisualizacaoCarro
+
+TEMPO_CACHE = 60 * 60  # 1 hora (limita o efeito de alguma atualização perdida)
+
+
+def _chave(usuario_id):
+    return f"personalizacao:{usuario_id}"
+
+
+def _carregar(usuario_id):
+    favoritos = Favorito.objects.filter(usuario_id=usuario_id).order_by().values_list(
+        "carro_id", Value(True, output_field=BooleanField())
+    )
+    vistos = VisualizacaoCarro.objects.filter(usuario_id=usuario_id).order_by().values_list(
+        "carro_id", Value(False, output_field=BooleanField())
+    )
+
+    estado = {"favoritos": set(), "vistos": set()}
+    for carro_id, favorito in favoritos.union(vistos, all=True):
+        estado["favoritos" if favorito else "vistos"].add(carro_id)
+    return {**{nome: frozenset(ids) for nome, ids in estado.items()}, "versao": _nova_versao()}
+
+
+def _nova_versao():
+    # Aleatória, não um contador: um estado recarregado depois de sair do
+    # cache nunca repete a versão de antes
+    return uuid.uuid4().hex
+
+
+def estado_usuario(usuario_id):
+    """Retorna {"favoritos": frozenset(ids), "vistos": frozenset(ids), "versao": str} do usuário."""
+    estado = cache.get(_chave(usuario_id))
+    if estado is None:
+        estado = _carregar(usuario_id)
+        cache.set(_chave(usuario_id), estado, TEMPO_CACHE)
+    return estado
+
+
+def _alterar(usuario_id, nome, carro_id, incluir):
+    estado = estado_usuario(usuario_id)
+    ids = (estado[nome] | {carro_id}) if incluir else (estado[nome] - {carro_id})
+    if ids != estado[nome]:
+        cache.set(_chave(usuario_id), {**estado, nome: ids, "versao": _nova_versao()}, TEMPO_CACHE)
+
+
+def versao_usuario(usuario_id):
+    """Muda sempre que os favoritos ou os vistos do usuário mudam."""
+    return estado_usuario(usuario_id)["versao"]
+
+
+def marcar_favorito(usuario_id, carro_id, favoritado):
+    _alterar(usuario_id, "favoritos", carro_id, favoritado)
+
+
+def marcar_visto(usuario_id, carro_id):
+    _alterar(usuario_id, "vistos", carro_id, True)
+
+
+def invalidar(usuario_id):
+    """Descarta o estado guardado; a próxima leitura recarrega do banco."""
+    cache.delete(_chave(usuario_id))
@@ -0,0 +1,211 @@
+"""
+Sinais do app carros.
+"""
+from django.db import transaction
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from garagens.models import Cidade, Loja
+from .armazenamento import armazenamento_fotos
+from .busca import atualizar_vetor_busca
+from .catalogo import invalidar_catalogo
+from .listagem import sincronizar_listagem
+from .models import IMAGEM_PROCESSANDO, Carro, CarroListagem, FotoCarro, Marca, ModeloVeiculo, VersaoVeiculo
+
+# Campos de Carro que entram no vetor de busca
+CAMPOS_BUSCA = {"nome", "descricao", "marca", "modelo", "versao"}
+
+# Campos de Carro que não mudam o estoque visto pelos filtros
+CAMPOS_SEM_EFEITO_NO_CATALOGO = {"visualizacoes"}
+
+# Campos de Carro que não estão em CarroListagem
+CAMPOS_FORA_DA_LISTAGEM = {"descricao", "cor", "modelo", "versao", "categoria"}
+
+
+# -----------------------------
+#  BUSCA TEXTUAL
+# -----------------------------
+@receiver(post_save, sender=Carro)
+def atualizar_busca_carro(sender, instance, update_fields=None, **kwargs):
+    """Recalcula o vetor de busca quando um campo pesquisável do carro muda."""
+    if update_fields and not CAMPOS_BUSCA.intersection(update_fields):
+        return  # Ex.: contador de visualizações
+    atualizar_vetor_busca(Carro.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Marca)
+def atualizar_busca_marca(sender, instance, created, **kwargs):
+    if not created:
+        atualizar_vetor_busca(Carro.objects.filter(marca=instance))
+
+
+@receiver(post_save, sender=ModeloVeiculo)
+def atualizar_busca_modelo(sender, instance, created, **kwargs):
+    if not created:
+        atualizar_vetor_busca(Carro.objects.filter(modelo=instance))
+
+
+@receiver(post_save, sender=VersaoVeiculo)
+def atualizar_busca_versao(sender, instance, created, **kwargs):
+    if not created:
+        atualizar_vetor_busca(Carro.objects.filter(versao=instance))
+
+
+# -----------------------------
+#  CATÁLOGO DOS FILTROS
+# -----------------------------
+@receiver(post_save, sender=Carro)
+def invalidar_catalogo_carro(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= CAMPOS_SEM_EFEITO_NO_CATALOGO:
+        return
+    invalidar_catalogo()
+
+
+@receiver(post_save, sender=Marca)
+@receiver(post_save, sender=Cidade)
+@receiver(post_save, sender=Loja)  # cidade da loja entra nas facetas e nos cards da home
+@receiver(post_delete, sender=Carro)
+@receiver(post_delete, sender=Marca)
+@receiver(post_delete, sender=Cidade)
+def invalidar_catalogo_estoque(sender, **kwargs):
+    invalidar_catalogo()
+
+
+# -----------------------------
+#  LISTAGEM (modelo de leitura)
+# -----------------------------
+@receiver(post_save, sender=Carro)
+def sincronizar_listagem_carro(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {"visualizacoes"}:
+        # Só o contador mudou (as visitas ao detalhe usam carros.contadores,
+        # que atualiza as duas tabelas direto). O card não mostra
+        # visualizações, então a versão do card não muda.
+        CarroListagem.objects.filter(id=instance.pk).update(visualizacoes=instance.visualizacoes)
+        return
+    if update_fields and set(update_fields) <= CAMPOS_FORA_DA_LISTAGEM:
+        return
+    sincronizar_listagem(Carro.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Carro)
+def remover_listagem_carro(sender, instance, **kwargs):
+    CarroListagem.objects.filter(id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Marca)
+def sincronizar_listagem_marca(sender, instance, created, **kwargs):
+    if not created:
+        CarroListagem.objects.filter(marca_id=instance.pk).update(
+            marca_nome=instance.nome, atualizado_em=Now()
+        )
+
+
+@receiver(post_save, sender=Loja)
+def sincronizar_listagem_loja(sender, instance, created, **kwargs):
+    if not created:
+        sincronizar_listagem(Carro.objects.filter(loja=instance))
+
+
+@receiver(post_save, sender=Cidade)
+def sincronizar_listagem_cidade(sender, instance, created, **kwargs):
+    if not created:
+        CarroListagem.objects.filter(cidade_id=instance.pk).update(
+            cidade_nome=instance.nome, cidade_estado=instance.estado, atualizado_em=Now()
+        )
+
+
+@receiver(post_delete, sender=Cidade)
+def limpar_listagem_cidade(sender, instance, **kwargs):
+    # Loja.cidade é SET_NULL (sem sinais), então a listagem é ajustada aqui
+    CarroListagem.objects.filter(cidade_id=instance.pk).update(
+        cidade=None, cidade_nome="", cidade_estado="", atualizado_em=Now()
+    )
+
+
+# -----------------------------
+#  DATAS DE MODIFICAÇÃO (ETag das páginas)
+# -----------------------------
+# Carro.atualizado_em e Loja.atualizado_em só mudam sozinhos quando a própria
+# linha é salva; aqui entram as mudanças de outras tabelas que aparecem nas
+# páginas do carro e da loja.
+@receiver(post_save, sender=Marca)
+def tocar_carros_marca(sender, instance, created, **kwargs):
+    if not created:
+        Carro.objects.filter(marca=instance).update(atualizado_em=Now())
+
+
+@receiver(post_save, sender=ModeloVeiculo)
+def tocar_carros_modelo(sender, instance, created, **kwargs):
+    if not created:
+        Carro.objects.filter(modelo=instance).update(atualizado_em=Now())
+
+
+@receiver(post_save, sender=VersaoVeiculo)
+def tocar_carros_versao(sender, instance, created, **kwargs):
+    if not created:
+        Carro.objects.filter(versao=instance).update(atualizado_em=Now())
+
+
+@receiver(post_save, sender=FotoCarro)
+@receiver(post_delete, sender=FotoCarro)
+def tocar_carro_foto(sender, instance, **kwargs):
+    Carro.objects.filter(pk=instance.carro_id).update(atualizado_em=Now())
+
+
+@receiver(post_save, sender=Cidade)
+def tocar_lojas_cidade(sender, instance, created, **kwargs):
+    if not created:
+        Loja.objects.filter(cidade=instance).update(atualizado_em=Now())
+
+
+@receiver(pre_delete, sender=Cidade)
+def tocar_lojas_cidade_apagada(sender, instance, **kwargs):
+    # Depois do delete as lojas já estão sem cidade (SET_NULL)
+    Loja.objects.filter(cidade=instance).update(atualizado_em=Now())
+
+
+# -----------------------------
+#  DERIVADOS DAS FOTOS
+# -----------------------------
+# Foto nova (ou trocada) entra na fila com status "processando"; o comando
+# processar_fotos gera as rendições fora da requisição.
+@receiver(pre_save, sender=Carro)
+def enfileirar_foto_carro(sender, instance, update_fields=None, **kwargs):
+    if update_fields and "foto_principal" not in update_fields:
+        return
+    if instance.pk is None:
+        return  # Carro novo já nasce "processando"
+    # Antes do save o FieldFile de um upload novo ainda tem o nome do arquivo enviado
+    anterior = Carro.objects.filter(pk=instance.pk).values_list("foto_principal", flat=True).first()
+    if anterior != instance.foto_principal.name:
+        instance.foto_status = IMAGEM_PROCESSANDO
+        instance.foto_reclamada_em, instance.foto_tentativas = None, 0
+        # Referência liberada depois do save (liberar_foto_trocada)
+        instance._foto_anterior = anterior
+
+
+# -----------------------------
+#  ARQUIVOS DAS FOTOS
+# -----------------------------
+# O arquivo é compartilhado por conteúdo (carros.armazenamento): excluir ou
+# trocar a foto solta uma referência, e o arquivo só sai do disco na última.
+# Roda depois do commit: se a transação for desfeita, a foto continua em uso.
+def _liberar(nome):
+    if nome:
+        transaction.on_commit(lambda: armazenamento_fotos.delete(nome))
+
+
+@receiver(post_save, sender=Carro)
+def liberar_foto_trocada(sender, instance, **kwargs):
+    _liberar(instance.__dict__.pop("_foto_anterior", None))
+
+
+@receiver(post_delete, sender=Carro)
+def liberar_foto_carro(sender, instance, **kwargs):
+    _liberar(instance.foto_principal.name)
+
+
+@receiver(post_delete, sender=FotoCarro)
+def liberar_foto_extra(sender, instance, **kwargs):
+    _liberar(instance.imagem.name)
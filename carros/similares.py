@@ -0,0 +1,221 @@
+"""
+Carros parecidos: vizinhos mais próximos calculados fora da requisição.
+
+Cada carro vira uma linha de uma matriz NumPy: ano, log do preço e log da
+km padronizados (média 0, desvio 1) e multiplicados pela raiz do peso, mais
+um código inteiro para marca, modelo, combustível, câmbio e cidade. A
+distância entre dois carros é a euclidiana ao quadrado da parte numérica
+mais o peso de cada atributo categórico diferente.
+
+O comando calcular_similares compara blocos de carros com os candidatos de
+uma vez (sem laço em Python por par), separa os K mais próximos de cada
+linha com argpartition e grava em CarroSimilar. A página do carro só lê a
+tabela.
+"""
+import time
+from itertools import islice
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import Carro, CarroListagem, CarroSimilar
+
+K_SIMILARES = 8
+
+# Linhas comparadas de uma vez; no pior caso a matriz é BLOCO x total (float32): 256 x 200 mil ≈ 200 MB
+BLOCO = 256
+
+# Peso de cada atributo na distância (a parte numérica está em desvios-padrão)
+PESOS_NUMERICOS = {"preco": 1.5, "ano": 1.0, "km": 0.5}
+PESOS_CATEGORICOS = {"modelo": 2.0, "marca": 1.0, "combustivel": 0.5, "cambio": 0.5, "cidade": 0.3}
+
+CAMPOS = ("id", "marca_id", "modelo_id", "ano", "km", "preco", "combustivel", "cambio", "loja__cidade_id")
+
+CHAVE_VERSAO = "similares:versao"
+
+
+def versao_similares():
+    """Muda a cada cálculo (vai no ETag da página do carro)."""
+    return cache.get(CHAVE_VERSAO, 0)
+
+
+def versao_cards_similares(carro_id):
+    """
+    (atualizado_em mais recente, quantidade) dos cards parecidos do carro:
+    muda quando um deles é editado ou apagado, sem depender do estoque todo.
+    """
+    cards = CarroListagem.objects.filter(
+        id__in=CarroSimilar.objects.filter(carro_id=carro_id).values("similar_id")
+    ).aggregate(atualizado_em=Max("atualizado_em"), total=Count("id"))
+    return cards["atualizado_em"], cards["total"]
+
+
+def _padronizar(valores, peso):
+    desvio = valores.std()
+    centrados = valores - valores.mean()
+    if desvio > 0:
+        centrados /= desvio
+    return centrados * np.sqrt(peso)
+
+
+def _codigos(valores):
+    """
+    Um inteiro por linha: linhas com o mesmo valor recebem o mesmo código.
+    Vazio (carro sem modelo, loja sem cidade) recebe um código negativo
+    próprio da linha, então nunca coincide com outro carro.
+    """
+    valores = np.array(valores, dtype=object)
+    vazios = np.array([valor is None for valor in valores], dtype=bool)
+    codigos = np.empty(len(valores), dtype=np.int32)
+    if (~vazios).any():
+        codigos[~vazios] = np.unique(valores[~vazios].astype(str), return_inverse=True)[1]
+    codigos[vazios] = -1 - np.flatnonzero(vazios)
+    return codigos
+
+
+def montar_atributos(linhas):
+    """
+    Converte as linhas de CAMPOS em (ids, numericos, categoricos): ids
+    int64, matriz float32 n x 3 e {atributo: códigos int32}.
+    """
+    colunas = dict(zip(CAMPOS, zip(*linhas)))
+    numericos = np.column_stack([
+        _padronizar(np.log(np.array(colunas["preco"], dtype=np.float64) + 1), PESOS_NUMERICOS["preco"]),
+        _padronizar(np.array(colunas["ano"], dtype=np.float64), PESOS_NUMERICOS["ano"]),
+        _padronizar(np.log1p(np.array(colunas["km"], dtype=np.float64)), PESOS_NUMERICOS["km"]),
+    ]).astype(np.float32)
+    categoricos = {
+        "modelo": _codigos(colunas["modelo_id"]),
+        "marca": _codigos(colunas["marca_id"]),
+        "combustivel": _codigos(colunas["combustivel"]),
+        "cambio": _codigos(colunas["cambio"]),
+        "cidade": _codigos(colunas["loja__cidade_id"]),
+    }
+    return np.array(colunas["id"], dtype=np.int64), numericos, categoricos
+
+
+def _faixas(n, *chaves):
+    """Intervalos [inicio, fim) de linhas consecutivas com as mesmas chaves (já ordenadas)."""
+    if chaves:
+        muda = np.flatnonzero(np.any([chave[1:] != chave[:-1] for chave in chaves], axis=0)) + 1
+    else:
+        muda = np.array([], dtype=np.int64)
+    limites = np.concatenate(([0], muda, [n]))
+    return zip(limites[:-1].tolist(), limites[1:].tolist())
+
+
+def _mais_proximos(numericos, normas, categoricos, linhas, inicio, fim, k):
+    """
+    Os k mais próximos de cada linha entre os candidatos [inicio, fim), que
+    contêm as próprias linhas. Faltando candidatos, completa com -1 / inf.
+    """
+    distancias = numericos[linhas] @ numericos[inicio:fim].T
+    distancias *= -2
+    distancias += normas[linhas, None]
+    distancias += normas[None, inicio:fim]
+    for nome, peso in PESOS_CATEGORICOS.items():
+        codigos = categoricos[nome]
+        np.add(distancias, peso, out=distancias, where=codigos[linhas, None] != codigos[None, inicio:fim])
+    distancias[np.arange(len(linhas)), linhas - inicio] = np.inf  # O próprio carro
+
+    indices = np.full((len(linhas), k), -1, dtype=np.int64)
+    melhores = np.full((len(linhas), k), np.inf, dtype=np.float32)
+    disponiveis = min(k, fim - inicio - 1)
+    if disponiveis > 0:
+        parciais = np.argpartition(distancias, disponiveis - 1, axis=1)[:, :disponiveis]
+        valores = np.take_along_axis(distancias, parciais, axis=1)
+        ordem = np.argsort(valores, axis=1)
+        indices[:, :disponiveis] = np.take_along_axis(parciais, ordem, axis=1) + inicio
+        melhores[:, :disponiveis] = np.maximum(np.take_along_axis(valores, ordem, axis=1), 0)
+    return indices, melhores
+
+
+def calcular_vizinhos(numericos, categoricos, k=K_SIMILARES, bloco=BLOCO):
+    """
+    Retorna (indices, distancias), matrizes n x k com os vizinhos de cada
+    linha (sem ela mesma) em ordem crescente de distância.
+
+    Comparar cada carro com todos custa n² e domina o tempo; então o cálculo
+    começa pelos carros do mesmo modelo. Um carro de outro modelo está a pelo
+    menos PESOS_CATEGORICOS["modelo"] de distância: se o k-ésimo vizinho do
+    mesmo modelo está mais perto que isso, o resultado já é o exato. Os que
+    não passam são refeitos contra a mesma marca e, por fim, contra todos,
+    em blocos de `bloco` linhas.
+    """
+    total = len(numericos)
+    k = min(k, total - 1)
+    indices = np.full((total, max(k, 0)), -1, dtype=np.int64)
+    distancias = np.full((total, max(k, 0)), np.inf, dtype=np.float32)
+    if k <= 0:
+        return indices, distancias
+
+    # Ordena por marca e modelo: cada modelo e cada marca viram um intervalo contíguo
+    ordem = np.lexsort((categoricos["modelo"], categoricos["marca"]))
+    numericos = numericos[ordem]
+    categoricos = {nome: codigos[ordem] for nome, codigos in categoricos.items()}
+    normas = np.einsum("ij,ij->i", numericos, numericos)
+
+    limiar_modelo = PESOS_CATEGORICOS["modelo"]
+    niveis = (
+        (_faixas(total, categoricos["marca"], categoricos["modelo"]), limiar_modelo),
+        (_faixas(total, categoricos["marca"]), limiar_modelo + PESOS_CATEGORICOS["marca"]),
+        (_faixas(total), np.inf),
+    )
+
+    pendentes = np.arange(total)
+    for faixas, limiar in niveis:
+        restantes = []
+        for inicio, fim in faixas:
+            de, ate = np.searchsorted(pendentes, [inicio, fim])
+            for parte in range(de, ate, bloco):
+                linhas = pendentes[parte:min(parte + bloco, ate)]
+                vizinhos, valores = _mais_proximos(numericos, normas, categoricos, linhas, inicio, fim, k)
+                prontas = valores[:, -1] <= limiar
+                indices[ordem[linhas[prontas]]] = ordem[vizinhos[prontas]]
+                distancias[ordem[linhas[prontas]]] = valores[prontas]
+                restantes.append(linhas[~prontas])
+        pendentes = np.concatenate(restantes) if restantes else pendentes[:0]
+        if not len(pendentes):
+            break
+
+    return indices, distancias
+
+
+def calcular_similares(k=K_SIMILARES, bloco=BLOCO, lote=5000):
+    """
+    Recalcula CarroSimilar para todo o estoque. A tabela é trocada numa
+    transação: a página continua lendo a lista anterior até o fim.
+    Retorna (carros, linhas_gravadas).
+    """
+    linhas = list(Carro.objects.order_by("id").values_list(*CAMPOS).iterator(chunk_size=10000))
+    if not linhas:
+        return 0, 0
+    ids, numericos, categoricos = montar_atributos(linhas)
+    del linhas
+
+    indices, distancias = calcular_vizinhos(numericos, categoricos, k, bloco)
+    linhas = (
+        CarroSimilar(carro_id=carro_id, similar_id=similar_id, posicao=posicao, distancia=distancia)
+        for carro_id, vizinhos, valores in zip(ids.tolist(), ids[indices].tolist(), distancias.tolist())
+        for posicao, (similar_id, distancia) in enumerate(zip(vizinhos, valores))
+    )
+
+    gravadas = 0
+    with transaction.atomic():
+        CarroSimilar.objects.all().delete()
+        while parte := list(islice(linhas, lote)):
+            CarroSimilar.objects.bulk_create(parte, batch_size=lote)
+            gravadas += len(parte)
+
+    cache.set(CHAVE_VERSAO, int(time.time()), None)
+    return len(ids), gravadas
+
+
+def carros_similares(carro_id):
+    """Cards (CarroListagem) dos carros parecidos, em ordem: uma consulta."""
+    return [
+        similar.similar
+        for similar in CarroSimilar.objects.filter(carro_id=carro_id).select_related("similar").order_by("posicao")
+    ]
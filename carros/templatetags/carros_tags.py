@@ -0,0 +1,59 @@
+"""
+Template tags das fotos dos carros (derivados gerados por carros.imagens).
+"""
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from carros.imagens import FORMATOS, RENDICOES, TIPOS, url_derivado
+
+register = template.Library()
+
+# Largura em que cada uso aparece na página (atributo sizes); com ela e a
+# densidade da tela o navegador escolhe a rendição do srcset
+TAMANHOS = {
+    "thumb": "120px",
+    "card": "(max-width: 600px) 100vw, 400px",
+    "full": "(max-width: 992px) 100vw, 60vw",
+}
+
+
+def _srcset(nome, formato):
+    return ", ".join(
+        f"{url_derivado(nome, rendicao, formato)} {largura}w" for rendicao, largura in RENDICOES.items()
+    )
+
+
+@register.simple_tag
+def imagem_responsiva(nome, uso, prontos, alt="", classe="", lazy=True):
+    """
+    <picture> com um srcset por formato (AVIF/WebP/JPEG, todas as rendições)
+    e o JPEG do `uso` (thumb, card, full) como src. Enquanto os derivados não
+    existem (`prontos` falso), um <img> com o arquivo original.
+    `nome` é o FieldFile ou o nome no storage.
+    Uso: {% imagem_responsiva carro.foto_principal "full" carro.foto_pronta alt=carro.nome %}
+    """
+    nome = str(nome or "")
+    if not nome:
+        return ""
+
+    atributos = format_html(
+        'alt="{}"{}{}',
+        alt,
+        format_html(' class="{}"', classe) if classe else "",
+        mark_safe(' loading="lazy"') if lazy else "",
+    )
+    if not prontos:
+        return format_html('<img src="{}" {}>', default_storage.url(nome), atributos)
+
+    sizes = TAMANHOS[uso]
+    fontes = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((TIPOS[formato], _srcset(nome, formato), sizes) for formato in FORMATOS if formato != "jpeg"),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" {}></picture>',
+        fontes, url_derivado(nome, uso, "jpeg"), _srcset(nome, "jpeg"), sizes, atributos,
+    )
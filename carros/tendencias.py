@@ -0,0 +1,132 @@
+"""
+Ranking "em alta": visitas e favoritos recentes, com decaimento exponencial.
+
+A pontuação de um carro é a soma dos pesos dos seus eventos, cada um
+multiplicado por 2^(-idade / MEIA_VIDA). Em vez do valor decaído, a tabela
+guarda log(soma de peso * e^(λ * (t - EPOCA))): comparar esses logs dá a
+mesma ordem que comparar as pontuações decaídas em qualquer instante, então
+o top-N é uma leitura do índice de TendenciaCarro.pontuacao e cada execução
+só regrava os carros que tiveram eventos novos.
+
+O comando atualizar_tendencias processa os eventos desde a última execução
+(marca d'água em ProgressoConsolidacao). As visitas vêm do contador de
+visualizações (anônimos inclusive), pelo total do dia em
+EstatisticaDiariaCarro: o que passou de `visualizacoes_pontuadas` é somado
+com a data da execução (ou o fim do dia, para dias anteriores) e a coluna
+avança até o total lido. Favoritos contam pela data de criação.
+"""
+import datetime
+import math
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Carro, EstatisticaDiariaCarro, Favorito, ProgressoConsolidacao, TendenciaCarro
+
+MEIA_VIDA = datetime.timedelta(days=3)
+LAMBDA = math.log(2) / MEIA_VIDA.total_seconds()
+EPOCA = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+PESO_VISITA = 1.0
+PESO_FAVORITO = 3.0
+
+# Na primeira execução, eventos mais antigos que isso já valem quase nada
+JANELA_INICIAL = MEIA_VIDA * 10
+
+# Favoritos de transações ainda abertas: não processa o último minuto
+MARGEM = datetime.timedelta(minutes=1)
+
+# Carros cuja pontuação decaída ficou abaixo disso saem da tabela
+PONTUACAO_MINIMA = 0.05
+
+ROTINA = "tendencias"
+CHAVE_VERSAO = "tendencias:versao"
+
+
+def _expoente(data):
+    return LAMBDA * (data - EPOCA).total_seconds()
+
+
+def _somar_log(a, b):
+    """log(e^a + e^b) sem estouro."""
+    if a is None:
+        return b
+    maior, menor = max(a, b), min(a, b)
+    return maior + math.log1p(math.exp(menor - maior))
+
+
+def _fim_do_dia(dia):
+    return timezone.make_aware(datetime.datetime.combine(dia + datetime.timedelta(days=1), datetime.time.min))
+
+
+def _visitas_novas(desde):
+    """Linhas do total diário com visitas ainda não somadas ao ranking."""
+    return list(
+        EstatisticaDiariaCarro.objects.filter(
+            dia__gte=timezone.localdate(desde), visualizacoes__gt=F("visualizacoes_pontuadas")
+        ).only("id", "carro_id", "dia", "visualizacoes", "visualizacoes_pontuadas")
+    )
+
+
+def versao_tendencias():
+    """Muda a cada atualização do ranking (vai na chave dos blocos da home)."""
+    return cache.get(CHAVE_VERSAO, 0)
+
+
+def atualizar_tendencias():
+    """
+    Soma os eventos novos nas pontuações e descarta as que decaíram demais.
+    Retorna (carros_atualizados, carros_removidos).
+    """
+    progresso = ProgressoConsolidacao.objects.filter(nome=ROTINA).first()
+    ate = timezone.now() - MARGEM
+    desde = progresso.processado_em if progresso and progresso.processado_em else ate - JANELA_INICIAL
+
+    novos = defaultdict(lambda: None)
+
+    visitas = _visitas_novas(desde)
+    for linha in visitas:
+        delta = linha.visualizacoes - linha.visualizacoes_pontuadas
+        data = min(ate, _fim_do_dia(linha.dia))
+        novos[linha.carro_id] = _somar_log(novos[linha.carro_id], math.log(PESO_VISITA * delta) + _expoente(data))
+        # Avança até o total lido: o que o contador somar depois fica para a próxima
+        linha.visualizacoes_pontuadas = linha.visualizacoes
+
+    favoritos = Favorito.objects.filter(criado_em__gt=desde, criado_em__lte=ate).values_list("carro_id", "criado_em")
+    for carro_id, data in favoritos.order_by().iterator(chunk_size=5000):
+        novos[carro_id] = _somar_log(novos[carro_id], math.log(PESO_FAVORITO) + _expoente(data))
+
+    # Pontuação (em log) equivalente a PONTUACAO_MINIMA agora
+    corte = math.log(PONTUACAO_MINIMA) + _expoente(ate)
+
+    with transaction.atomic():
+        existentes = list(Carro.objects.filter(id__in=list(novos)).values_list("id", flat=True))
+        atuais = dict(
+            TendenciaCarro.objects.filter(carro_id__in=existentes).values_list("carro_id", "pontuacao")
+        )
+        TendenciaCarro.objects.bulk_create(
+            [
+                TendenciaCarro(carro_id=carro_id, pontuacao=_somar_log(atuais.get(carro_id), novos[carro_id]))
+                for carro_id in existentes
+            ],
+            batch_size=2000,
+            update_conflicts=True,
+            unique_fields=["carro"],
+            update_fields=["pontuacao"],
+        )
+        # Só a coluna pontuada: o UPDATE do contador em `visualizacoes` não se perde
+        EstatisticaDiariaCarro.objects.bulk_update(visitas, ["visualizacoes_pontuadas"], batch_size=2000)
+        removidos, _ = TendenciaCarro.objects.filter(pontuacao__lt=corte).delete()
+        ProgressoConsolidacao.objects.update_or_create(nome=ROTINA, defaults={"processado_em": ate})
+
+    cache.set(CHAVE_VERSAO, int(time.time()), None)
+    return len(existentes), removidos
+
+
+def carros_em_alta(limite):
+    """Ids dos `limite` carros mais em alta (leitura do índice de pontuação)."""
+    return list(TendenciaCarro.objects.order_by("-pontuacao").values_list("carro_id", flat=True)[:limite])
@@ -1,3 +1,283 @@
-from django.test import TestCase
+import os
+import random
+import tempfile
+from io import BytesIO
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from PIL import Image
+
+from carros.armazenamento import ArmazenamentoPorConteudo
+from carros.imagens import PASTA_DERIVADOS
+from carros.ingestao import verificar_imagem
+from carros.models import ArquivoFoto, CarroListagem
+from carros.similares import PESOS_CATEGORICOS, calcular_vizinhos, montar_atributos
+from sitepublico.filtros import filtrar_carros
+from sitepublico.paginacao import ORDENACAO_PADRAO, consulta_keyset
+from sitepublico.vitrine import consulta_destacados
+
+# "Mais recentes" lê a chave primária de trás para frente; com um filtro de
+# faixa pouco seletivo o banco pode preferir ela (sem Sort) ao índice da faixa
+CHAVE_PRIMARIA = "carros_carrolistagem_pkey"
+
+INDICES_LISTAGEM = {
+    "listagem_preco_idx",
+    "listagem_ano_idx",
+    "listagem_marca_idx",
+    "listagem_marca_preco_idx",
+    "listagem_marca_ano_idx",
+    "listagem_cidade_idx",
+    "listagem_cidade_preco_idx",
+    "listagem_combustivel_idx",
+    "listagem_destacados_idx",
+}
+
+
+@skipUnless(connection.vendor == "postgresql", "Planos de execução só são verificados no PostgreSQL")
+class IndicesListagemPlanoTests(TestCase):
+    """
+    Com um estoque sintético grande, as combinações de filtro da listagem
+    precisam usar os índices de CarroListagem em vez de varrer a tabela.
+    A consulta é a mesma de listar_carros: filtrar_carros + primeira página
+    na ordem padrão.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        aleatorio = random.Random(7)
+        combustiveis = ["flex"] * 90 + ["gasolina"] * 6 + ["diesel"] * 3 + ["eletrico"]
+        CarroListagem.objects.bulk_create(
+            [
+                CarroListagem(
+                    id=i,
+                    loja_id=1,
+                    marca_id=aleatorio.randint(1, 20),
+                    cidade_id=aleatorio.randint(1, 50),
+                    nome=f"Carro {i}",
+                    ano=aleatorio.randint(1995, 2025),
+                    km=aleatorio.randint(0, 300000),
+                    preco=aleatorio.randint(15, 400) * 1000,
+                    portas=aleatorio.choice([2, 4]),
+                    combustivel=aleatorio.choice(combustiveis),
+                    cambio=aleatorio.choice(["manual", "automatico"]),
+                    destacado=aleatorio.random() < 0.005,
+                    marca_nome="Marca",
+                    loja_nome="Loja",
+                )
+                for i in range(1, 50001)
+            ],
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE carros_carrolistagem")
+
+    def assertUsaIndice(self, params, esperados=INDICES_LISTAGEM, queryset=None):
+        if queryset is None:
+            queryset = consulta_keyset(filtrar_carros(CarroListagem.objects.all(), params), ORDENACAO_PADRAO)
+        plano = queryset.explain()
+        self.assertNotIn("Seq Scan on carros_carrolistagem", plano)
+        self.assertTrue(
+            any(nome in plano for nome in esperados),
+            f"Nenhum de {sorted(esperados)} aparece no plano:\n{plano}",
+        )
+
+    def test_faixa_de_preco(self):
+        self.assertUsaIndice({"preco_min": "390000"}, {"listagem_preco_idx", CHAVE_PRIMARIA})
+
+    def test_marca_e_faixa_de_preco(self):
+        self.assertUsaIndice(
+            {"marca": "3", "preco_min": "100000", "preco_max": "120000"},
+            {"listagem_marca_preco_idx", "listagem_marca_idx"},
+        )
+
+    def test_marca_e_faixa_de_ano(self):
+        self.assertUsaIndice(
+            {"marca": "5", "ano_min": "2023", "ano_max": "2025"},
+            {"listagem_marca_ano_idx", "listagem_marca_idx"},
+        )
+
+    def test_cidade(self):
+        self.assertUsaIndice({"cidade": "12"}, {"listagem_cidade_idx"})
+        self.assertUsaIndice(
+            {"cidade": "12", "preco_min": "100000", "preco_max": "150000"},
+            {"listagem_cidade_preco_idx", "listagem_cidade_idx"},
+        )
+
+    def test_combustivel_minoritario(self):
+        self.assertUsaIndice({"combustivel": "eletrico"}, {"listagem_combustivel_idx", CHAVE_PRIMARIA})
+        self.assertUsaIndice(
+            {"combustivel": "diesel", "cambio": "automatico"},
+            {"listagem_combustivel_idx"},
+        )
+
+    def test_destacados(self):
+        self.assertUsaIndice({}, {"listagem_destacados_idx"}, queryset=consulta_destacados())
+
+
+class VizinhosSimilaresTests(SimpleTestCase):
+    """calcular_vizinhos (por modelo, marca e depois todos) dá o mesmo resultado da força bruta."""
+
+    def _estoque(self, quantidade, semente):
+        aleatorio = random.Random(semente)
+        linhas = []
+        for i in range(1, quantidade + 1):
+            # Cada modelo é de uma marca só, como no catálogo; alguns carros sem modelo
+            modelo = aleatorio.randint(1, 30)
+            linhas.append((
+                i,
+                modelo // 4,
+                None if aleatorio.random() < 0.05 else modelo,
+                aleatorio.randint(2005, 2025),
+                aleatorio.randint(0, 250000),
+                aleatorio.randint(20, 300) * 1000,
+                aleatorio.choice(["flex", "gasolina", "diesel"]),
+                aleatorio.choice(["manual", "automatico"]),
+                aleatorio.choice([None, 1, 2, 3]),
+            ))
+        return montar_atributos(linhas)
+
+    def _forca_bruta(self, numericos, categoricos):
+        dados = numericos.astype(np.float64)
+        distancias = ((dados[:, None, :] - dados[None, :, :]) ** 2).sum(axis=2)
+        for nome, peso in PESOS_CATEGORICOS.items():
+            codigos = categoricos[nome]
+            distancias += peso * (codigos[:, None] != codigos[None, :])
+        np.fill_diagonal(distancias, np.inf)
+        return distancias
+
+    def assertIgualForcaBruta(self, quantidade, k, bloco, semente):
+        _, numericos, categoricos = self._estoque(quantidade, semente)
+        indices, distancias = calcular_vizinhos(numericos, categoricos, k=k, bloco=bloco)
+        todas = self._forca_bruta(numericos, categoricos)
+
+        esperadas = np.sort(todas, axis=1)[:, :k]
+        np.testing.assert_allclose(distancias, esperadas, rtol=1e-4, atol=1e-4)
+        # Empates podem trocar a ordem: confere a distância real de cada vizinho escolhido
+        reais = np.take_along_axis(todas, indices, axis=1)
+        np.testing.assert_allclose(reais, esperadas, rtol=1e-4, atol=1e-4)
+        self.assertTrue((indices != np.arange(quantidade)[:, None]).all())
+
+    def test_estoque_pequeno_em_blocos(self):
+        self.assertIgualForcaBruta(400, k=8, bloco=16, semente=1)
+
+    def test_k_maior_que_os_modelos(self):
+        # Modelos com menos de k carros obrigam a descer para a marca e para todos
+        self.assertIgualForcaBruta(60, k=12, bloco=7, semente=2)
+
+
+class VerificarJpegTests(SimpleTestCase):
+    """verificar_imagem no JPEG: o fim é procurado depois do SOS de verdade, não no da miniatura."""
+
+    def _jpeg(self, tamanho, **opcoes):
+        saida = BytesIO()
+        pixels = np.random.default_rng(3).integers(0, 256, (tamanho[1], tamanho[0], 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(saida, "JPEG", **opcoes)
+        return saida.getvalue()
+
+    def _com_miniatura(self):
+        # A miniatura no APP1 tem SOS e fim próprios, antes do scan da foto
+        miniatura = self._jpeg((64, 48))
+        return self._jpeg((640, 480), exif=b"Exif\x00\x00" + miniatura)
+
+    def _verificar(self, dados):
+        verificar_imagem(SimpleUploadedFile("foto.jpg", dados, content_type="image/jpeg"))
+
+    def test_inteiro_com_miniatura(self):
+        self._verificar(self._com_miniatura())
+
+    def test_truncado_com_miniatura(self):
+        dados = self._com_miniatura()
+        with self.assertRaises(OSError):
+            self._verificar(dados[: len(dados) // 2])
+
+    def test_truncado_no_cabecalho(self):
+        dados = self._com_miniatura()
+        with self.assertRaises(OSError):
+            self._verificar(dados[:300])
+
+    def test_dados_depois_do_fim(self):
+        # Trailer maior que a cauda lida primeiro: cai na leitura do scan inteiro
+        self._verificar(self._jpeg((320, 240)) + bytes(100 * 1024))
+
+    def test_progressivo(self):
+        self._verificar(self._jpeg((320, 240), progressive=True))
+
+
+class ArmazenamentoPorConteudoTests(TestCase):
+    """Contagem de referências: o arquivo compartilhado só sai do disco na última."""
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.storage = ArmazenamentoPorConteudo(location=pasta.name)
+        # Mesma pasta sem o nome por conteúdo: derivados e nomes antigos
+        self.disco = FileSystemStorage(location=pasta.name)
+
+    def _salvar(self, conteudo, nome="carros/foto.jpg"):
+        return self.storage.save(nome, ContentFile(conteudo))
+
+    def _referencias(self, nome):
+        return ArquivoFoto.objects.get(nome=nome).referencias
+
+    def _derivado(self, nome):
+        derivado = f"{PASTA_DERIVADOS}/{os.path.splitext(nome)[0]}/400.webp"
+        return self.disco.path(self.disco.save(derivado, ContentFile(b"derivado")))
+
+    def test_mesmo_conteudo_soma_referencias(self):
+        nome = self._salvar(b"foto a", "carros/um.jpg")
+        self.assertEqual(self._salvar(b"foto a", "carros/outro.JPEG"), nome)
+        self.assertEqual(self._referencias(nome), 2)
+        self.assertEqual(ArquivoFoto.objects.filter(nome=nome).count(), 1)
+        self.assertNotEqual(self._salvar(b"foto b"), nome)
+        self.assertEqual(self._referencias(nome), 2)
+
+    def test_apaga_so_na_ultima_referencia(self):
+        nome = self._salvar(b"foto a")
+        self._salvar(b"foto a")
+        derivado = self._derivado(nome)
+
+        self.storage.delete(nome)
+        self.assertEqual(self._referencias(nome), 1)
+        self.assertTrue(self.storage.exists(nome))
+        self.assertTrue(os.path.exists(derivado))
+
+        self.storage.delete(nome)
+        self.assertFalse(ArquivoFoto.objects.filter(nome=nome).exists())
+        self.assertFalse(self.storage.exists(nome))
+        self.assertFalse(os.path.exists(derivado))
+
+        # Soltar de novo não faz nada; o mesmo conteúdo volta a ser gravado
+        self.storage.delete(nome)
+        self.assertEqual(self._salvar(b"foto a"), nome)
+        self.assertEqual(self._referencias(nome), 1)
+        self.assertTrue(self.storage.exists(nome))
+
+    def test_nome_antigo_nao_e_apagado(self):
+        antigo = self.disco.save("carros/antiga.jpg", ContentFile(b"foto antiga"))
+        self.storage.delete(antigo)
+        self.assertTrue(self.storage.exists(antigo))
+
+    def test_reconciliar(self):
+        nome = self._salvar(b"foto a")
+        for _ in range(2):
+            self._salvar(b"foto a")
+        hash_conteudo = ArquivoFoto.objects.get(nome=nome).hash
+        agora = timezone.now()
+
+        # Referenciado depois do limite: o registro pode ainda estar sendo gravado
+        self.assertIsNone(self.storage.reconciliar(hash_conteudo, lambda _: 1, agora - timezone.timedelta(hours=1)))
+        self.assertEqual(self._referencias(nome), 3)
+
+        self.assertEqual(self.storage.reconciliar(hash_conteudo, lambda _: 1, agora), 1)
+        self.assertEqual(self._referencias(nome), 1)
+        self.assertIsNone(self.storage.reconciliar(hash_conteudo, lambda _: 1, agora))
+
+        self.assertEqual(self.storage.reconciliar(hash_conteudo, lambda _: 0, agora), 0)
+        self.assertFalse(ArquivoFoto.objects.filter(pk=hash_conteudo).exists())
+        self.assertFalse(self.storage.exists(nome))
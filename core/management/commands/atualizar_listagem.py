@@ -0,0 +1,47 @@
+"""
+Comando para reconstruir a tabela de leitura da listagem (CarroListagem).
+Normalmente os sinais mantêm a tabela em dia; use após cargas em massa
+(bulk_create, loaddata, SQL direto) ou para corrigir divergências.
+"""
+from django.core.management.base import BaseCommand
+
+from carros.listagem import remover_orfaos, sincronizar_listagem
+from carros.models import Carro
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a tabela CarroListagem a partir dos carros, em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Quantidade de carros gravados por INSERT (padrão: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        ultimo_id = 0
+        total = 0
+
+        while True:
+            ids = list(
+                Carro.objects.filter(id__gt=ultimo_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+
+            total += sincronizar_listagem(Carro.objects.filter(id__in=ids))
+            ultimo_id = ids[-1]
+            self.stdout.write(f'  {total} carros sincronizados (até id {ultimo_id})')
+
+        removidos = remover_orfaos()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n[OK] Listagem atualizada: {total} carros, {removidos} linhas órfãs removidas.'
+            )
+        )
@@ -0,0 +1,29 @@
+"""
+Comando para recalcular os preços de mercado (EstatisticaPreco).
+Lê o estoque inteiro numa consulta e grava só as faixas que mudaram;
+agendar a cada hora.
+"""
+from django.core.management.base import BaseCommand
+
+from carros.mercado import atualizar_precos_mercado
+
+
+class Command(BaseCommand):
+    help = 'Recalcula mediana e quartis de preço por modelo/versão, ano e cidade'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Linhas gravadas por comando SQL (padrão: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        criadas, alteradas, removidas = atualizar_precos_mercado(lote=options['lote'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[OK] Preços de mercado: {criadas} faixas novas, {alteradas} alteradas, {removidas} removidas.'
+            )
+        )
@@ -0,0 +1,21 @@
+"""
+Comando para atualizar o ranking "em alta" (TendenciaCarro).
+Processa só as visitas e favoritos desde a última execução; agendar a cada
+poucos minutos (ex.: a cada 10 minutos).
+"""
+from django.core.management.base import BaseCommand
+
+from carros.tendencias import atualizar_tendencias
+
+
+class Command(BaseCommand):
+    help = 'Atualiza as pontuações "em alta" dos carros com as visitas e favoritos recentes'
+
+    def handle(self, *args, **options):
+        atualizados, removidos = atualizar_tendencias()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[OK] Em alta atualizado: {atualizados} carros com eventos novos, {removidos} removidos.'
+            )
+        )
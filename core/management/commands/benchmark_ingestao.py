@@ -0,0 +1,94 @@
+"""
+Comando para medir o tempo de CPU da validação de uma foto enviada.
+Compara o caminho antigo (forms.ImageField abre e verifica, o validador do
+modelo e o laço da view abrem de novo) com a sondagem única de
+carros.ingestao, com e sem os metadados vindos do upload handler do
+logista. Não usa o banco nem o storage.
+"""
+import time
+from io import BytesIO
+
+from django import forms
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from carros.forms import FotoField
+from carros.ingestao import guardar_metadados
+from carros.models import validar_proporcao_imagem, verificar_dimensoes
+from logistas.uploads import ler_cabecalho
+
+# Pedaço que o handler recebe por vez (chunk_size padrão do Django)
+PEDACO = 64 * 1024
+
+
+def _foto(largura, altura, formato):
+    """Foto sintética com textura (comprime como foto) e EXIF de celular."""
+    ruido = Image.effect_noise((largura, altura), 40)
+    imagem = Image.merge("RGB", (ruido, Image.linear_gradient("L").resize((largura, altura)), ruido))
+    saida = BytesIO()
+    opcoes = {"exif": b"Exif\x00\x00" + bytes(30 * 1024)} if formato == "JPEG" else {}
+    imagem.save(saida, formato, **opcoes)
+    return saida.getvalue()
+
+
+def _antes(conteudo, nome, com_handler):
+    arquivo = SimpleUploadedFile(nome, conteudo)
+    if com_handler:
+        verificar_dimensoes(*Image.open(BytesIO(conteudo[:PEDACO])).size)
+    forms.ImageField().clean(arquivo)
+    # Validador do modelo e laço da view: Image.open de novo cada um
+    for _ in range(2):
+        verificar_dimensoes(*Image.open(arquivo).size)
+
+
+def _depois(conteudo, nome, com_handler):
+    arquivo = SimpleUploadedFile(nome, conteudo)
+    if com_handler:
+        metadados = ler_cabecalho(conteudo[:PEDACO])
+        verificar_dimensoes(metadados.largura, metadados.altura)
+        guardar_metadados(arquivo, metadados._replace(tamanho=len(conteudo)))
+    FotoField().clean(arquivo)
+    for _ in range(2):
+        validar_proporcao_imagem(arquivo)
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de CPU por foto enviada antes e depois da sondagem única'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=200,
+            help='Uploads medidos por caso (padrão: 200)'
+        )
+        parser.add_argument(
+            '--largura',
+            type=int,
+            default=4000,
+            help='Largura da foto sintética (padrão: 4000, altura 3/4 disso)'
+        )
+
+    def handle(self, *args, **options):
+        repeticoes = options['repeticoes']
+        largura = options['largura']
+
+        for formato, nome in (("JPEG", "foto.jpg"), ("PNG", "foto.png")):
+            conteudo = _foto(largura, largura * 3 // 4, formato)
+            self.stdout.write(f'{formato} {largura}x{largura * 3 // 4}, {len(conteudo) / 1024:.0f} KB:')
+            for com_handler in (False, True):
+                tempos = []
+                for caminho in (_antes, _depois):
+                    caminho(conteudo, nome, com_handler)  # Aquece (plugins do Pillow)
+                    inicio = time.process_time()
+                    for _ in range(repeticoes):
+                        caminho(conteudo, nome, com_handler)
+                    tempos.append((time.process_time() - inicio) / repeticoes * 1000)
+                origem = 'painel do logista' if com_handler else 'sem upload handler'
+                self.stdout.write(
+                    f'  {origem:<20} antes {tempos[0]:.3f} ms/foto, depois {tempos[1]:.3f} ms/foto '
+                    f'({tempos[0] / max(tempos[1], 1e-9):.1f}x)'
+                )
+
+        self.stdout.write(self.style.SUCCESS('[OK] Benchmark concluído.'))
@@ -0,0 +1,39 @@
+"""
+Comando para recalcular os carros parecidos (CarroSimilar) de todo o estoque.
+Roda fora do horário de pico (ex.: uma vez por noite); com 200 mil carros leva
+poucos minutos numa máquina.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from carros.similares import BLOCO, K_SIMILARES, calcular_similares
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os carros parecidos exibidos na página de cada carro'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quantidade',
+            type=int,
+            default=K_SIMILARES,
+            help=f'Carros parecidos guardados por carro (padrão: {K_SIMILARES})'
+        )
+        parser.add_argument(
+            '--bloco',
+            type=int,
+            default=BLOCO,
+            help=f'Carros comparados de uma vez; limita a memória (padrão: {BLOCO})'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        carros, linhas = calcular_similares(k=options['quantidade'], bloco=options['bloco'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[OK] Carros parecidos recalculados: {carros} carros, {linhas} linhas '
+                f'em {time.monotonic() - inicio:.1f}s.'
+            )
+        )
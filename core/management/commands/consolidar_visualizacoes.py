@@ -0,0 +1,42 @@
+"""
+Comando para consolidar o histórico de visualizações em estatísticas diárias
+e apagar o histórico antigo. Rodar uma vez por dia (ex.: logo após a meia-noite).
+Cada execução processa só os dias encerrados depois da última consolidação.
+"""
+from django.core.management.base import BaseCommand
+
+from carros.estatisticas import consolidar_usuarios_unicos, podar_historico
+
+
+class Command(BaseCommand):
+    help = 'Consolida o histórico de visualizações por carro e dia e apaga o histórico antigo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias-retencao',
+            type=int,
+            default=180,
+            help='Apaga o histórico com mais de N dias, já consolidado (padrão: 180)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Quantidade de linhas apagadas por DELETE (padrão: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        resultado = consolidar_usuarios_unicos()
+        if resultado is None:
+            self.stdout.write('  Nenhum dia novo para consolidar')
+        else:
+            primeiro_dia, ultimo_dia, linhas = resultado
+            self.stdout.write(f'  {primeiro_dia} a {ultimo_dia} consolidados ({linhas} linhas)')
+
+        apagadas = podar_historico(options['dias_retencao'], lote=options['lote'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n[OK] Visualizações consolidadas; {apagadas} linhas antigas do histórico apagadas.'
+            )
+        )
@@ -0,0 +1,114 @@
+"""
+Comando para passar as fotos com nome antigo (carros/..., carros/fotos/...)
+para o armazenamento por conteúdo (carros.armazenamento). Fotos iguais viram
+um arquivo só; os derivados são aproveitados. Pode ser interrompido e
+rodado de novo: só pega o que ainda tem nome antigo.
+
+Os registros mudam com update() (sem signals), então o comando invalida o
+catálogo (os blocos da home em cache ainda têm os nomes antigos) antes de
+apagar os arquivos antigos, a cada LOTE_APAGAR fotos.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Now
+from django.template.defaultfilters import filesizeformat
+
+from carros.armazenamento import PASTA_CONTEUDO, apagar_nome_antigo, armazenamento_fotos, copiar_para_conteudo
+from carros.catalogo import invalidar_catalogo
+from carros.models import Carro, CarroListagem, FotoCarro
+
+# Fotos movidas entre uma invalidação do catálogo e a remoção dos nomes antigos
+LOTE_APAGAR = 500
+
+
+class Command(BaseCommand):
+    help = 'Move as fotos dos carros para nomes por conteúdo, juntando as repetidas'
+
+    def _antigas(self, modelo, campo, *outros):
+        return (
+            modelo.objects.exclude(**{f'{campo}__startswith': f'{PASTA_CONTEUDO}/'})
+            .exclude(**{campo: ''})
+            .exclude(**{f'{campo}__isnull': True})
+            .values_list('pk', campo, *outros)
+            .order_by('pk')
+        )
+
+    def _mover(self, nome):
+        """Grava no nome por conteúdo. Retorna (novo, tamanho, ja_existia), ou None sem arquivo."""
+        if not armazenamento_fotos.exists(nome):
+            self.faltando += 1
+            return None
+        tamanho = armazenamento_fotos.size(nome)
+        novo, ja_existia = copiar_para_conteudo(nome)
+        return novo, tamanho, ja_existia
+
+    def _contar(self, tamanho, ja_existia):
+        self.movidas += 1
+        if ja_existia:
+            self.repetidas += 1
+            self.economizado += tamanho
+
+    def _soltar(self, novo):
+        # O registro mudou de foto (ou foi apagado) depois da leitura: solta a referência criada
+        self.trocadas += 1
+        armazenamento_fotos.delete(novo)
+
+    def _movida(self, nome, novo):
+        self.antigos.append((nome, novo))
+        if len(self.antigos) >= LOTE_APAGAR:
+            self._apagar_antigos()
+
+    def _apagar_antigos(self):
+        if not self.antigos:
+            return
+        # As atualizações já tiveram COMMIT (um atomic por foto): a home para de
+        # usar os nomes antigos antes de os arquivos sumirem
+        invalidar_catalogo()
+        for nome, novo in self.antigos:
+            apagar_nome_antigo(nome, novo)
+        self.antigos = []
+
+    def handle(self, *args, **options):
+        self.movidas = self.repetidas = self.faltando = self.economizado = self.trocadas = 0
+        self.antigos = []
+
+        for carro_id, nome in self._antigas(Carro, 'foto_principal').iterator():
+            with transaction.atomic():
+                movida = self._mover(nome)
+                if movida is None:
+                    continue
+                novo, tamanho, ja_existia = movida
+                # update() condicional: sem signals (não é troca de foto), só se a foto
+                # ainda é a lida, e atualizado_em novo para o cache
+                if not Carro.objects.filter(pk=carro_id, foto_principal=nome).update(
+                    foto_principal=novo, atualizado_em=Now()
+                ):
+                    self._soltar(novo)
+                    continue
+                CarroListagem.objects.filter(id=carro_id).update(
+                    foto_nome=novo, foto_url=armazenamento_fotos.url(novo), atualizado_em=Now()
+                )
+            self._contar(tamanho, ja_existia)
+            self._movida(nome, novo)
+
+        for foto_id, nome, carro_id in self._antigas(FotoCarro, 'imagem', 'carro_id').iterator():
+            with transaction.atomic():
+                movida = self._mover(nome)
+                if movida is None:
+                    continue
+                novo, tamanho, ja_existia = movida
+                if not FotoCarro.objects.filter(pk=foto_id, imagem=nome).update(imagem=novo):
+                    self._soltar(novo)
+                    continue
+                Carro.objects.filter(pk=carro_id).update(atualizado_em=Now())
+            self._contar(tamanho, ja_existia)
+            self._movida(nome, novo)
+        self._apagar_antigos()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[OK] {self.movidas} fotos movidas, {self.repetidas} repetidas juntadas '
+                f'({filesizeformat(self.economizado)} a menos no disco), {self.faltando} sem arquivo, '
+                f'{self.trocadas} ignoradas (foto trocada durante o comando).'
+            )
+        )
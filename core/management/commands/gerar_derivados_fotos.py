@@ -0,0 +1,35 @@
+"""
+Comando para devolver fotos à fila de rendições (processada pelo worker
+processar_fotos). Sem opções, só as que deram erro; com --todas, todas as
+fotos (ex.: depois de mudar RENDICOES/FORMATOS em carros.imagens).
+"""
+from django.core.management.base import BaseCommand
+
+from carros.models import IMAGEM_ERRO, IMAGEM_PROCESSANDO, Carro, FotoCarro
+
+
+class Command(BaseCommand):
+    help = 'Coloca fotos de carros de volta na fila de geração das rendições'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Refaz também as fotos que já têm rendições'
+        )
+
+    def handle(self, *args, **options):
+        carros = Carro.objects.exclude(foto_principal='').exclude(foto_principal__isnull=True)
+        fotos = FotoCarro.objects.all()
+        if not options['todas']:
+            carros = carros.filter(foto_status=IMAGEM_ERRO)
+            fotos = fotos.filter(status=IMAGEM_ERRO)
+
+        # Tentativas zeradas: a foto volta com MAX_TENTATIVAS novas
+        total = carros.update(
+            foto_status=IMAGEM_PROCESSANDO, foto_reclamada_em=None, foto_tentativas=0
+        ) + fotos.update(status=IMAGEM_PROCESSANDO, reclamado_em=None, tentativas=0)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'[OK] {total} fotos na fila. Rode (ou aguarde) o worker processar_fotos.')
+        )
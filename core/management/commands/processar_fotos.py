@@ -0,0 +1,70 @@
+"""
+Worker que gera as rendições das fotos enviadas pelos logistas
+(fila em carros.fila_imagens). Roda como processo separado do web
+(Procfile: worker); use --uma-vez para esvaziar a fila e sair.
+"""
+import os
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from carros.fila_imagens import LOTE, processar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Gera as rendições das fotos na fila (status "processando") num pool de processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processos que redimensionam as fotos (padrão: número de CPUs)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=LOTE,
+            help=f'Fotos reclamadas por vez (padrão: {LOTE})'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera quando a fila está vazia (padrão: 2)'
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Sai quando a fila esvaziar, em vez de continuar esperando'
+        )
+
+    def handle(self, *args, **options):
+        self.total = 0
+        while True:
+            # Os processos filhos não usam o banco: não podem herdar a conexão aberta
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['processos'], initializer=django.setup) as executor:
+                try:
+                    self._processar(executor, options)
+                    break
+                except BrokenExecutor:
+                    # Um processo do pool morreu (ex.: foto que estoura a memória); as
+                    # fotos do lote já voltaram para a fila. Recria o pool
+                    self.stderr.write('  Pool de processos quebrado; recriando')
+
+        self.stdout.write(self.style.SUCCESS(f'\n[OK] Fila de fotos vazia: {self.total} fotos processadas.'))
+
+    def _processar(self, executor, options):
+        while True:
+            processadas = processar_pendentes(executor, options['lote'])
+            self.total += processadas
+            if processadas:
+                self.stdout.write(f'  {self.total} fotos processadas')
+                continue
+            if options['uma_vez']:
+                return
+            time.sleep(options['intervalo'])
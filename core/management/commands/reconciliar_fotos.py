@@ -0,0 +1,77 @@
+"""
+Comando para recontar as referências do armazenamento por conteúdo
+(carros.armazenamento). A referência é somada antes do save do registro:
+um save que falha deixa a contagem maior que a real e o arquivo nunca sai
+do disco. Aqui cada ArquivoFoto é comparado com as fotos que apontam para
+ele; arquivos sem nenhuma são apagados (com os derivados). Rodar de vez em
+quando (ex.: uma vez por semana); pode rodar com o site no ar.
+"""
+import datetime
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from carros.armazenamento import PASTA_CONTEUDO, armazenamento_fotos
+from carros.models import ArquivoFoto, Carro, FotoCarro
+
+
+def _contar(modelo, campo, **filtro):
+    nomes = modelo.objects.filter(**{f'{campo}__startswith': f'{PASTA_CONTEUDO}/', **filtro})
+    return Counter(nomes.values_list(campo, flat=True).iterator(chunk_size=10000))
+
+
+def _referencias(nome):
+    return Carro.objects.filter(foto_principal=nome).count() + FotoCarro.objects.filter(imagem=nome).count()
+
+
+class Command(BaseCommand):
+    help = 'Reconta as referências das fotos por conteúdo e apaga os arquivos sem uso'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutos',
+            type=int,
+            default=60,
+            help='Ignora arquivos referenciados há menos de N minutos: o registro ainda pode estar sendo gravado (padrão: 60)'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Só mostra o que seria corrigido'
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - datetime.timedelta(minutes=options['minutos'])
+        corrigidos = apagados = liberado = 0
+
+        contagem = _contar(Carro, 'foto_principal') + _contar(FotoCarro, 'imagem')
+        antigos = ArquivoFoto.objects.filter(Q(referenciado_em__lt=limite) | Q(referenciado_em__isnull=True))
+        for hash_conteudo, nome, referencias, tamanho in (
+            antigos.values_list('hash', 'nome', 'referencias', 'tamanho').order_by('hash').iterator()
+        ):
+            if contagem[nome] == referencias:
+                continue
+            if options['simular']:
+                reais = _referencias(nome)
+                reais = None if reais == referencias else reais
+            else:
+                # Recontado com a linha travada: um registro pode ter mudado depois da contagem geral
+                reais = armazenamento_fotos.reconciliar(hash_conteudo, _referencias, limite)
+            if reais is None:
+                continue
+            if reais:
+                corrigidos += 1
+            else:
+                apagados += 1
+                liberado += tamanho
+
+        prefixo = '[SIMULAÇÃO] ' if options['simular'] else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[OK] {prefixo}{corrigidos} contagens corrigidas, {apagados} arquivos sem uso apagados '
+                f'({filesizeformat(liberado)} liberados).'
+            )
+        )
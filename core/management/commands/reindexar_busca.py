@@ -0,0 +1,50 @@
+"""
+Comando para recalcular o índice de busca textual dos carros (busca_vetor).
+Processa em lotes por id para não travar a tabela nem estourar memória.
+"""
+from django.core.management.base import BaseCommand
+
+from carros.busca import atualizar_vetor_busca
+from carros.models import Carro
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o vetor de busca (tsvector) de todos os carros, em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Quantidade de carros atualizados por UPDATE (padrão: 2000)'
+        )
+        parser.add_argument(
+            '--apenas-vazios',
+            action='store_true',
+            help='Atualiza só os carros que ainda não têm vetor de busca'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        carros = Carro.objects.all()
+        if options['apenas_vazios']:
+            carros = carros.filter(busca_vetor__isnull=True)
+
+        ultimo_id = 0
+        total = 0
+
+        while True:
+            # Paginação por id: cada lote é uma leitura curta no índice da PK
+            ids = list(
+                carros.filter(id__gt=ultimo_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+
+            total += atualizar_vetor_busca(Carro.objects.filter(id__in=ids))
+            ultimo_id = ids[-1]
+            self.stdout.write(f'  {total} carros reindexados (até id {ultimo_id})')
+
+        self.stdout.write(self.style.SUCCESS(f'\n[OK] Busca reindexada: {total} carros.'))
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Busca textual (tsvector/trigramas)
     'core',  # Necessário para reconhecer comandos de management
     'garagens',
     'carros',
@@ -78,6 +79,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'sitepublico.context_processors.personalizacao',
             ],
         },
     },
@@ -127,6 +129,27 @@ else:
     }
 
 
+# Cache
+# Com REDIS_URL o cache é compartilhado entre os workers do gunicorn, o que é
+# necessário para a invalidação por sinais valer em todos eles.
+# Sem REDIS_URL (desenvolvimento), usa a memória local do processo.
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -4,6 +4,11 @@ from django.conf import settings
 import os
 import mimetypes
 
+from carros.armazenamento import imutavel
+
+# Arquivos nomeados pelo conteúdo nunca mudam: o navegador e a CDN guardam por um ano
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+
 
 def handler404(request, exception):
     """
@@ -36,10 +41,13 @@ def serve_media(request, path):
         if content_type is None:
             content_type = 'application/octet-stream'
         
-        return FileResponse(
+        resposta = FileResponse(
             open(file_path, 'rb'),
             content_type=content_type
         )
+        if imutavel(path):
+            resposta['Cache-Control'] = CACHE_IMUTAVEL
+        return resposta
     else:
         raise Http404("Arquivo não encontrado")
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garagens', '0005_loja_facebook_loja_instagram_loja_maps_url_loja_site_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loja',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
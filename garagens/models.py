@@ -23,6 +23,7 @@ class Loja(models.Model):
 
     logo = models.ImageField(upload_to='logos/', blank=True, null=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lojas')
     limite_carros = models.PositiveIntegerField(default=10)
     cidade = models.ForeignKey(Cidade, on_delete=models.SET_NULL, null=True, blank=True, related_name='lojas')
@@ -1,3 +1,88 @@
-from django.test import TestCase
+from io import BytesIO
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.test import SimpleTestCase
+from PIL import Image
+
+from carros.ingestao import verificar_imagem
+from logistas.uploads import TAMANHO_CABECALHO_WEBP, FotoUploadHandler, ler_cabecalho
+
+
+def _webp(tamanho=(321, 203), **opcoes):
+    saida = BytesIO()
+    Image.new("RGB", tamanho, "red").save(saida, "WEBP", **opcoes)
+    return saida.getvalue()
+
+
+def _vp8x(largura, altura):
+    """Só o cabeçalho RIFF + chunk VP8X, com o canvas declarado."""
+    chunk = bytes(4) + (largura - 1).to_bytes(3, "little") + (altura - 1).to_bytes(3, "little")
+    return b"RIFF" + (4 + 8 + len(chunk)).to_bytes(4, "little") + b"WEBP" + b"VP8X" + len(chunk).to_bytes(4, "little") + chunk
+
+
+class CabecalhoWebpTests(SimpleTestCase):
+    """ler_cabecalho lê as dimensões do WebP pelo primeiro chunk, sem o Pillow."""
+
+    def assertDimensoes(self, dados, chunk):
+        self.assertEqual(dados[12:16], chunk)
+        metadados = ler_cabecalho(dados[:TAMANHO_CABECALHO_WEBP])
+        self.assertEqual((metadados.formato, metadados.largura, metadados.altura), ("WEBP", 321, 203))
+
+    def test_vp8_com_perdas(self):
+        self.assertDimensoes(_webp(), b"VP8 ")
+
+    def test_vp8l_sem_perdas(self):
+        self.assertDimensoes(_webp(lossless=True), b"VP8L")
+
+    def test_vp8x_com_exif(self):
+        self.assertDimensoes(_webp(exif=b"Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00"), b"VP8X")
+
+    def test_vp8x_com_perfil_icc(self):
+        # O conteúdo do perfil não importa: o chunk ICCP já obriga o VP8X
+        self.assertDimensoes(_webp(icc_profile=bytes(128)), b"VP8X")
+
+    def test_cabecalho_incompleto(self):
+        for dados in (_webp(), _webp(lossless=True), _vp8x(800, 600)):
+            self.assertIsNone(ler_cabecalho(dados[: TAMANHO_CABECALHO_WEBP - 1]))
+
+    def test_chunk_desconhecido(self):
+        dados = bytearray(_vp8x(800, 600))
+        dados[12:16] = b"ALPH"
+        self.assertIsNone(ler_cabecalho(bytes(dados)))
+
+    def test_canvas_grande_demais(self):
+        self.assertEqual(ler_cabecalho(_vp8x(8000, 6000))[1:3], (8000, 6000))
+        with self.assertRaises(Image.DecompressionBombError):
+            ler_cabecalho(_vp8x(16384, 16384))
+
+    def test_upload_handler_recusa_canvas_grande_demais(self):
+        request = SimpleNamespace()
+        handler = FotoUploadHandler(request)
+        dados = _vp8x(16384, 16384)
+        handler.new_file("fotos", "foto.webp", "image/webp", len(dados))
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(dados, 0)
+        self.assertEqual(request.erros_upload, ["foto.webp: a imagem tem pixels demais."])
+
+
+class VerificarWebpTests(SimpleTestCase):
+    """verificar_imagem no WebP: o arquivo tem pelo menos o tamanho declarado no RIFF."""
+
+    def _verificar(self, dados):
+        verificar_imagem(SimpleUploadedFile("foto.webp", dados, content_type="image/webp"))
+
+    def test_inteiro(self):
+        self._verificar(_webp((800, 600)))
+
+    def test_truncado(self):
+        dados = _webp((800, 600))
+        with self.assertRaises(OSError):
+            self._verificar(dados[: len(dados) - 10])
+
+    def test_riff_maior_que_o_arquivo(self):
+        dados = bytearray(_webp((800, 600)))
+        dados[4:8] = (len(dados) * 2).to_bytes(4, "little")
+        with self.assertRaises(OSError):
+            self._verificar(bytes(dados))
@@ -0,0 +1,224 @@
+"""
+Upload das fotos no painel do logista.
+
+FotoUploadHandler fica na frente dos handlers padrão do Django e confere as
+fotos enquanto chegam: o cabeçalho da imagem vem nos primeiros pedaços
+(Image.open só lê o cabeçalho), então formato, tamanho e proporção
+(verificar_dimensoes) são checados antes de o arquivo ir para a memória ou
+para o disco. Foto inválida ou maior que LIMITE_FOTO é descartada (SkipFile):
+o resto dela é lido do socket e jogado fora.
+
+A requisição inteira tem um limite (LIMITE_REQUISICAO): com Content-Length
+maior o corpo nem é lido, e passando do limite no meio o upload para
+(StopUpload). Os motivos ficam em request.erros_upload para a view mostrar.
+
+O cabeçalho lido aqui vira os metadados da foto (carros.ingestao): o
+formulário e os validadores não abrem a imagem de novo. JPEG e PNG passam
+pelo Image.open; o Pillow só abre WebP com o arquivo inteiro, então as
+dimensões do WebP são lidas direto do cabeçalho RIFF (_cabecalho_webp).
+"""
+import struct
+from functools import wraps
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+from carros.ingestao import MetadadosImagem, guardar_metadados
+from carros.models import verificar_dimensoes
+
+# Campos de foto dos formulários do logista (os outros arquivos passam direto)
+CAMPOS_FOTO = ("foto_principal", "fotos")
+
+# Formatos que o navegador mostra: o original aparece até os derivados ficarem prontos
+FORMATOS_ACEITOS = ("JPEG", "PNG", "WEBP")
+
+LIMITE_FOTO = 10 * 1024 * 1024
+
+# Foto principal + 7 extras de celular, com folga
+LIMITE_REQUISICAO = 50 * 1024 * 1024
+
+# Até onde o cabeçalho é procurado (o EXIF do JPEG vem antes e pode ter uma miniatura de 64 KB)
+LIMITE_CABECALHO = 256 * 1024
+
+# Bytes mínimos para reconhecer o formato pela assinatura
+TAMANHO_ASSINATURA = 16
+
+# RIFF + tamanho + "WEBP" + cabeçalho do primeiro chunk: as dimensões estão nos primeiros 30 bytes
+TAMANHO_CABECALHO_WEBP = 30
+
+
+def _formato(inicio):
+    """Formato aceito cuja assinatura bate com os primeiros bytes, ou None."""
+    Image.init()
+    for formato in FORMATOS_ACEITOS:
+        aceita = Image.OPEN[formato][1]
+        if aceita(inicio):
+            return formato
+    return None
+
+
+def _cabecalho_webp(cabecalho):
+    """
+    (largura, altura) do WebP pelo primeiro chunk: VP8X (canvas), VP8L
+    (sem perdas) ou VP8 (com perdas). None se ainda faltam bytes ou o
+    chunk não é reconhecido.
+    """
+    if len(cabecalho) < TAMANHO_CABECALHO_WEBP:
+        return None
+    chunk = cabecalho[12:16]
+    if chunk == b"VP8X":
+        # Largura - 1 e altura - 1 em 24 bits little-endian
+        return (
+            int.from_bytes(cabecalho[24:27], "little") + 1,
+            int.from_bytes(cabecalho[27:30], "little") + 1,
+        )
+    if chunk == b"VP8L" and cabecalho[20] == 0x2F:
+        # 14 bits de largura - 1 e 14 de altura - 1, depois da assinatura 0x2f
+        bits = int.from_bytes(cabecalho[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8 " and cabecalho[23:26] == b"\x9d\x01\x2a":
+        # Depois do código de início do quadro-chave: 14 bits de largura e de altura (+ 2 de escala)
+        largura, altura = struct.unpack("<HH", cabecalho[26:30])
+        return largura & 0x3FFF, altura & 0x3FFF
+    return None
+
+
+def ler_cabecalho(cabecalho):
+    """MetadadosImagem (sem o tamanho) se o cabeçalho já chegou inteiro, senão None."""
+    if _formato(cabecalho[:TAMANHO_ASSINATURA]) == "WEBP":
+        dimensoes = _cabecalho_webp(cabecalho)
+        if dimensoes is None:
+            return None
+        # Mesmo limite que o Image.open aplica aos outros formatos
+        if Image.MAX_IMAGE_PIXELS and dimensoes[0] * dimensoes[1] > 2 * Image.MAX_IMAGE_PIXELS:
+            raise Image.DecompressionBombError(f"Imagem WebP {dimensoes[0]}x{dimensoes[1]} com pixels demais")
+        return MetadadosImagem("WEBP", *dimensoes, None)
+    try:
+        with Image.open(BytesIO(cabecalho), formats=FORMATOS_ACEITOS) as imagem:
+            return MetadadosImagem(imagem.format, imagem.width, imagem.height, None)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+class FotoUploadHandler(FileUploadHandler):
+    """
+    Repassa os pedaços para os próximos handlers só depois de conferir a
+    foto. Não gera o arquivo: file_complete retorna None e o Django usa o
+    handler seguinte (memória ou arquivo temporário).
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.recebidos = 0
+        self.excedido = False
+        self.erros = request.erros_upload = []
+        # Campo -> metadados das fotos recebidas, na ordem de request.FILES
+        self.recebidas = request.metadados_upload = {}
+
+    def _recusar(self, motivo):
+        self.erros.append(f"{self.file_name}: {motivo}")
+        raise SkipFile()
+
+    def _parar(self, connection_reset=False):
+        self.erros.append(f"O envio passa do limite de {filesizeformat(LIMITE_REQUISICAO)}. Envie menos fotos por vez.")
+        raise StopUpload(connection_reset)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Só marca: new_file interrompe no primeiro arquivo (os campos de texto antes dele são lidos)
+        self.excedido = content_length > LIMITE_REQUISICAO
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if self.excedido:
+            # Content-Length já passa do limite: responde sem ler o resto do corpo
+            self._parar(connection_reset=True)
+
+        self.conferir = field_name in CAMPOS_FOTO
+        self.cabecalho = bytearray()
+        self.metadados = None
+        if self.conferir and content_length and content_length > LIMITE_FOTO:
+            self._recusar(f"a foto passa do limite de {filesizeformat(LIMITE_FOTO)}.")
+
+    def receive_data_chunk(self, raw_data, start):
+        self.recebidos += len(raw_data)
+        if self.recebidos > LIMITE_REQUISICAO:
+            self._parar()
+        if not self.conferir:
+            return raw_data
+
+        if start + len(raw_data) > LIMITE_FOTO:
+            self._recusar(f"a foto passa do limite de {filesizeformat(LIMITE_FOTO)}.")
+        if self.metadados is None:
+            self._conferir_cabecalho(raw_data)
+        return raw_data
+
+    def _conferir_cabecalho(self, raw_data):
+        self.cabecalho += raw_data
+        if len(self.cabecalho) < TAMANHO_ASSINATURA:
+            return
+        if _formato(bytes(self.cabecalho[:TAMANHO_ASSINATURA])) is None:
+            self._recusar("o arquivo não é uma imagem JPEG, PNG ou WebP.")
+
+        try:
+            metadados = ler_cabecalho(bytes(self.cabecalho))
+        except Image.DecompressionBombError:
+            self._recusar("a imagem tem pixels demais.")
+        if metadados is None:
+            # Cabeçalho incompleto: espera o próximo pedaço (arquivo que acaba antes
+            # disso fica para a validação do formulário)
+            if len(self.cabecalho) >= LIMITE_CABECALHO:
+                self._recusar("não foi possível ler a imagem.")
+            return
+
+        try:
+            verificar_dimensoes(metadados.largura, metadados.altura)
+        except ValidationError as e:
+            self._recusar(" ".join(e.messages))
+        self.metadados = metadados
+        self.cabecalho = None
+
+    def file_complete(self, file_size):
+        if self.conferir:
+            # None: cabeçalho não reconhecido até o fim (o formulário sonda de novo)
+            metadados = self.metadados and self.metadados._replace(tamanho=file_size)
+            self.recebidas.setdefault(self.field_name, []).append(metadados)
+        return None
+
+
+def _anexar_metadados(view):
+    """Passa os metadados do handler para os arquivos de request.FILES."""
+
+    @wraps(view)
+    def envoltorio(request, *args, **kwargs):
+        arquivos = request.FILES  # Lê o upload (se o CSRF ainda não leu)
+        for campo, metadados in request.metadados_upload.items():
+            # Só arquivos completos entram nas duas listas, então a ordem bate
+            for arquivo, dados in zip(arquivos.getlist(campo), metadados):
+                if dados is not None:
+                    guardar_metadados(arquivo, dados)
+        return view(request, *args, **kwargs)
+
+    return envoltorio
+
+
+def conferir_fotos_no_upload(view):
+    """
+    Instala o FotoUploadHandler antes de o corpo da requisição ser lido.
+    O CsrfViewMiddleware lê request.POST antes da view, então a checagem do
+    CSRF passa para dentro (csrf_exempt por fora, csrf_protect por dentro).
+    Usar abaixo do @login_required: anônimo é redirecionado sem ler o upload.
+    """
+    protegida = csrf_protect(_anexar_metadados(view))
+
+    @wraps(view)
+    def envoltorio(request, *args, **kwargs):
+        request.erros_upload, request.metadados_upload = [], {}
+        if request.method == "POST":
+            request.upload_handlers.insert(0, FotoUploadHandler(request))
+        return protegida(request, *args, **kwargs)
+
+    return csrf_exempt(envoltorio)
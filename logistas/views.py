@@ -10,7 +10,9 @@ from functools import wraps
 from garagens.models import Loja
 from carros.models import Carro, FotoCarro, validar_proporcao_imagem
 from carros.forms import CarroForm
+from carros.mercado import preco_de_mercado
 from .forms import LojaForm
+from .uploads import conferir_fotos_no_upload
 from .utils import is_logista
 
 
@@ -82,6 +84,7 @@ def painel(request):
 # ADICIONAR CARRO
 # ----------------------------------
 @login_required
+@conferir_fotos_no_upload
 def adicionar_carro(request, loja_id):
     loja = get_object_or_404(Loja, id=loja_id, usuario=request.user)
 
@@ -92,7 +95,12 @@ def adicionar_carro(request, loja_id):
 
     if request.method == 'POST':
         form = CarroForm(request.POST, request.FILES)
-        if form.is_valid():
+        # Fotos recusadas no upload (logistas.uploads) não chegam em request.FILES
+        if request.erros_upload:
+            for erro in request.erros_upload:
+                messages.error(request, erro)
+            messages.error(request, "Corrija as fotos antes de salvar.")
+        elif form.is_valid():
             # Validação adicional: garantir que foto_principal foi enviada ao criar
             if not request.FILES.get('foto_principal'):
                 form.add_error('foto_principal', 'A foto principal é obrigatória para criar um veículo.')
@@ -134,12 +142,18 @@ def adicionar_carro(request, loja_id):
 # EDITAR CARRO
 # ----------------------------------
 @login_required
+@conferir_fotos_no_upload
 def editar_carro(request, carro_id):
-    carro = get_object_or_404(Carro, id=carro_id, loja__usuario=request.user)
+    carro = get_object_or_404(Carro.objects.select_related("loja"), id=carro_id, loja__usuario=request.user)
 
     if request.method == 'POST':
         form = CarroForm(request.POST, request.FILES, instance=carro)
-        if form.is_valid():
+        # Fotos recusadas no upload (logistas.uploads) não chegam em request.FILES
+        if request.erros_upload:
+            for erro in request.erros_upload:
+                messages.error(request, erro)
+            messages.error(request, "Corrija as fotos antes de salvar. Remova as fotos inválidas ou substitua por imagens compatíveis.")
+        elif form.is_valid():
             # Validação adicional: garantir que sempre tenha foto_principal
             # Se não enviou nova foto, deve manter a existente
             nova_foto = request.FILES.get('foto_principal')
@@ -189,7 +203,9 @@ def editar_carro(request, carro_id):
     return render(request, "logistas/editar_carro.html", {
         "form": form, 
         "carro": carro,
-        "fotos_restantes": fotos_restantes
+        "fotos_restantes": fotos_restantes,
+        # Faixa pré-calculada (comando atualizar_precos_mercado): uma consulta
+        "mercado": preco_de_mercado(carro, carro.loja.cidade_id),
     })
 
 
@@ -212,6 +228,7 @@ def excluir_carro(request, carro_id):
 # ADICIONAR FOTOS
 # ----------------------------------
 @login_required
+@conferir_fotos_no_upload
 def adicionar_fotos(request, carro_id):
     carro = get_object_or_404(Carro, id=carro_id, loja__usuario=request.user)
 
@@ -226,7 +243,8 @@ def adicionar_fotos(request, carro_id):
             messages.error(request, "Este carro já possui o máximo de 7 fotos.")
         else:
             adicionadas = 0
-            erros_fotos = []
+            # Já recusadas no upload (logistas.uploads)
+            erros_fotos = list(request.erros_upload)
             
             for idx, img in enumerate(imagens[:restantes], 1):
                 try:
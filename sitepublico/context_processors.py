@@ -0,0 +1,16 @@
+"""
+Context processors do site público.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from carros.personalizacao import estado_usuario
+
+
+def personalizacao(request):
+    """
+    Favoritos e carros vistos do usuário logado, para os selos dos cards.
+    Só vai ao cache se algum template usar.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {"personalizacao": SimpleLazyObject(lambda: estado_usuario(request.user.pk))}
@@ -0,0 +1,115 @@
+"""
+Facetas da listagem de carros: quantos veículos cada opção dos filtros retorna.
+
+A contagem de cada faceta considera todos os filtros aplicados, menos o da
+própria faceta (assim o usuário vê as alternativas da marca que já escolheu).
+As seis contagens são agregações GROUP BY na tabela da listagem
+(CarroListagem, a mesma do total da página), unidas com UNION ALL em uma
+única consulta. O resultado fica em cache pela assinatura dos filtros e
+pela versão do catálogo (que muda quando o estoque muda).
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import CharField, Count, Value
+from django.db.models.functions import Cast
+
+from carros.catalogo import opcoes_filtros, versao_catalogo
+from carros.models import Carro, CarroListagem
+from .filtros import filtrar_carros
+
+# faceta -> (parâmetros da querystring que a própria faceta controla, coluna agrupada)
+FACETAS = {
+    "marca": (("marca",), "marca_id"),
+    "cidade": (("cidade",), "cidade_id"),
+    "combustivel": (("combustivel",), "combustivel"),
+    "cambio": (("cambio",), "cambio"),
+    "portas": (("portas",), "portas"),
+    "ano": (("ano_min", "ano_max"), "ano"),
+}
+
+# Parâmetros que alteram o resultado das contagens (cursor e afins ficam de fora)
+PARAMETROS_FILTRO = (
+    "marca", "cidade", "preco_min", "preco_max", "busca",
+    "combustivel", "cambio", "portas", "ano_min", "ano_max",
+)
+
+TEMPO_CACHE = 60 * 5  # 5 minutos
+
+
+def assinatura_filtros(params):
+    """Chave estável para um conjunto de filtros, independente da ordem e de parâmetros vazios."""
+    normalizados = {
+        nome: params.get(nome, "").strip()
+        for nome in PARAMETROS_FILTRO
+        if params.get(nome, "").strip()
+    }
+    bruto = json.dumps(normalizados, sort_keys=True)
+    return hashlib.sha1(bruto.encode()).hexdigest()
+
+
+def _consulta_faceta(nome, params):
+    proprios, coluna = FACETAS[nome]
+    outros_filtros = {k: v for k, v in params.items() if k not in proprios}
+
+    return (
+        filtrar_carros(CarroListagem.objects.all(), outros_filtros)
+        .values(faceta=Value(nome), valor=Cast(coluna, output_field=CharField()))
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+
+
+def contar_facetas(params):
+    """
+    Retorna {faceta: {valor: total}} para os filtros informados.
+    Os valores vêm como texto, do mesmo jeito que chegam na querystring.
+    """
+    params = {nome: params.get(nome, "") for nome in PARAMETROS_FILTRO}
+    chave = f"facetas:{versao_catalogo()}:{assinatura_filtros(params)}"
+
+    contagens = cache.get(chave)
+    if contagens is not None:
+        return contagens
+
+    nomes = list(FACETAS)
+    consulta = _consulta_faceta(nomes[0], params).union(
+        *(_consulta_faceta(nome, params) for nome in nomes[1:]),
+        all=True,
+    )
+
+    contagens = {nome: {} for nome in nomes}
+    for linha in consulta:
+        if linha["valor"] is not None:
+            contagens[linha["faceta"]][linha["valor"]] = linha["total"]
+
+    cache.set(chave, contagens, TEMPO_CACHE)
+    return contagens
+
+
+def _opcoes(valores_rotulos, contagens):
+    return [
+        {"valor": str(valor), "rotulo": rotulo, "total": contagens.get(str(valor), 0)}
+        for valor, rotulo in valores_rotulos
+    ]
+
+
+def facetas_da_listagem(params):
+    """
+    Opções de cada filtro da listagem já com a contagem de veículos.
+    Formato: {faceta: [{"valor", "rotulo", "total"}, ...]}, usado no template e na API.
+    """
+    contagens = contar_facetas(params)
+    opcoes = opcoes_filtros()
+
+    cidades = [(cidade_id, f"{nome} — {estado}") for cidade_id, nome, estado in opcoes["cidades"]]
+
+    return {
+        "marca": _opcoes(opcoes["marcas"], contagens["marca"]),
+        "cidade": _opcoes(cidades, contagens["cidade"]),
+        "combustivel": _opcoes(Carro._meta.get_field("combustivel").choices, contagens["combustivel"]),
+        "cambio": _opcoes(Carro._meta.get_field("cambio").choices, contagens["cambio"]),
+        "portas": _opcoes(((p, f"{p} portas") for p in opcoes["portas"]), contagens["portas"]),
+        "ano": _opcoes(((a, str(a)) for a in opcoes["anos"]), contagens["ano"]),
+    }
@@ -0,0 +1,85 @@
+"""
+Filtros da listagem pública de carros.
+
+Centraliza a leitura dos parâmetros da querystring para que a página de
+listagem e os endpoints que carregam as próximas páginas apliquem
+exatamente os mesmos filtros. Funciona tanto sobre Carro quanto sobre o
+modelo de leitura CarroListagem (que tem os mesmos campos de filtro).
+"""
+from carros.busca import filtrar_busca
+from carros.models import Carro
+
+
+def filtrar_carros(carros, params):
+    """
+    Aplica os filtros da listagem (querystring) sobre um queryset de Carro
+    ou CarroListagem. Valores inválidos são ignorados, como sempre foi na listagem.
+    """
+    marca = params.get("marca")
+    cidade = params.get("cidade")
+    preco_min = params.get("preco_min")
+    preco_max = params.get("preco_max")
+    busca = params.get("busca")
+    combustivel = params.get("combustivel")
+    cambio = params.get("cambio")
+    portas = params.get("portas")
+
+    ano_min = params.get("ano_min")
+    ano_max = params.get("ano_max")
+
+    if marca:
+        try:
+            carros = carros.filter(marca_id=int(marca))
+        except (ValueError, TypeError):
+            pass  # Ignora valores inválidos
+
+    if cidade:
+        try:
+            campo_cidade = "loja__cidade_id" if carros.model is Carro else "cidade_id"
+            carros = carros.filter(**{campo_cidade: int(cidade)})
+        except (ValueError, TypeError):
+            pass  # Ignora valores inválidos
+
+    if preco_min:
+        try:
+            carros = carros.filter(preco__gte=float(preco_min))
+        except (ValueError, TypeError):
+            pass  # Ignora valores inválidos
+
+    if preco_max:
+        try:
+            carros = carros.filter(preco__lte=float(preco_max))
+        except (ValueError, TypeError):
+            pass  # Ignora valores inválidos
+
+    if busca:
+        # Full-text (nome, marca, modelo, versão, descrição) + trigramas no nome
+        busca = busca.strip()
+        if busca:
+            carros = filtrar_busca(carros, busca)
+
+    if combustivel:
+        carros = carros.filter(combustivel=combustivel)
+
+    if cambio:
+        carros = carros.filter(cambio=cambio)
+
+    if portas:
+        try:
+            carros = carros.filter(portas=int(portas))
+        except (ValueError, TypeError):
+            pass  # Ignora valores inválidos
+
+    if ano_min:
+        try:
+            carros = carros.filter(ano__gte=int(ano_min))
+        except (ValueError, TypeError):
+            pass  # Ignora valores inválidos
+
+    if ano_max:
+        try:
+            carros = carros.filter(ano__lte=int(ano_max))
+        except (ValueError, TypeError):
+            pass  # Ignora valores inválidos
+
+    return carros
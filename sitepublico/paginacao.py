@@ -0,0 +1,99 @@
+"""
+Paginação por cursor (keyset) para as listagens públicas.
+
+Em vez de OFFSET, cada página começa logo depois dos valores da chave de
+ordenação do último item da página anterior. O banco desce direto no índice
+a partir do cursor, então a página N custa o mesmo que a página 1.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+POR_PAGINA = 24
+
+# Ordenação padrão da listagem: mais recentes primeiro.
+# A última coluna de qualquer ordenação deve ser única (id) para o cursor ser estável.
+ORDENACAO_PADRAO = ("-id",)
+
+# Modos do parâmetro ?ordenar= : valor -> (rótulo, colunas).
+# Cada modo tem um índice (coluna, id) em CarroListagem; as colunas vão
+# sempre na mesma direção para o banco poder ler o índice de trás para frente.
+ORDENACOES = {
+    "recentes": ("Mais recentes", ORDENACAO_PADRAO),
+    "menor_preco": ("Menor preço", ("preco", "id")),
+    "maior_preco": ("Maior preço", ("-preco", "-id")),
+    "menor_km": ("Menor quilometragem", ("km", "id")),
+    "mais_novos": ("Ano mais novo", ("-ano", "-id")),
+    "mais_vistos": ("Mais vistos", ("-visualizacoes", "-id")),
+}
+
+
+def codificar_cursor(valores):
+    """Transforma os valores da chave de ordenação em um token seguro para URL."""
+    bruto = json.dumps(list(valores), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """Retorna a lista de valores do cursor, ou None se o token for inválido."""
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+    except (ValueError, TypeError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def _apos_cursor(ordenacao, valores):
+    """
+    Monta o filtro equivalente a "(a, b, id) > (va, vb, vid)", respeitando
+    a direção de cada coluna da ordenação.
+    """
+    condicao = Q()
+    iguais = {}
+    for campo, valor in zip(ordenacao, valores):
+        nome = campo.lstrip("-")
+        lookup = "lt" if campo.startswith("-") else "gt"
+        condicao |= Q(**iguais, **{f"{nome}__{lookup}": valor})
+        iguais[nome] = valor
+
+    # Limite redundante na primeira coluna ("a >= va"): é ele que o banco usa
+    # como condição de início no índice, já que o OR acima não é indexável
+    primeiro = ordenacao[0]
+    lookup = "lte" if primeiro.startswith("-") else "gte"
+    return Q(**{f"{primeiro.lstrip('-')}__{lookup}": valores[0]}) & condicao
+
+
+def consulta_keyset(queryset, ordenacao=ORDENACAO_PADRAO, cursor=None, por_pagina=POR_PAGINA):
+    """
+    Queryset (ainda não executado) da página que começa após `cursor`, com
+    um item a mais para saber se existe próxima página.
+    Cursores inválidos são ignorados e a listagem volta para a primeira página.
+    """
+    valores = decodificar_cursor(cursor)
+    if valores is not None and len(valores) == len(ordenacao):
+        try:
+            queryset = queryset.filter(_apos_cursor(ordenacao, valores))
+        except (ValueError, TypeError, ValidationError):
+            pass  # Ignora cursores adulterados
+
+    return queryset.order_by(*ordenacao)[:por_pagina + 1]
+
+
+def paginar_keyset(queryset, ordenacao=ORDENACAO_PADRAO, cursor=None, por_pagina=POR_PAGINA):
+    """
+    Retorna (itens, proximo_cursor) da página que começa após `cursor`.
+    `proximo_cursor` é None quando não há mais resultados.
+    """
+    itens = list(consulta_keyset(queryset, ordenacao, cursor, por_pagina))
+    if len(itens) <= por_pagina:
+        return itens, None
+
+    itens = itens[:por_pagina]
+    ultimo = itens[-1]
+    proximo_cursor = codificar_cursor(getattr(ultimo, campo.lstrip("-")) for campo in ordenacao)
+    return itens, proximo_cursor
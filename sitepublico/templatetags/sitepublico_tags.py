@@ -0,0 +1,66 @@
+"""
+Template tags do site público.
+"""
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+TEMPLATE_CARD = "sitepublico/parciais/card_carro.html"
+
+# Mudar ao alterar o HTML do card, para não servir fragmentos antigos do cache
+VERSAO_TEMPLATE_CARD = 2
+
+TEMPO_CACHE_CARD = 60 * 60 * 24  # 1 dia (versões antigas expiram sozinhas)
+
+# Selos opcionais sobre a foto: nome -> texto
+SELOS = {
+    "historico": "Visualizado",
+    "favorito": "♥ Favorito",
+    "visto": "Já visto",
+}
+
+
+def chave_card(carro, classe, selos=()):
+    """Chave do HTML do card: muda sempre que a linha de listagem do carro é regravada."""
+    versao = int(carro.atualizado_em.timestamp() * 1_000_000)
+    return f"card:{VERSAO_TEMPLATE_CARD}:{classe}:{'-'.join(selos)}:{carro.id}:{versao}"
+
+
+def _selos_pessoais(context, carro, selos):
+    """Selos de favorito e já visto, pelo estado do usuário (context processor personalizacao)."""
+    estado = context.get("personalizacao")
+    if not estado:
+        return ()
+    pessoais = []
+    if carro.id in estado["favoritos"]:
+        pessoais.append("favorito")
+    if carro.id in estado["vistos"] and "historico" not in selos:
+        pessoais.append("visto")
+    return tuple(pessoais)
+
+
+@register.simple_tag(takes_context=True)
+def card_carro(context, carro, classe="car", *selos, personalizar=True):
+    """
+    Card de um carro (CarroListagem), com o HTML em cache por (id, versão, selos).
+    `classe` é o prefixo das classes CSS da página (car, carro, favorito).
+    Para usuários logados, marca os carros favoritados e já vistos
+    (personalizar=False desliga, ex.: na página de favoritos).
+    Uso: {% card_carro carro "carro" "historico" %}
+    """
+    if personalizar:
+        selos = selos + _selos_pessoais(context, carro, selos)
+
+    chave = chave_card(carro, classe, selos)
+    html = cache.get(chave)
+    if html is None:
+        html = render_to_string(TEMPLATE_CARD, {
+            "carro": carro,
+            "classe": classe,
+            "selos": [(selo, SELOS[selo]) for selo in selos],
+        })
+        cache.set(chave, html, TEMPO_CACHE_CARD)
+    return mark_safe(html)
@@ -1,3 +1,67 @@
+import random
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from carros.models import CarroListagem
+from sitepublico.filtros import filtrar_carros
+from sitepublico.paginacao import ORDENACOES, consulta_keyset, paginar_keyset
+
+
+@skipUnless(connection.vendor == "postgresql", "Planos de execução só são verificados no PostgreSQL")
+class OrdenacaoListagemPlanoTests(TestCase):
+    """
+    Cada modo de ?ordenar= precisa ser atendido por um índice: a página
+    (filtro + ordenação + LIMIT) não pode virar um Sort da tabela inteira.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        aleatorio = random.Random(42)
+        CarroListagem.objects.bulk_create(
+            [
+                CarroListagem(
+                    id=i,
+                    loja_id=1,
+                    marca_id=aleatorio.randint(1, 20),
+                    nome=f"Carro {i}",
+                    ano=aleatorio.randint(1995, 2025),
+                    km=aleatorio.randint(0, 300000),
+                    preco=aleatorio.randint(15, 400) * 1000,
+                    combustivel="flex",
+                    cambio="manual",
+                    visualizacoes=aleatorio.randint(0, 5000),
+                    marca_nome="Marca",
+                    loja_nome="Loja",
+                )
+                for i in range(1, 20001)
+            ],
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE carros_carrolistagem")
+
+    def plano(self, params, ordenar, cursor=None):
+        carros = filtrar_carros(CarroListagem.objects.all(), params)
+        return consulta_keyset(carros, ORDENACOES[ordenar][1], cursor).explain()
+
+    def assertSemSort(self, plano):
+        self.assertIn("Index", plano)
+        self.assertNotIn("Sort", plano)
+
+    def test_ordenacoes_sem_filtro_usam_indice(self):
+        for ordenar in ORDENACOES:
+            with self.subTest(ordenar=ordenar):
+                self.assertSemSort(self.plano({}, ordenar))
+
+    def test_ordenacoes_com_filtro_de_marca_usam_indice(self):
+        for ordenar in ("recentes", "menor_preco", "maior_preco", "mais_novos"):
+            with self.subTest(ordenar=ordenar):
+                self.assertSemSort(self.plano({"marca": "7"}, ordenar))
+
+    def test_paginas_seguintes_usam_o_mesmo_indice(self):
+        for ordenar in ORDENACOES:
+            with self.subTest(ordenar=ordenar):
+                _, cursor = paginar_keyset(CarroListagem.objects.all(), ORDENACOES[ordenar][1])
+                self.assertSemSort(self.plano({}, ordenar, cursor))
@@ -5,17 +5,22 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('entrar/', views.login_inteligente, name='login_inteligente'),
     path('carros/', views.listar_carros, name='listar_carros'),
+    path('carros/pagina/', views.listar_carros_pagina, name='listar_carros_pagina'),
+    path('carros/em-alta/', views.em_alta, name='em_alta'),
     path('carro/<int:carro_id>/', views.detalhes_carro, name='detalhes_carro'),
     path('loja/<int:loja_id>/', views.pagina_loja, name='pagina_loja'),
     path('lojas/', views.listar_lojas, name='listar_lojas'),
       # FAVORITOS
     path("favoritar/<int:carro_id>/", views.favoritar, name="favoritar"),
     path("favoritos/", views.favoritos, name="favoritos"),
+    path("favoritos/lote/", views.favoritos_lote, name="favoritos_lote"),
     # HISTÓRICO
     path("historico/", views.historico_visualizacoes, name="historico_visualizacoes"),
     path("historico/limpar/", views.limpar_historico, name="limpar_historico"),
     path("api/modelos/<int:marca_id>/", views.api_modelos, name="api_modelos"),
     path("api/versoes/<int:modelo_id>/", views.api_versoes, name="api_versoes"),
+    path("api/facetas/", views.api_facetas, name="api_facetas"),
+    path("api/carros/", views.api_carros, name="api_carros"),
     # Temporariamente desabilitado - será reativado quando houver motos, caminhões, etc.
     # path("categorias/", views.categorias, name="categorias"),
 
@@ -0,0 +1,56 @@
+"""
+GET condicional (ETag / Last-Modified) para as páginas públicas.
+
+Cada view calcula um ETag barato (datas de modificação e contagens, sem
+montar a página) antes das consultas pesadas. Se o navegador ou o proxy já
+tem essa versão, a resposta é um 304 sem renderização.
+
+Para usuários logados o ETag inclui o id do usuário (o cabeçalho e os
+favoritos mudam por pessoa), o Last-Modified não é enviado e a resposta é
+marcada como privada. Páginas anônimas podem ser guardadas pelo proxy.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+# Mudar ao alterar os templates, para invalidar as versões guardadas pelos clientes
+VERSAO_PAGINAS = 1
+
+
+def calcular_etag(request, *partes):
+    """ETag forte a partir das partes informadas, da versão dos templates e do usuário."""
+    bruto = repr((VERSAO_PAGINAS, request.user.pk, *partes))
+    return f'"{hashlib.sha1(bruto.encode()).hexdigest()}"'
+
+
+def _ultima_modificacao(request, datas):
+    if request.user.is_authenticated:
+        return None
+    datas = [data for data in datas if data is not None]
+    return int(max(datas).timestamp()) if datas else None
+
+
+def resposta_condicional(request, etag, datas=()):
+    """Retorna um 304 (já com os validadores) se o cliente tem a versão atual, senão None."""
+    resposta = get_conditional_response(
+        request, etag=etag, last_modified=_ultima_modificacao(request, datas)
+    )
+    if resposta is not None:
+        aplicar_validadores(request, resposta, etag, datas)
+    return resposta
+
+
+def aplicar_validadores(request, resposta, etag, datas=()):
+    """Inclui ETag, Last-Modified (só anônimos) e Cache-Control na resposta."""
+    resposta.headers["ETag"] = etag
+    ultima_modificacao = _ultima_modificacao(request, datas)
+    if ultima_modificacao is not None:
+        resposta.headers["Last-Modified"] = http_date(ultima_modificacao)
+
+    # no-cache: o cliente pode guardar, mas revalida sempre (e recebe 304)
+    if request.user.is_authenticated:
+        patch_cache_control(resposta, private=True, no_cache=True)
+    else:
+        patch_cache_control(resposta, public=True, no_cache=True)
+    return resposta
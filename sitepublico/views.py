@@ -1,9 +1,17 @@
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET, require_POST
 
 from carros.models import (
     Carro,
+    CarroListagem,
     FotoCarro,
     Marca,
     Favorito,
@@ -12,8 +20,22 @@ from carros.models import (
     CategoriaVeiculo,
     VisualizacaoCarro,
 )
+from carros.busca import anotar_relevancia
+from carros.catalogo import opcoes_filtros
+from carros.contadores import registrar_visualizacao
+from carros.favoritos import alterar_favoritos, alternar_favorito
+from carros.historico import atualizar_totais as atualizar_totais_historico, descartar_usuario, registrar_visita
+from carros.mercado import preco_de_mercado, versao_precos
+from carros.personalizacao import estado_usuario, invalidar as invalidar_personalizacao, versao_usuario
+from carros.similares import carros_similares, versao_cards_similares, versao_similares
+from carros.tendencias import carros_em_alta
 from garagens.models import Loja, Cidade
 from logistas.utils import is_logista
+from .facetas import PARAMETROS_FILTRO, facetas_da_listagem
+from .filtros import filtrar_carros
+from .paginacao import ORDENACAO_PADRAO, ORDENACOES, paginar_keyset
+from .validadores import aplicar_validadores, calcular_etag, resposta_condicional
+from .vitrine import blocos_home
 
 
 # -------------------- LOGIN INTELIGENTE --------------------
@@ -35,135 +57,88 @@ def login_inteligente(request):
 
 # -------------------- HOME --------------------
 def home(request):
-    # Otimizado: select_related para evitar N+1 queries
-    ultimos_carros = Carro.objects.select_related('marca', 'loja', 'loja__cidade').order_by("-id")[:6]
-    marcas = Marca.objects.all().order_by("nome")[:10]
-
-    return render(
-        request,
-        "sitepublico/home.html",
-        {
-            "ultimos_carros": ultimos_carros,
-            "marcas": marcas,
-        },
-    )
+    # Últimos carros, marcas e destaques vêm do cache (remontados quando o estoque muda)
+    return render(request, "sitepublico/home.html", blocos_home())
 
 
 # -------------------- LISTAGEM --------------------
 
+def _paginar_listagem(request, carros):
+    """
+    Página atual da listagem na ordem pedida em ?ordenar=.
+    Com busca e sem ordenação escolhida, os mais relevantes vêm primeiro.
+    """
+    ordenar = request.GET.get("ordenar")
+    busca = request.GET.get("busca", "").strip()
+
+    if ordenar in ORDENACOES:
+        ordenacao = ORDENACOES[ordenar][1]
+    elif busca:
+        carros = anotar_relevancia(carros, busca)
+        ordenacao = ("-relevancia", "-id")
+    else:
+        ordenacao = ORDENACAO_PADRAO
+
+    return paginar_keyset(carros, ordenacao, cursor=request.GET.get("cursor"))
+
+
 def listar_carros(request):
-    # Otimizado: select_related para evitar N+1 queries
-    carros = Carro.objects.select_related('marca', 'loja', 'loja__cidade').prefetch_related('fotos')
-    marcas = Marca.objects.all()
-    cidades = Cidade.objects.all()
-
-    # --- CAPTURAR FILTROS ---
-    marca = request.GET.get("marca")
-    cidade = request.GET.get("cidade")
-    preco_min = request.GET.get("preco_min")
-    preco_max = request.GET.get("preco_max")
-    busca = request.GET.get("busca")
-    combustivel = request.GET.get("combustivel")
-    cambio = request.GET.get("cambio")
-    portas = request.GET.get("portas")
-
-    ano_min = request.GET.get("ano_min")
-    ano_max = request.GET.get("ano_max")
-
-    # --- APLICAR FILTROS (com validação de tipos) ---
-    if marca:
-        try:
-            carros = carros.filter(marca_id=int(marca))
-        except (ValueError, TypeError):
-            pass  # Ignora valores inválidos
-
-    if cidade:
-        try:
-            carros = carros.filter(loja__cidade_id=int(cidade))
-        except (ValueError, TypeError):
-            pass  # Ignora valores inválidos
-
-    if preco_min:
-        try:
-            carros = carros.filter(preco__gte=float(preco_min))
-        except (ValueError, TypeError):
-            pass  # Ignora valores inválidos
-
-    if preco_max:
-        try:
-            carros = carros.filter(preco__lte=float(preco_max))
-        except (ValueError, TypeError):
-            pass  # Ignora valores inválidos
-
-    if busca:
-        # Sanitiza a busca removendo caracteres perigosos
-        busca = busca.strip()
-        if busca:
-            carros = carros.filter(nome__icontains=busca)
-
-    if combustivel:
-        carros = carros.filter(combustivel=combustivel)
-
-    if cambio:
-        carros = carros.filter(cambio=cambio)
-
-    if portas:
-        try:
-            carros = carros.filter(portas=int(portas))
-        except (ValueError, TypeError):
-            pass  # Ignora valores inválidos
-
-    if ano_min:
-        try:
-            carros = carros.filter(ano__gte=int(ano_min))
-        except (ValueError, TypeError):
-            pass  # Ignora valores inválidos
-
-    if ano_max:
-        try:
-            carros = carros.filter(ano__lte=int(ano_max))
-        except (ValueError, TypeError):
-            pass  # Ignora valores inválidos
-
-    # --- LISTAS PARA O TEMPLATE ---
-    combustiveis = Carro._meta.get_field("combustivel").choices
-    cambios = Carro._meta.get_field("cambio").choices
-
-    portas_opcoes = (
-        Carro.objects.order_by("portas")
-        .values_list("portas", flat=True)
-        .distinct()
-    )
+    # Lê a tabela de listagem (sem joins); a contagem é um COUNT no banco
+    carros = filtrar_carros(CarroListagem.objects.all(), request.GET)
+    total = carros.count()
 
-    anos = (
-        Carro.objects.order_by("ano")
-        .values_list("ano", flat=True)
-        .distinct()
-    )
+    # Paginação por cursor: só a página atual é carregada em memória
+    pagina, proximo_cursor = _paginar_listagem(request, carros)
+
+    # Opções dos filtros com a quantidade de veículos de cada uma
+    facetas = facetas_da_listagem(request.GET)
+
+    # "Em alta" só na primeira página da listagem sem filtros (vem do cache da home)
+    filtrando = any(request.GET.get(nome) for nome in PARAMETROS_FILTRO)
+    em_alta = [] if filtrando or request.GET.get("cursor") else blocos_home()["em_alta"]
 
     return render(request, "sitepublico/listar_carros.html", {
-        "carros": carros,
-        "marcas": marcas,
-        "cidades": cidades,
-        "combustiveis": combustiveis,
-        "cambios": cambios,
-        "portas": portas_opcoes,
-        "anos": anos,
+        "carros": pagina,
+        "total": total,
+        "proximo_cursor": proximo_cursor,
+        "facetas": facetas,
+        "ordenacoes": [(valor, rotulo) for valor, (rotulo, _) in ORDENACOES.items()],
+        "em_alta": em_alta,
+    })
+
+
+def listar_carros_pagina(request):
+    """
+    Próxima página da listagem para o scroll infinito.
+    Devolve só o HTML dos cards e o cursor seguinte, sem contagem nem filtros laterais.
+    """
+    carros = filtrar_carros(CarroListagem.objects.all(), request.GET)
+    pagina, proximo_cursor = _paginar_listagem(request, carros)
+
+    html = render_to_string(
+        "sitepublico/parciais/cards_carros.html", {"carros": pagina}, request=request
+    )
+
+    return JsonResponse({
+        "html": html,
+        "quantidade": len(pagina),
+        "proximo_cursor": proximo_cursor,
     })
+
+
 # -------------------- DETALHE --------------------
 
 
 
 def detalhes_carro(request, carro_id):
-    # Otimizado: select_related para evitar N+1 queries
-    carro = get_object_or_404(
-        Carro.objects.select_related('marca', 'modelo', 'versao', 'loja', 'loja__cidade'),
-        id=carro_id
-    )
+    # Datas de modificação do carro e da loja: base do ETag, lidas antes da página
+    datas = Carro.objects.filter(id=carro_id).values_list("atualizado_em", "loja__atualizado_em").first()
+    if datas is None:
+        raise Http404("Carro não encontrado")
 
-    # contador de visualização
-    carro.visualizacoes += 1
-    carro.save(update_fields=['visualizacoes'])
+    # Contador de visualização: soma em memória, gravado em lote por carros.contadores.
+    # Conta antes do 304: a visita vale mesmo sem renderizar a página
+    registrar_visualizacao(carro_id)
 
     # Registrar visualização no histórico (apenas para usuários autenticados)
     if request.user.is_authenticated:
@@ -171,50 +146,93 @@ def detalhes_carro(request, carro_id):
         ip_address = None
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
-            ip_address = x_forwarded_for.split(',')[0]
+            ip_address = x_forwarded_for.split(',')[0].strip()
         else:
             ip_address = request.META.get('REMOTE_ADDR')
         
-        # Usa update_or_create para evitar duplicatas e atualizar data
-        from django.utils import timezone
-        VisualizacaoCarro.objects.update_or_create(
-            usuario=request.user,
-            carro=carro,
-            defaults={'data_visualizacao': timezone.now(), 'ip_address': ip_address}
-        )
+        # Gravado em lote fora da requisição (uma linha por usuário e carro)
+        registrar_visita(request.user.id, carro_id, ip_address)
 
-    # Otimizado: já vem com prefetch_related se necessário
-    fotos_extras = carro.fotos.all()
-
-    # 🔥 Verifica se o carro já é favorito do usuário atual
+    # 🔥 Verifica se o carro já é favorito do usuário atual (entra no ETag; vem do cache)
     if request.user.is_authenticated:
-        carro.is_favorito = Favorito.objects.filter(
-            usuario=request.user,
-            carro=carro
-        ).exists()
+        is_favorito = carro_id in estado_usuario(request.user.id)["favoritos"]
     else:
-        carro.is_favorito = False
+        is_favorito = False
+
+    # Os cards de carros parecidos mudam a cada recálculo e quando um deles é
+    # editado ou apagado; o selo de preço, quando os preços de mercado mudam
+    etag = calcular_etag(
+        request, "carro", carro_id, *datas, is_favorito,
+        versao_similares(), *versao_cards_similares(carro_id), versao_precos(),
+    )
+    # Sem Last-Modified: as datas do carro e da loja não mudam quando os parecidos
+    # ou o preço de mercado mudam, e um If-Modified-Since sozinho daria 304 errado
+    nao_modificado = resposta_condicional(request, etag)
+    if nao_modificado:
+        return nao_modificado
 
-    return render(request, 'sitepublico/detalhes_carro.html', {
+    # Otimizado: select_related para evitar N+1 queries
+    carro = get_object_or_404(
+        Carro.objects.select_related('marca', 'modelo', 'versao', 'loja', 'loja__cidade'),
+        id=carro_id
+    )
+    carro.is_favorito = is_favorito
+
+    # Otimizado: já vem com prefetch_related se necessário
+    fotos_extras = carro.fotos.all()
+
+    resposta = render(request, 'sitepublico/detalhes_carro.html', {
         'carro': carro,
         'fotos_extras': fotos_extras,
+        # Lista pré-calculada (comando calcular_similares): uma consulta
+        'similares': carros_similares(carro_id),
+        'mercado': preco_de_mercado(carro, carro.loja.cidade_id),
     })
+    return aplicar_validadores(request, resposta, etag)
 
 
 # -------------------- LOJA --------------------
 def pagina_loja(request, loja_id):
+    # Versão da página: data da loja e a do card mais recente (a contagem pega remoções)
+    loja_atualizada = Loja.objects.filter(id=loja_id).values_list("atualizado_em", flat=True).first()
+    if loja_atualizada is None:
+        raise Http404("Loja não encontrada")
+    cards = CarroListagem.objects.filter(loja_id=loja_id).aggregate(
+        atualizado_em=Max("atualizado_em"), total=Count("id")
+    )
+
+    # Selos de favorito / já visto dos cards mudam o HTML para usuários logados
+    pessoal = versao_usuario(request.user.id) if request.user.is_authenticated else None
+
+    datas = (loja_atualizada, cards["atualizado_em"])
+    etag = calcular_etag(request, "loja", loja_id, *datas, cards["total"], pessoal)
+    nao_modificado = resposta_condicional(request, etag, datas)
+    if nao_modificado:
+        return nao_modificado
+
     # Otimizado: select_related para evitar N+1 queries
     loja = get_object_or_404(Loja.objects.select_related('cidade'), id=loja_id)
-    carros = Carro.objects.filter(loja=loja).select_related('marca', 'loja', 'loja__cidade').prefetch_related('fotos')
+    carros = CarroListagem.objects.filter(loja_id=loja.id).order_by("-id")
 
-    return render(request, 'sitepublico/pagina_loja.html', {
+    resposta = render(request, 'sitepublico/pagina_loja.html', {
         'loja': loja,
         'carros': carros,
     })
+    return aplicar_validadores(request, resposta, etag, datas)
     
 def listar_lojas(request):
     cidade_id = request.GET.get("cidade")
 
+    # Versão da página: loja alterada mais recentemente, quantidade de lojas e cidades do filtro
+    versao = Loja.objects.aggregate(atualizado_em=Max("atualizado_em"), total=Count("id"))
+    cidades_filtro = opcoes_filtros()["cidades"]
+
+    datas = (versao["atualizado_em"],)
+    etag = calcular_etag(request, "lojas", cidade_id, *datas, versao["total"], cidades_filtro)
+    nao_modificado = resposta_condicional(request, etag, datas)
+    if nao_modificado:
+        return nao_modificado
+
     lojas = Loja.objects.all()
 
     if cidade_id:
@@ -222,30 +240,76 @@ def listar_lojas(request):
 
     cidades = Cidade.objects.all().order_by("nome")
 
-    return render(request, "sitepublico/listar_lojas.html", {
+    resposta = render(request, "sitepublico/listar_lojas.html", {
         "lojas": lojas,
         "cidades": cidades,
     })
+    return aplicar_validadores(request, resposta, etag, datas)
     
 # -------------------- FAVORITAR / DESFAVORITAR --------------------
 
 
 @login_required
 def favoritar(request, carro_id):
-    carro = get_object_or_404(Carro, id=carro_id)
-    fav, created = Favorito.objects.get_or_create(usuario=request.user, carro=carro)
+    # Apaga ou insere com a linha do usuário travada (cliques simultâneos em fila)
+    favoritado = alternar_favorito(request.user.id, carro_id)
+    if favoritado is None:
+        raise Http404("Carro não encontrado")
+    return JsonResponse({"favoritado": favoritado})
+
+
+# Máximo de ids por chamada do endpoint em lote
+LIMITE_FAVORITOS_LOTE = 500
+
+
+@login_required
+@require_POST
+def favoritos_lote(request):
+    """
+    Inclui e remove vários favoritos de uma vez (sincronização do app).
+    Corpo JSON: {"adicionar": [ids], "remover": [ids]}.
+    Responde com a lista completa de ids favoritados. Repetir a chamada é seguro.
+    """
+    try:
+        dados = json.loads(request.body)
+        adicionar = [int(carro_id) for carro_id in dados.get("adicionar", [])]
+        remover = [int(carro_id) for carro_id in dados.get("remover", [])]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({"erro": "JSON inválido"}, status=400)
+
+    if len(adicionar) + len(remover) > LIMITE_FAVORITOS_LOTE:
+        return JsonResponse(
+            {"erro": f"Máximo de {LIMITE_FAVORITOS_LOTE} ids por chamada"}, status=400
+        )
+
+    favoritos_ids = alterar_favoritos(request.user.id, adicionar, remover)
+    return JsonResponse({"favoritos": favoritos_ids})
 
-    if created:
-        return JsonResponse({"favoritado": True})
 
-    fav.delete()
-    return JsonResponse({"favoritado": False})
+# -------------------- EM ALTA --------------------
+# Carros da página "Em alta" (o "Ver mais" do bloco da home)
+LIMITE_EM_ALTA = 48
+
+
+def em_alta(request):
+    # Ids na ordem do ranking (índice de pontuação) e cards da tabela de listagem
+    ids = carros_em_alta(LIMITE_EM_ALTA)
+    cards = CarroListagem.objects.in_bulk(ids)
+    carros = [cards[carro_id] for carro_id in ids if carro_id in cards]
+    return render(request, "sitepublico/em_alta.html", {"carros": carros})
 
 
 # -------------------- LISTA DE FAVORITOS --------------------
 @login_required
 def favoritos(request):
-    itens = Favorito.objects.filter(usuario=request.user).select_related("carro")
+    # Cards lidos da tabela de listagem, favoritos mais recentes primeiro
+    ids = list(
+        Favorito.objects.filter(usuario=request.user)
+        .order_by("-criado_em")
+        .values_list("carro_id", flat=True)
+    )
+    cards = CarroListagem.objects.in_bulk(ids)
+    itens = [cards[carro_id] for carro_id in ids if carro_id in cards]
     return render(request, "sitepublico/favoritos.html", {"favoritos": itens})
 
 
@@ -253,27 +317,16 @@ def favoritos(request):
 @login_required
 def historico_visualizacoes(request):
     """Lista os carros visualizados recentemente pelo usuário"""
-    from django.db.models import Max
-    
-    # Pega os IDs dos carros únicos visualizados, ordenados pela visualização mais recente
-    visualizacoes_agrupadas = VisualizacaoCarro.objects.filter(
-        usuario=request.user
-    ).values('carro').annotate(
-        ultima_visualizacao=Max('data_visualizacao')
-    ).order_by('-ultima_visualizacao')[:50]
-    
-    carros_ids = [v['carro'] for v in visualizacoes_agrupadas]
-    
-    # Busca os carros
-    carros_vistos = Carro.objects.filter(
-        id__in=carros_ids
-    ).select_related('marca', 'loja', 'loja__cidade')
-    
-    # Cria um dicionário para ordenação rápida
-    carros_dict = {carro.id: carro for carro in carros_vistos}
-    
-    # Ordena mantendo a ordem das visualizações
-    carros_ordenados = [carros_dict[cid] for cid in carros_ids if cid in carros_dict]
+    # Uma consulta: cards da listagem dos carros no histórico (limitado a
+    # LIMITE_HISTORICO por usuário), do visto mais recentemente para trás
+    vistas = VisualizacaoCarro.objects.filter(usuario=request.user)
+    carros_ordenados = list(
+        CarroListagem.objects.filter(id__in=vistas.values("carro_id"))
+        .annotate(
+            vista_em=Subquery(vistas.filter(carro_id=OuterRef("id")).values("data_visualizacao")[:1])
+        )
+        .order_by("-vista_em")
+    )
     
     return render(request, "sitepublico/historico_visualizacoes.html", {
         "carros": carros_ordenados,
@@ -285,7 +338,11 @@ def historico_visualizacoes(request):
 def limpar_historico(request):
     """Limpa o histórico de visualizações do usuário"""
     if request.method == "POST":
+        # Visitas ainda no buffer voltariam na próxima descarga
+        descartar_usuario(request.user.id)
         VisualizacaoCarro.objects.filter(usuario=request.user).delete()
+        atualizar_totais_historico([request.user.id])
+        invalidar_personalizacao(request.user.id)
         from django.contrib import messages
         messages.success(request, "Histórico limpo com sucesso!")
         return redirect('historico_visualizacoes')
@@ -306,6 +363,80 @@ def api_modelos(request, marca_id):
     return JsonResponse(data)
 
 
+# -------------------- API DE CARROS --------------------
+
+# Nome do campo na API -> caminho no ORM (joins só acontecem se o campo for pedido)
+CAMPOS_API = {
+    "id": "id",
+    "nome": "nome",
+    "ano": "ano",
+    "km": "km",
+    "preco": "preco",
+    "cor": "cor",
+    "portas": "portas",
+    "combustivel": "combustivel",
+    "cambio": "cambio",
+    "descricao": "descricao",
+    "destacado": "destacado",
+    "visualizacoes": "visualizacoes",
+    "foto_principal": "foto_principal",
+    "marca": "marca__nome",
+    "modelo": "modelo__nome",
+    "versao": "versao__nome",
+    "loja_id": "loja_id",
+    "loja": "loja__nome",
+    "cidade": "loja__cidade__nome",
+    "estado": "loja__cidade__estado",
+}
+
+CAMPOS_API_PADRAO = ("id", "nome", "ano", "km", "preco", "marca", "cidade", "estado")
+
+# Linhas lidas do banco por vez (cursor no servidor, memória constante)
+TAMANHO_LOTE_API = 2000
+
+
+def _linhas_ndjson(carros, campos):
+    for valores in carros.iterator(chunk_size=TAMANHO_LOTE_API):
+        item = dict(zip(campos, valores))
+        if item.get("foto_principal"):
+            item["foto_principal"] = default_storage.url(item["foto_principal"])
+        yield json.dumps(item, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+@require_GET
+def api_carros(request):
+    """
+    Carros em NDJSON (um objeto JSON por linha), com os mesmos filtros da listagem.
+    ?fields=id,nome,preco escolhe os campos, e só essas colunas são lidas do banco.
+    A resposta é gerada aos poucos: a memória não cresce com o tamanho do resultado.
+    """
+    pedidos = [campo.strip() for campo in request.GET.get("fields", "").split(",") if campo.strip()]
+    campos = list(dict.fromkeys(pedidos)) or list(CAMPOS_API_PADRAO)
+
+    invalidos = [campo for campo in campos if campo not in CAMPOS_API]
+    if invalidos:
+        return JsonResponse({
+            "erro": f"Campos inválidos: {', '.join(invalidos)}",
+            "campos_disponiveis": list(CAMPOS_API),
+        }, status=400)
+
+    carros = (
+        filtrar_carros(Carro.objects.all(), request.GET)
+        .order_by("id")
+        .values_list(*(CAMPOS_API[campo] for campo in campos))
+    )
+
+    return StreamingHttpResponse(
+        _linhas_ndjson(carros, campos),
+        content_type="application/x-ndjson; charset=utf-8",
+    )
+
+
+def api_facetas(request):
+    """Contagens de cada opção dos filtros da listagem, para os filtros recebidos."""
+    return JsonResponse({"facetas": facetas_da_listagem(request.GET)})
+
+
 def api_versoes(request, modelo_id):
     versoes = VersaoVeiculo.objects.filter(modelo_id=modelo_id).order_by("nome")
 
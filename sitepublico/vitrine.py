@@ -0,0 +1,95 @@
+"""
+Blocos da home (últimos carros, marcas, destaques, em alta) guardados no cache.
+
+Os blocos não expiram por tempo: ficam presos à versão do catálogo, que os
+sinais de carros.signals incrementam quando um Carro, Marca, Loja ou Cidade
+é gravado ou apagado, e à versão do ranking "em alta", que muda a cada
+atualizar_tendencias. Na primeira requisição depois da mudança, um único
+processo (o que consegue a trava) remonta os blocos; os demais continuam
+servindo a versão anterior até a nova ficar pronta, em vez de irem todos ao
+banco ao mesmo tempo.
+"""
+import time
+
+from django.core.cache import cache
+
+from carros.catalogo import versao_catalogo
+from carros.models import CarroListagem, Marca
+from carros.tendencias import carros_em_alta, versao_tendencias
+
+CHAVE_BLOCOS = "vitrine:blocos"
+CHAVE_TRAVA = "vitrine:trava"
+
+# Tempo máximo de uma remontagem; se o processo morrer, a trava se solta sozinha
+TEMPO_TRAVA = 30
+
+# Com o cache vazio não há versão antiga para servir: espera a remontagem em curso
+ESPERA_MAXIMA = 2.0
+INTERVALO_ESPERA = 0.05
+
+
+def _ultimos_carros():
+    return list(CarroListagem.objects.order_by("-id")[:6])
+
+
+def _marcas():
+    return list(Marca.objects.order_by("nome")[:10])
+
+
+def consulta_destacados():
+    # Lê o índice parcial listagem_destacados_idx
+    return CarroListagem.objects.filter(destacado=True).order_by("-id")[:6]
+
+
+def _destacados():
+    return list(consulta_destacados())
+
+
+def _em_alta():
+    ids = carros_em_alta(8)
+    cards = CarroListagem.objects.in_bulk(ids)
+    return [cards[carro_id] for carro_id in ids if carro_id in cards]
+
+
+# Nome do bloco no contexto do template -> função que o monta.
+# Um bloco novo só precisa entrar aqui.
+BLOCOS = {
+    "ultimos_carros": _ultimos_carros,
+    "marcas": _marcas,
+    "destacados": _destacados,
+    "em_alta": _em_alta,
+}
+
+
+def _montar(versao):
+    blocos = {nome: montar() for nome, montar in BLOCOS.items()}
+    cache.set(CHAVE_BLOCOS, {"versao": versao, "blocos": blocos}, None)
+    return blocos
+
+
+def blocos_home():
+    """Retorna {bloco: lista} para o template da home, montando só quando o estoque ou o ranking muda."""
+    versao = (versao_catalogo(), versao_tendencias())
+    salvo = cache.get(CHAVE_BLOCOS)
+    if salvo is not None and salvo["versao"] == versao:
+        return salvo["blocos"]
+
+    if cache.add(CHAVE_TRAVA, versao, TEMPO_TRAVA):
+        try:
+            return _montar(versao)
+        finally:
+            cache.delete(CHAVE_TRAVA)
+
+    # Outro processo está remontando: serve a versão anterior, se houver
+    if salvo is not None:
+        return salvo["blocos"]
+
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        salvo = cache.get(CHAVE_BLOCOS)
+        if salvo is not None:
+            return salvo["blocos"]
+
+    # A remontagem em curso demorou demais: monta sem gravar
+    return {nome: montar() for nome, montar in BLOCOS.items()}
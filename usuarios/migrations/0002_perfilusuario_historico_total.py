@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+def preencher_historico_total(apps, schema_editor):
+    PerfilUsuario = apps.get_model('usuarios', 'PerfilUsuario')
+    VisualizacaoCarro = apps.get_model('carros', 'VisualizacaoCarro')
+    PerfilUsuario.objects.update(
+        historico_total=models.functions.Coalesce(
+            models.Subquery(
+                VisualizacaoCarro.objects.filter(usuario=models.OuterRef('usuario'))
+                .order_by()
+                .values('usuario')
+                .annotate(total=models.Count('id'))
+                .values('total')
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+        ('carros', '0020_estatisticadiariacarro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='historico_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_historico_total, migrations.RunPython.noop),
+    ]
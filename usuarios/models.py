@@ -10,6 +10,8 @@ class PerfilUsuario(models.Model):
     foto = models.ImageField(upload_to='perfis/', blank=True, null=True, verbose_name="Foto de Perfil")
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
+    # Carros distintos no histórico (mantido por carros.historico)
+    historico_total = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name = "Perfil de Usuário"
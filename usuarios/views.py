@@ -61,9 +61,12 @@ def registrar_usuario(request):
 # ---------------- PAINEL ---------------- 
 @login_required
 def painel_usuario(request):
-    from carros.models import Favorito, VisualizacaoCarro
+    from carros.models import Favorito
     favoritos_count = Favorito.objects.filter(usuario=request.user).count()
-    historico_count = VisualizacaoCarro.objects.filter(usuario=request.user).values('carro').distinct().count()
+    # Total guardado no perfil, mantido a cada gravação do histórico
+    historico_count = PerfilUsuario.objects.filter(usuario=request.user).values_list(
+        'historico_total', flat=True
+    ).first() or 0
     return render(request, "usuarios/painel.html", {
         "favoritos_count": favoritos_count,
         "historico_count": historico_count